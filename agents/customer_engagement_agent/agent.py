@@ -7,6 +7,11 @@ import os
 from crewai import Agent, Task, Crew
 from langchain_openai import ChatOpenAI
 
+from agents.customer_engagement_agent.script_templates import (
+    all_clear, build_call_lines, format_script, parse_diagnosis
+)
+from utils.streaming import stream_text
+
 class CustomerEngagementAgent:
     """Agent for customer communication and engagement"""
     
@@ -17,6 +22,13 @@ class CustomerEngagementAgent:
             temperature=0.7
         )
         
+        # Short completions only: the script body comes from templates
+        self.note_llm = ChatOpenAI(
+            model=os.getenv("OPENAI_MODEL", "gpt-4o-mini"),
+            temperature=0.7,
+            max_tokens=80
+        )
+        
         self.agent = Agent(
             role="Customer Service Voice AI with excellent communication skills",
             goal="Persuade customers to schedule maintenance through empathetic conversation",
@@ -25,17 +37,79 @@ class CustomerEngagementAgent:
             verbose=True
         )
     
-    def generate_call_script(self, customer_name, diagnosis):
+    def generate_call_script(self, customer_name, diagnosis, slots=None, personalize=True):
         """
         Generate customer call script
         
         Args:
             customer_name: Name of the customer
             diagnosis: Diagnosis output from Diagnosis Agent
+            slots: Appointment slots to offer (defaults to tomorrow 10 AM / 2 PM)
+            personalize: Add a short LLM-written personal remark (not for
+                an all-clear call)
             
         Returns:
             Natural conversation script
         """
+        lines = build_call_lines(customer_name, diagnosis, slots)
+        personalize = personalize and not all_clear(diagnosis)
+        personal_note = self.generate_personal_note(customer_name, diagnosis) if personalize else None
+        return format_script(lines, personal_note)
+    
+    def generate_call_script_stream(self, customer_name, diagnosis, slots=None, personalize=True):
+        """
+        Stream the call script
+        
+        The templated lines are yielded immediately; only the personal note
+        is streamed from the LLM, token by token. Closing the generator
+        stops generation.
+        
+        Yields:
+            Text chunks of the script
+        """
+        lines = build_call_lines(customer_name, diagnosis, slots)
+        marker = "\0"
+        head, tail = format_script(lines, marker).split(f" {marker}")
+        yield head
+        if personalize and not all_clear(diagnosis):
+            try:
+                first = True
+                for chunk in stream_text(self.note_llm, None,
+                                         self._note_prompt(customer_name, diagnosis)):
+                    yield (" " + chunk.lstrip()) if first else chunk
+                    first = False
+            except Exception:
+                pass  # the template works without the note
+        yield tail
+    
+    def generate_personal_note(self, customer_name, diagnosis):
+        """
+        One or two warm, personalized sentences for the call
+        
+        Only the primary issue is sent to the LLM, keeping the prompt small.
+        Returns None if the LLM is unavailable so the template still works.
+        """
+        try:
+            return self.note_llm.invoke(self._note_prompt(customer_name, diagnosis)).content.strip()
+        except Exception:
+            return None
+    
+    @staticmethod
+    def _note_prompt(customer_name, diagnosis):
+        primary_issue = parse_diagnosis(diagnosis)["primary_issue"] or diagnosis[:200]
+        return (
+            f"You are Maya, a caring service advisor at ABC Motors calling {customer_name} "
+            f"(Indian customer). Their vehicle issue: {primary_issue}. "
+            f"Write one or two short, warm sentences (max 40 words) acknowledging their "
+            f"situation. No greeting, no prices, no appointment times."
+        )
+    
+    def generate_full_call_script(self, customer_name, diagnosis):
+        """
+        Generate a complete call script with the LLM (slow, token heavy)
+        
+        Kept for training material; live calls use generate_call_script.
+        """
         task = Task(
             description=f"""
             Create a natural phone conversation script for customer: {customer_name}
@@ -84,4 +158,4 @@ if __name__ == "__main__":
     
     result = agent.generate_call_script("Mr. Sharma", test_diagnosis)
     print("\nCall Script:")
-    print(result)
\ No newline at end of file
+    print(result)
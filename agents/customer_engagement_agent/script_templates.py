@@ -0,0 +1,244 @@
+"""
+Call Script Templates
+Parameterized call scripts per diagnosis class
+
+Most of a service call is the same boilerplate (greeting, safety
+emphasis, cost framing, objection handling, booking). These templates
+render it locally from a few facts parsed out of the diagnosis; only a
+short personalized remark is left to the LLM. Rendered scripts are cached
+per (customer, issue classes, cost, time to failure, slots).
+
+A report that finds nothing wrong is classed "no_issue" and gets a short
+all-clear courtesy call with no repair, cost or booking lines.
+"""
+
+import re
+from functools import lru_cache
+from typing import Dict, Optional, Sequence, Tuple
+
+DEFAULT_SLOTS = ("tomorrow at 10 AM", "tomorrow at 2 PM")
+
+# Most specific first; a report can match several classes
+ISSUE_CLASSES = [
+    {
+        "name": "ev_battery",
+        "keywords": ("ev battery", "battery pack", "battery soh", "battery health", "battery temp"),
+        "issue": "your EV battery pack is running warmer than it should and has lost some of its health",
+        "risk": "an overheating battery pack can cut your range suddenly and, in rare cases, become a safety hazard",
+        "advice": "avoid fast charging and long drives in peak heat",
+    },
+    {
+        "name": "brakes",
+        "keywords": ("brake",),
+        "issue": "your brake pads are wearing thin",
+        "risk": "worn brake pads increase your stopping distance, especially in wet conditions",
+        "advice": "avoid heavy braking and high speeds",
+    },
+    {
+        "name": "engine_oil",
+        "keywords": ("oil",),
+        "issue": "your engine oil pressure is lower than it should be",
+        "risk": "low oil pressure can cause serious engine damage if it is not addressed",
+        "advice": "keep trips short and watch for the oil warning light",
+    },
+    {
+        "name": "battery_12v",
+        "keywords": ("12v", "12 v", "battery voltage", "battery replacement", "weak battery", "alternator"),
+        "issue": "your battery is getting weak",
+        "risk": "a weak battery can leave you stranded without any warning",
+        "advice": "avoid leaving lights or accessories on with the engine off",
+    },
+    {
+        "name": "cooling",
+        "keywords": ("overheat", "coolant", "engine temp", "radiator"),
+        "issue": "your engine is running hotter than normal",
+        "risk": "overheating can warp engine parts and lead to a breakdown",
+        "advice": "keep an eye on the temperature gauge and avoid heavy loads",
+    },
+]
+
+GENERAL_CLASS = {
+    "name": "general",
+    "issue": "a component needs attention soon",
+    "risk": "small issues like this can turn into costly breakdowns",
+    "advice": "drive gently and call us if anything feels unusual",
+}
+
+NO_ISSUE = "no_issue"
+
+# Opening of every call that reports an issue; it needs no diagnosis, so
+# callers can render it while the diagnosis is still running
+INTRO_LINE = ("Great! I'm calling about your vehicle. Our monitoring system has detected "
+              "some important maintenance alerts that I wanted to discuss with you.")
+
+CLASS_BY_NAME = {c["name"]: c for c in ISSUE_CLASSES + [GENERAL_CLASS]}
+
+# Wording of reports that find nothing to repair
+_NO_ISSUE_PATTERN = re.compile(
+    r"\bno (?:components?|parts?) (?:at risk|needs? attention)"
+    r"|\bno (?:issues?|problems?|faults?|defects?) (?:found|detected|identified)"
+    r"|\bno repairs? (?:is )?(?:needed|required)"
+    r"|\ball (?:sensor )?readings (?:are )?within (?:the )?normal range"
+    r"|\bvehicle is (?:healthy|in good condition)",
+    re.IGNORECASE,
+)
+
+# Keywords must start at a word boundary ("oil" must not match "coil")
+_CLASS_PATTERNS = [
+    (c["name"], re.compile(r"\b(?:" + "|".join(map(re.escape, c["keywords"])) + ")", re.IGNORECASE))
+    for c in ISSUE_CLASSES
+]
+
+_FIELD_PATTERNS = {
+    "primary_issue": re.compile(r"Primary Issue[\s*:]*([^\n]+)", re.IGNORECASE),
+    "cost": re.compile(r"Estimated Repair Cost[\s*:]*([^\n]+)", re.IGNORECASE),
+    "time_to_failure": re.compile(r"Time to Failure[\s*:]*([^\n]+)", re.IGNORECASE),
+    "urgency": re.compile(r"Urgency[\s*:]*([^\n]+)", re.IGNORECASE),
+}
+
+
+def parse_diagnosis(diagnosis: str) -> Dict[str, Optional[str]]:
+    """Pull the fields the templates need out of a diagnosis report"""
+    fields = {}
+    for name, pattern in _FIELD_PATTERNS.items():
+        match = pattern.search(diagnosis or "")
+        fields[name] = match.group(1).strip(" *:") if match else None
+    return fields
+
+
+def classify_issues(diagnosis: str) -> Tuple[str, ...]:
+    """Diagnosis classes mentioned in the report, most specific first; ("no_issue",) if it finds nothing"""
+    text = diagnosis or ""
+    # The primary issue line decides when there is one ("No component at risk")
+    primary_issue = parse_diagnosis(text)["primary_issue"]
+    if primary_issue and _NO_ISSUE_PATTERN.search(primary_issue):
+        return (NO_ISSUE,)
+    classes = tuple(name for name, pattern in _CLASS_PATTERNS if pattern.search(text))
+    if "ev_battery" in classes:
+        # Battery and overheating wording in an EV report is about the traction pack
+        classes = tuple(name for name in classes if name not in ("battery_12v", "cooling"))
+    if not classes and _NO_ISSUE_PATTERN.search(text):
+        return (NO_ISSUE,)
+    return classes or ("general",)
+
+
+def all_clear(diagnosis: str) -> bool:
+    """True if the report finds nothing that needs a repair"""
+    return classify_issues(diagnosis) == (NO_ISSUE,)
+
+
+def _join(parts: Sequence[str]) -> str:
+    if len(parts) <= 1:
+        return "".join(parts)
+    return ", ".join(parts[:-1]) + " and " + parts[-1]
+
+
+def greeting_line(customer_name: str) -> str:
+    """Opening line of a call; needs nothing but the customer's name"""
+    return (f"Hello {customer_name}! This is Maya from ABC Motors Service Center. "
+            f"I hope I'm not catching you at a bad time?")
+
+
+@lru_cache(maxsize=1024)
+def render_lines(customer_name: str, issue_classes: Tuple[str, ...], cost: str,
+                 time_to_failure: str, slots: Tuple[str, ...]) -> Tuple[Tuple[str, str], ...]:
+    """
+    Render the fixed parts of a call (cached)
+
+    Returns:
+        Tuple of (line_name, text) pairs in call order; an all-clear call
+        has no safety, cost, objection or scheduling lines
+    """
+    if issue_classes == (NO_ISSUE,):
+        return (
+            ("greeting", greeting_line(customer_name)),
+            ("intro", "I'm calling with good news about your vehicle."),
+            ("issues", "Our monitoring system checked all its readings and found nothing that "
+                       "needs attention right now."),
+            ("advice", "Just keep to your regular service schedule, and call us if anything "
+                       "ever feels unusual."),
+            ("closing", "Thank you so much for your time. Drive safely!"),
+        )
+    templates = [CLASS_BY_NAME[name] for name in issue_classes]
+    issues = [t["issue"] for t in templates]
+    if len(issues) > 1:
+        issues_line = f"Our analysis shows {len(issues)} issues. " + " ".join(
+            f"{ordinal}, {issue}." for ordinal, issue in zip(("First", "Second", "Third", "Also"), issues)
+        )
+    else:
+        issues_line = f"Our analysis shows that {issues[0]}."
+    slot_text = " or ".join(slots)
+
+    return (
+        ("greeting", greeting_line(customer_name)),
+        ("intro", INTRO_LINE),
+        ("issues", issues_line),
+        ("safety", f"I want to emphasize why this matters: {_join([t['risk'] for t in templates])}. "
+                   f"Our estimate is that this needs attention within {time_to_failure}."),
+        ("cost", f"The good news is we caught this early. The repair would cost approximately "
+                 f"{cost}. If we wait, the cost could be several times higher once other "
+                 f"parts get damaged."),
+        ("concern", f"I completely understand you need time to think. However, I want to stress "
+                    f"that this is a safety issue: {_join(issues)}."),
+        ("objection", "I completely understand you're busy. We offer free pickup and drop-off, "
+                      "and the service typically takes just 2-3 hours."),
+        ("scheduling_question", f"Would you like to schedule a service appointment? We have "
+                                f"slots available {slot_text}. Which would work better for you?"),
+        ("advice", f"Until then, please {_join([t['advice'] for t in templates])}."),
+        ("closing", "Thank you so much for your time. You'll receive a confirmation SMS shortly. "
+                    "Drive safely!"),
+    )
+
+
+def build_call_lines(customer_name: str, diagnosis: str,
+                     slots: Optional[Sequence[str]] = None) -> Dict[str, str]:
+    """
+    Named utterances for a call about this diagnosis
+
+    Args:
+        customer_name: Name used in the greeting
+        diagnosis: Diagnosis report text
+        slots: Offered appointment slots (defaults to tomorrow 10 AM / 2 PM)
+
+    Returns:
+        Dict of line name -> text
+    """
+    fields = parse_diagnosis(diagnosis)
+    lines = render_lines(
+        customer_name,
+        classify_issues(diagnosis),
+        fields["cost"] or "a few thousand rupees",
+        fields["time_to_failure"] or "the next week",
+        tuple(slots or DEFAULT_SLOTS),
+    )
+    return dict(lines)
+
+
+def format_script(lines: Dict[str, str], personal_note: Optional[str] = None) -> str:
+    """Lay the lines out as an AI/CUSTOMER conversation script"""
+    explanation = lines["intro"]
+    if personal_note:
+        explanation += f" {personal_note}"
+    if "scheduling_question" not in lines:
+        exchanges = [
+            ("AI", lines["greeting"]),
+            ("CUSTOMER", "No, it's fine. What's this about?"),
+            ("AI", f"{explanation} {lines['issues']}"),
+            ("CUSTOMER", "Oh, that's good to hear."),
+            ("AI", f"{lines['advice']} {lines['closing']}"),
+        ]
+        return "\n".join(f"{speaker}: {text}" for speaker, text in exchanges)
+    exchanges = [
+        ("AI", lines["greeting"]),
+        ("CUSTOMER", "No, it's fine. What's this about?"),
+        ("AI", f"{explanation} {lines['issues']}"),
+        ("CUSTOMER", "Oh, is it serious?"),
+        ("AI", lines["safety"]),
+        ("CUSTOMER", "How much will this cost?"),
+        ("AI", lines["cost"]),
+        ("CUSTOMER", "I'm quite busy this week."),
+        ("AI", f"{lines['objection']} {lines['scheduling_question']}"),
+        ("CUSTOMER", "Tomorrow morning works."),
+        ("AI", f"Excellent! {lines['advice']} {lines['closing']}"),
+    ]
+    return "\n".join(f"{speaker}: {text}" for speaker, text in exchanges)
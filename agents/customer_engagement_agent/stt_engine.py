@@ -0,0 +1,202 @@
+"""
+STT Engine
+Pluggable speech-to-text backends and per-turn latency tracing
+
+Backends split a customer turn into capture (waiting for and recording
+speech) and recognition (turning audio into text), so each stage can be
+timed on its own:
+
+- MicrophoneBackend: live microphone via speech_recognition, recognized
+  with Google (network) or an offline engine (sphinx, vosk)
+- ReplayBackend: scripted transcripts, for tests and offline tuning
+"""
+
+import importlib.util
+import json
+import statistics
+import time
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+from utils.config import load_config
+
+
+class STTError(Exception):
+    """Base class for speech-to-text failures"""
+
+
+class NoSpeechError(STTError):
+    """Nothing was said before the timeout"""
+
+
+class UnrecognizedSpeechError(STTError):
+    """Speech was captured but could not be understood"""
+
+
+class RecognitionServiceError(STTError):
+    """The recognizer itself failed (network, missing model, ...)"""
+
+
+class STTBackend(ABC):
+    """Interface for speech-to-text backends"""
+
+    name = "base"
+
+    def calibrate(self, duration: float = 2.0):
+        """Adjust to ambient noise (no-op unless a microphone is involved)"""
+
+    @abstractmethod
+    def capture(self, timeout: float = 10, phrase_time_limit: float = 15):
+        """Wait for the customer to speak and return the captured audio"""
+        pass
+
+    @abstractmethod
+    def recognize(self, audio) -> str:
+        """Convert captured audio to text"""
+        pass
+
+
+class MicrophoneBackend(STTBackend):
+    """Live microphone input recognized by a speech_recognition engine"""
+
+    # Engine -> (module, pip package) it needs on top of SpeechRecognition
+    # and PyAudio; vosk also needs a model downloaded locally
+    ENGINES = {
+        "google": (None, None),
+        "sphinx": ("pocketsphinx", "pocketsphinx"),
+        "vosk": ("vosk", "vosk"),
+    }
+
+    def __init__(self, engine: str = "google"):
+        """
+        Raises:
+            ValueError: Unknown engine
+            ImportError: A package the engine needs is not installed
+        """
+        if engine not in self.ENGINES:
+            raise ValueError(f"Unknown speech recognition engine: {engine}")
+        module, package = self.ENGINES[engine]
+        missing = [(name, pip) for name, pip in (("speech_recognition", "SpeechRecognition"),
+                                                 ("pyaudio", "PyAudio"), (module, package))
+                   if name and importlib.util.find_spec(name) is None]
+        if missing:
+            raise ImportError(f"The '{engine}' STT backend needs: "
+                              f"pip install {' '.join(pip for _, pip in missing)}")
+        import speech_recognition as sr
+        self._sr = sr
+        self.name = engine
+        self.recognizer = sr.Recognizer()
+        self.microphone = sr.Microphone()
+        self._recognize = getattr(self.recognizer, f"recognize_{engine}")
+
+    def calibrate(self, duration: float = 2.0):
+        with self.microphone as source:
+            self.recognizer.adjust_for_ambient_noise(source, duration=duration)
+
+    def capture(self, timeout: float = 10, phrase_time_limit: float = 15):
+        try:
+            with self.microphone as source:
+                return self.recognizer.listen(source, timeout=timeout,
+                                              phrase_time_limit=phrase_time_limit)
+        except self._sr.WaitTimeoutError as e:
+            raise NoSpeechError(str(e)) from e
+
+    def recognize(self, audio) -> str:
+        try:
+            text = self._recognize(audio)
+        except self._sr.UnknownValueError as e:
+            raise UnrecognizedSpeechError(str(e)) from e
+        except self._sr.RequestError as e:
+            raise RecognitionServiceError(str(e)) from e
+        if self.name == "vosk":
+            # recognize_vosk returns the raw JSON result
+            text = json.loads(text).get("text", "")
+        if not text:
+            raise UnrecognizedSpeechError("empty transcript")
+        return text
+
+
+class ReplayBackend(STTBackend):
+    """
+    Replays scripted customer turns
+
+    An empty string stands for silence (NoSpeechError), and None for
+    speech that could not be understood.
+    """
+
+    name = "replay"
+
+    def __init__(self, transcripts: Iterable[Optional[str]], capture_delay: float = 0.0):
+        self.transcripts = list(transcripts)
+        self.capture_delay = capture_delay
+        self.position = 0
+
+    @classmethod
+    def from_file(cls, path, capture_delay: float = 0.0) -> "ReplayBackend":
+        """One customer turn per line; blank lines are silence"""
+        lines = Path(path).read_text(encoding="utf-8").splitlines()
+        return cls(lines, capture_delay)
+
+    def capture(self, timeout: float = 10, phrase_time_limit: float = 15):
+        if self.position >= len(self.transcripts):
+            raise NoSpeechError("replay exhausted")
+        transcript = self.transcripts[self.position]
+        self.position += 1
+        if self.capture_delay:
+            time.sleep(self.capture_delay)
+        if transcript == "":
+            raise NoSpeechError("scripted silence")
+        return transcript
+
+    def recognize(self, audio) -> str:
+        if audio is None:
+            raise UnrecognizedSpeechError("scripted unintelligible speech")
+        return audio
+
+
+def create_stt_backend(name: Optional[str] = None) -> STTBackend:
+    """Backend named in agents_config.yaml `stt_backend` (default: google)"""
+    if name is None:
+        config = load_config("agents_config").get("agents", {}).get("customer_engagement_agent", {})
+        name = config.get("stt_backend", "google")
+    return MicrophoneBackend(name)
+
+
+class TurnLatencyLog:
+    """
+    Per-turn latency of the call loop
+
+    capture: waiting for and recording the customer's speech
+    recognition: speech to text
+    decision: transcript available -> agent starts its reply
+    """
+
+    STAGES = ("capture_ms", "recognition_ms", "decision_ms")
+
+    def __init__(self):
+        self.turns: List[Dict[str, float]] = []
+        self._recognized_at: Optional[float] = None
+
+    def record_listen(self, capture_seconds: float, recognition_seconds: float, backend: str):
+        self.turns.append({
+            "backend": backend,
+            "capture_ms": round(capture_seconds * 1000, 1),
+            "recognition_ms": round(recognition_seconds * 1000, 1),
+        })
+        self._recognized_at = time.perf_counter()
+
+    def record_reply(self):
+        """Call when the agent starts speaking after a customer turn"""
+        if self._recognized_at is not None and self.turns:
+            self.turns[-1]["decision_ms"] = round((time.perf_counter() - self._recognized_at) * 1000, 1)
+            self._recognized_at = None
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """Median and max per stage, in milliseconds"""
+        result = {}
+        for stage in self.STAGES:
+            values = [turn[stage] for turn in self.turns if stage in turn]
+            if values:
+                result[stage] = {"p50": statistics.median(values), "max": max(values)}
+        return result
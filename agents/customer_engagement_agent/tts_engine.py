@@ -0,0 +1,214 @@
+"""
+TTS Engine
+Pre-rendered speech audio cache and a background synthesis worker
+
+Utterances are rendered once to audio files keyed by text and voice
+settings, so fixed and templated lines (greeting, intro, safety, closing)
+are synthesized a single time and then just played back. A background
+worker renders upcoming lines while the current one is playing, and a
+dead-air meter records the silence before every AI turn. Where no audio
+can be played back, Pyttsx3Speaker speaks through the system voice.
+
+pyttsx3 is imported and its engine created on first use only, so call
+logic can run (and be tested) on machines without a speech engine.
+"""
+
+import hashlib
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional
+
+from utils.config import load_config
+
+try:
+    import simpleaudio
+except ImportError:
+    simpleaudio = None
+
+try:
+    import winsound
+except ImportError:
+    winsound = None
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent
+
+# Preferred voice (like Maya): first installed voice whose name contains one of these
+VOICE_HINTS = ("female", "zira")
+
+
+def play_audio(path: Path) -> bool:
+    """
+    Play an audio file and block until it finishes
+
+    Returns:
+        False if no audio backend is available
+    """
+    if simpleaudio is not None:
+        simpleaudio.WaveObject.from_wave_file(str(path)).play().wait_done()
+        return True
+    if winsound is not None:
+        winsound.PlaySound(str(path), winsound.SND_FILENAME)
+        return True
+    return False
+
+
+def init_pyttsx3(rate: int = 150, volume: float = 0.9, voice_id: Optional[str] = None):
+    """New pyttsx3 engine; without a voice_id the first voice matching VOICE_HINTS is used"""
+    import pyttsx3
+    engine = pyttsx3.init()
+    engine.setProperty('rate', rate)
+    engine.setProperty('volume', volume)
+    if voice_id is None:
+        voice_id = next((voice.id for voice in engine.getProperty('voices')
+                         if any(hint in voice.name.lower() for hint in VOICE_HINTS)), None)
+    if voice_id:
+        engine.setProperty('voice', voice_id)
+    return engine
+
+
+class Pyttsx3Synthesizer:
+    """Renders text to a wav file with pyttsx3 (owns its engine)"""
+
+    def __init__(self, rate: int = 150, volume: float = 0.9, voice_id: Optional[str] = None):
+        self.rate = rate
+        self.volume = volume
+        self.voice_id = voice_id
+        self._engine = None
+
+    def __call__(self, text: str, path: Path):
+        if self._engine is None:
+            # Created lazily so it lives on the worker thread that uses it
+            self._engine = init_pyttsx3(self.rate, self.volume, self.voice_id)
+        self._engine.save_to_file(text, str(path))
+        self._engine.runAndWait()
+
+
+class Pyttsx3Speaker:
+    """Speaks text aloud with pyttsx3 (engine created on first use)"""
+
+    def __init__(self, rate: int = 150, volume: float = 0.9, voice_id: Optional[str] = None):
+        self.rate = rate
+        self.volume = volume
+        self.voice_id = voice_id
+        self._engine = None
+
+    def __call__(self, text: str):
+        if self._engine is None:
+            self._engine = init_pyttsx3(self.rate, self.volume, self.voice_id)
+        self._engine.say(text)
+        self._engine.runAndWait()
+
+
+class TTSCache:
+    """Audio files on disk, one per (text, voice settings)"""
+
+    def __init__(self, rate: int = 150, volume: float = 0.9, voice_id: Optional[str] = None,
+                 cache_dir: Optional[Path] = None,
+                 synthesize: Optional[Callable[[str, Path], None]] = None):
+        if cache_dir is None:
+            config = load_config("agents_config").get("agents", {}).get("customer_engagement_agent", {})
+            cache_dir = PROJECT_ROOT / config.get("tts_cache_dir", "data/tts_cache")
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.voice_key = f"{voice_id}|{rate}|{volume}"
+        self.synthesize = synthesize or Pyttsx3Synthesizer(rate, volume, voice_id)
+        self.hits = 0
+        self.renders = 0
+
+    def path_for(self, text: str) -> Path:
+        """Cache file for an utterance with the current voice settings"""
+        digest = hashlib.sha1(f"{self.voice_key}|{text}".encode("utf-8")).hexdigest()
+        return self.cache_dir / f"{digest}.wav"
+
+    def render(self, text: str) -> Path:
+        """Return the audio file for text, synthesizing it if needed"""
+        path = self.path_for(text)
+        if path.exists():
+            self.hits += 1
+            return path
+        tmp = path.with_name(f"{path.stem}.{os.getpid()}.{threading.get_ident()}.tmp.wav")
+        self.synthesize(text, tmp)
+        os.replace(tmp, path)
+        self.renders += 1
+        return path
+
+
+class SpeechWorker:
+    """Single background thread that renders utterances ahead of playback"""
+
+    def __init__(self, cache: TTSCache):
+        self.cache = cache
+        # One thread: TTS engines are generally not thread-safe
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="tts")
+        self._futures: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+
+    def prefetch(self, texts: Iterable[str]):
+        """Queue utterances for rendering in the background"""
+        for text in texts:
+            self._submit(text)
+
+    def _submit(self, text: str) -> Future:
+        with self._lock:
+            future = self._futures.get(text)
+            if future is None:
+                future = self._executor.submit(self.cache.render, text)
+                self._futures[text] = future
+            return future
+
+    def get(self, text: str, timeout: Optional[float] = None) -> Optional[Path]:
+        """
+        Audio file for text, waiting for the worker if it is still rendering
+
+        Returns:
+            Path to the audio, or None if synthesis failed
+        """
+        path = self.cache.path_for(text)
+        if path.exists():
+            return path
+        try:
+            return self._submit(text).result(timeout=timeout)
+        except Exception:
+            with self._lock:
+                self._futures.pop(text, None)
+            return None
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+class DeadAirMeter:
+    """Measures silence between the end of one turn and the next AI speech"""
+
+    def __init__(self):
+        self.gaps: List[float] = []
+        self._turn_ended: Optional[float] = None
+
+    def turn_ended(self):
+        """Call when the customer stops talking or the AI finishes a line"""
+        self._turn_ended = time.perf_counter()
+
+    def speech_started(self):
+        """Call right before the AI starts speaking"""
+        if self._turn_ended is not None:
+            self.gaps.append(time.perf_counter() - self._turn_ended)
+            self._turn_ended = None
+
+    def summary(self) -> Dict[str, float]:
+        """Dead air statistics in milliseconds"""
+        if not self.gaps:
+            return {"turns": 0, "mean_ms": 0.0, "max_ms": 0.0, "total_ms": 0.0}
+        return {
+            "turns": len(self.gaps),
+            "mean_ms": round(sum(self.gaps) / len(self.gaps) * 1000, 1),
+            "max_ms": round(max(self.gaps) * 1000, 1),
+            "total_ms": round(sum(self.gaps) * 1000, 1)
+        }
+
+
+def audio_playback_available() -> bool:
+    """Whether pre-rendered audio can be played on this platform"""
+    return simpleaudio is not None or winsound is not None
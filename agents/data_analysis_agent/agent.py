@@ -7,6 +7,8 @@ import os
 from crewai import Agent, Task, Crew
 from langchain_openai import ChatOpenAI
 
+from utils.streaming import agent_system_prompt, stream_text
+
 
 class DataAnalysisAgent:
     """Agent for analyzing vehicle sensor data"""
@@ -36,11 +38,38 @@ class DataAnalysisAgent:
         Returns:
             Analysis report with anomalies and recommendations
         """
+        task = Task(
+            description=self._task_description(vehicle_data),
+            agent=self.agent,
+            expected_output="Detailed analysis report with anomalies and severity levels"
+        )
+        
+        crew = Crew(
+            agents=[self.agent],
+            tasks=[task],
+            verbose=False
+        )
+        
+        result = crew.kickoff()
+        return str(result)
+    
+    def analyze_stream(self, vehicle_data):
+        """
+        Stream the analysis report token by token
+        
+        Same prompt as analyze(); closing the generator stops generation.
+        
+        Yields:
+            Text chunks of the analysis report
+        """
+        yield from stream_text(self.llm, agent_system_prompt(self.agent),
+                               self._task_description(vehicle_data))
+    
+    @staticmethod
+    def _task_description(vehicle_data):
         vehicle_type = vehicle_data.get("type", "Unknown")
         sensor_data = vehicle_data.get("sensor_data", {})
-        
-        task = Task(
-            description=f"""
+        return f"""
             Analyze this {vehicle_type} vehicle's sensor data: {sensor_data}
             
             Thresholds:
@@ -61,19 +90,7 @@ class DataAnalysisAgent:
             - Severity Level: LOW/MEDIUM/HIGH/CRITICAL
             - Recommended Action: [action]
             - Time to Failure: [estimate]
-            """,
-            agent=self.agent,
-            expected_output="Detailed analysis report with anomalies and severity levels"
-        )
-        
-        crew = Crew(
-            agents=[self.agent],
-            tasks=[task],
-            verbose=False
-        )
-        
-        result = crew.kickoff()
-        return str(result)
+            """
 
 
 if __name__ == "__main__":
@@ -0,0 +1,440 @@
+"""
+Feature Extractor
+Rolling-window and time-based telemetry features for the ML models
+
+Features follow ml_config.yaml `feature_engineering`:
+- Missing readings are interpolated linearly in time (gaps longer than
+  `max_gap` samples are forward-filled instead)
+- Rolling mean/std/min/max over the last `window` samples
+- Time features: hour of day, day of week, seconds since previous sample
+
+Two modes share the same arithmetic so they produce identical output:
+- RollingFeatureExtractor.transform() computes a whole frame at once
+  with numpy prefix sums and sliding-window views
+- FeatureStream.update() updates the same features one sample at a time
+  using running prefix sums and monotonic deques for min/max (O(1)
+  amortized per sample, independent of the window length)
+"""
+
+import math
+from collections import deque
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from utils.config import load_config
+
+SUPPORTED_STATS = ("mean", "std", "min", "max")
+TIME_FEATURES = ("hour_of_day", "day_of_week", "seconds_since_last")
+SECONDS_PER_DAY = 86400.0
+
+
+def _to_epoch(timestamp: Any) -> float:
+    """Convert an ISO string, datetime or number to epoch seconds"""
+    if isinstance(timestamp, str):
+        timestamp = datetime.fromisoformat(timestamp)
+    if isinstance(timestamp, datetime):
+        return timestamp.timestamp()
+    return float(timestamp)
+
+
+def _to_float(value: Any) -> float:
+    return float("nan") if value is None else float(value)
+
+
+class RollingFeatureExtractor:
+    """Computes rolling-window features for a telemetry time series"""
+
+    def __init__(self, features: Optional[Sequence[str]] = None,
+                 window: Optional[int] = None,
+                 stats: Optional[Sequence[str]] = None,
+                 time_features: Optional[bool] = None,
+                 handle_missing: Optional[str] = None,
+                 max_gap: int = 10):
+        """
+        Initialize the extractor (defaults come from ml_config.yaml)
+
+        Args:
+            features: Sensor names to use as input columns
+            window: Rolling window length in samples
+            stats: Rolling statistics to compute (mean/std/min/max)
+            time_features: Whether to append time-based features
+            handle_missing: 'interpolate' or 'ffill'
+            max_gap: Longest run of missing samples that is interpolated;
+                also bounds how long the stream holds back a sample
+        """
+        config = load_config("ml_config")
+        fe_config = config.get("feature_engineering", {})
+        predictor_config = config.get("failure_prediction", {})
+
+        self.features = list(features or predictor_config.get("input_features", []))
+        self.window = int(window or predictor_config.get("sequence_length", 50))
+        self.stats = list(stats or fe_config.get("rolling_window_features", SUPPORTED_STATS))
+        self.time_features = fe_config.get("time_based_features", True) \
+            if time_features is None else time_features
+        self.handle_missing = handle_missing or fe_config.get("handle_missing", "interpolate")
+        self.max_gap = max_gap
+
+        unknown = set(self.stats) - set(SUPPORTED_STATS)
+        if unknown:
+            raise ValueError(f"Unsupported rolling statistics: {sorted(unknown)}")
+        if self.handle_missing not in ("interpolate", "ffill"):
+            raise ValueError(f"Unsupported missing-value strategy: {self.handle_missing}")
+        if self.window < 1:
+            raise ValueError("window must be at least 1")
+
+    @property
+    def feature_names(self) -> List[str]:
+        """Names of the output columns, in order"""
+        names = list(self.features)
+        for stat in self.stats:
+            names.extend(f"{feature}_{stat}" for feature in self.features)
+        if self.time_features:
+            names.extend(TIME_FEATURES)
+        return names
+
+    def stream(self) -> "FeatureStream":
+        """Create a streaming state for one vehicle"""
+        return FeatureStream(self)
+
+    def transform_records(self, records: Iterable[Dict[str, Any]]) -> np.ndarray:
+        """
+        Compute features for a list of telemetry dictionaries
+
+        Args:
+            records: Telemetry readings (as produced by the data generator),
+                each with a 'timestamp' and one key per sensor
+
+        Returns:
+            Feature matrix with one row per record
+        """
+        records = list(records)
+        values = np.array(
+            [[_to_float(r.get(f)) for f in self.features] for r in records],
+            dtype=np.float64
+        ).reshape(len(records), len(self.features))
+        timestamps = None
+        if self.time_features:
+            timestamps = np.array([_to_epoch(r["timestamp"]) for r in records], dtype=np.float64)
+        return self.transform(values, timestamps)
+
+    def transform(self, values: np.ndarray,
+                  timestamps: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Compute features for a whole frame at once (vectorized)
+
+        Args:
+            values: Array of shape (n_samples, n_features), NaN for missing
+            timestamps: Epoch seconds per sample (required for time features)
+
+        Returns:
+            Feature matrix of shape (n_samples, len(feature_names))
+        """
+        x = np.array(values, dtype=np.float64)
+        if x.ndim != 2 or x.shape[1] != len(self.features):
+            raise ValueError(f"Expected shape (n, {len(self.features)}), got {x.shape}")
+        n = x.shape[0]
+        if self.time_features and timestamps is None:
+            raise ValueError("timestamps are required when time_features is enabled")
+        positions = np.asarray(timestamps, dtype=np.float64) if timestamps is not None \
+            else np.arange(n, dtype=np.float64)
+
+        if n == 0:
+            return np.empty((0, len(self.feature_names)))
+
+        filled = np.column_stack(
+            [self._fill_column(x[:, j], positions) for j in range(x.shape[1])]
+        ) if x.shape[1] else x
+        blocks = [filled]
+
+        valid = ~np.isnan(filled)
+        first_valid = np.where(valid.any(axis=0), valid.argmax(axis=0), 0)
+        ref = filled[first_valid, np.arange(filled.shape[1])]
+        shifted = np.where(valid, filled - ref, 0.0)
+
+        zeros = np.zeros((1, filled.shape[1]))
+        sums = np.vstack([zeros, np.cumsum(shifted, axis=0)])
+        squares = np.vstack([zeros, np.cumsum(shifted * shifted, axis=0)])
+        counts = np.vstack([zeros.astype(np.int64), np.cumsum(valid, axis=0)])
+        end = np.arange(1, n + 1)
+        start = np.maximum(end - self.window, 0)
+        window_sum = sums[end] - sums[start]
+        window_sq = squares[end] - squares[start]
+        window_count = counts[end] - counts[start]
+
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean_shift = window_sum / window_count
+            var = window_sq / window_count - mean_shift * mean_shift
+        has_data = window_count > 0
+
+        for stat in self.stats:
+            if stat == "mean":
+                block = np.where(has_data, ref + mean_shift, np.nan)
+            elif stat == "std":
+                block = np.where(has_data, np.sqrt(np.maximum(var, 0.0)), np.nan)
+            else:
+                fill = np.inf if stat == "min" else -np.inf
+                padded = np.vstack([np.full((self.window - 1, filled.shape[1]), fill),
+                                    np.where(valid, filled, fill)])
+                view = sliding_window_view(padded, self.window, axis=0)
+                block = view.min(axis=-1) if stat == "min" else view.max(axis=-1)
+                block = np.where(has_data, block, np.nan)
+            blocks.append(block)
+
+        if self.time_features:
+            ts = positions
+            since_last = np.concatenate([[0.0], ts[1:] - ts[:-1]])
+            blocks.append(np.column_stack([
+                (ts % SECONDS_PER_DAY) / 3600.0,
+                (ts // SECONDS_PER_DAY + 3.0) % 7.0,
+                since_last
+            ]))
+
+        return np.hstack(blocks)
+
+    def _fill_column(self, column: np.ndarray, positions: np.ndarray) -> np.ndarray:
+        """Fill missing values in one column (same rules as FeatureStream)"""
+        missing = np.isnan(column)
+        if not missing.any():
+            return column
+        n = column.shape[0]
+        idx = np.arange(n)
+        prev = np.maximum.accumulate(np.where(missing, -1, idx))
+        nxt = np.minimum.accumulate(np.where(missing, n, idx)[::-1])[::-1]
+
+        # Length of the run of missing samples each position belongs to
+        run_length = nxt - prev - 1
+        has_prev = prev >= 0
+        has_next = nxt < n
+        short = run_length <= self.max_gap
+
+        x0 = column[np.where(has_prev, prev, 0)]
+        x1 = column[np.where(has_next, nxt, 0)]
+        t0 = positions[np.where(has_prev, prev, 0)]
+        t1 = positions[np.where(has_next, nxt, 0)]
+
+        result = column.copy()
+        # Leading gap: backfill when short, otherwise nothing to carry forward
+        result = np.where(missing & ~has_prev & has_next & short, x1, result)
+        # Trailing gap or long gap: forward fill
+        result = np.where(missing & has_prev & (~has_next | ~short), x0, result)
+        interior = missing & has_prev & has_next & short
+        if self.handle_missing == "interpolate":
+            with np.errstate(invalid="ignore", divide="ignore"):
+                interpolated = np.where(
+                    t1 == t0, x0, x0 + (x1 - x0) * ((positions - t0) / (t1 - t0))
+                )
+            result = np.where(interior, interpolated, result)
+        else:
+            result = np.where(interior, x0, result)
+        return result
+
+
+class _PendingRow:
+    __slots__ = ("position", "timestamp", "values", "unresolved")
+
+    def __init__(self, position, timestamp, values):
+        self.position = position
+        self.timestamp = timestamp
+        self.values = values
+        self.unresolved = 0
+
+
+class FeatureStream:
+    """
+    Incremental feature state for a single telemetry stream
+
+    A sample is emitted once all of its missing readings are resolved,
+    i.e. after the next valid reading arrives or the gap exceeds max_gap.
+    """
+
+    def __init__(self, extractor: RollingFeatureExtractor):
+        self.extractor = extractor
+        n_features = len(extractor.features)
+        window = extractor.window
+
+        self._count = 0
+        self._pending: deque = deque()
+        self._last_valid: List[Optional[tuple]] = [None] * n_features
+        self._gaps: List[List[_PendingRow]] = [[] for _ in range(n_features)]
+        self._gap_length = [0] * n_features
+        self._long_gap = [False] * n_features
+
+        self._emitted = 0
+        self._last_timestamp: Optional[float] = None
+        self._ref: List[Optional[float]] = [None] * n_features
+        self._sum = [0.0] * n_features
+        self._sq = [0.0] * n_features
+        self._valid = [0] * n_features
+        self._sum_hist = [deque([0.0], maxlen=window + 1) for _ in range(n_features)]
+        self._sq_hist = [deque([0.0], maxlen=window + 1) for _ in range(n_features)]
+        self._valid_hist = [deque([0], maxlen=window + 1) for _ in range(n_features)]
+        self._min_dq = [deque() for _ in range(n_features)]
+        self._max_dq = [deque() for _ in range(n_features)]
+
+    def update(self, sample: Any, timestamp: Any = None) -> List[np.ndarray]:
+        """
+        Add one sample to the stream
+
+        Args:
+            sample: Dict of sensor readings or a sequence in feature order
+            timestamp: Sample time (ISO string, datetime or epoch seconds)
+
+        Returns:
+            Feature rows that became final with this sample (possibly empty)
+        """
+        ext = self.extractor
+        if isinstance(sample, dict):
+            if timestamp is None:
+                timestamp = sample.get("timestamp")
+            values = [_to_float(sample.get(f)) for f in ext.features]
+        else:
+            values = [_to_float(v) for v in sample]
+        if ext.time_features and timestamp is None:
+            raise ValueError("timestamp is required when time_features is enabled")
+
+        ts = _to_epoch(timestamp) if timestamp is not None else None
+        position = ts if ts is not None else float(self._count)
+        row = _PendingRow(position, ts, values)
+        self._count += 1
+        self._pending.append(row)
+
+        for j, value in enumerate(values):
+            if value != value:  # NaN
+                self._on_missing(j, row)
+            else:
+                self._on_valid(j, row, value)
+
+        return self._drain()
+
+    def flush(self) -> List[np.ndarray]:
+        """Resolve trailing gaps (forward fill) and emit all held samples"""
+        for j, gap in enumerate(self._gaps):
+            last = self._last_valid[j]
+            for row in gap:
+                if last is not None:
+                    row.values[j] = last[1]
+                row.unresolved -= 1
+            gap.clear()
+            self._gap_length[j] = 0
+        return self._drain()
+
+    def _on_missing(self, j: int, row: _PendingRow):
+        ext = self.extractor
+        last = self._last_valid[j]
+        if self._long_gap[j]:
+            if last is not None:
+                row.values[j] = last[1]
+            return
+        if ext.handle_missing == "ffill" and last is not None:
+            row.values[j] = last[1]
+            return
+
+        row.unresolved += 1
+        self._gaps[j].append(row)
+        self._gap_length[j] += 1
+        if self._gap_length[j] > ext.max_gap:
+            # Gap too long to interpolate: forward fill the whole run
+            for gap_row in self._gaps[j]:
+                if last is not None:
+                    gap_row.values[j] = last[1]
+                gap_row.unresolved -= 1
+            self._gaps[j].clear()
+            self._long_gap[j] = True
+
+    def _on_valid(self, j: int, row: _PendingRow, value: float):
+        last = self._last_valid[j]
+        gap = self._gaps[j]
+        if gap:
+            if last is None:
+                for gap_row in gap:
+                    gap_row.values[j] = value
+                    gap_row.unresolved -= 1
+            else:
+                t0, x0 = last
+                t1 = row.position
+                for gap_row in gap:
+                    if t1 == t0:
+                        gap_row.values[j] = x0
+                    else:
+                        gap_row.values[j] = x0 + (value - x0) * ((gap_row.position - t0) / (t1 - t0))
+                    gap_row.unresolved -= 1
+            gap.clear()
+        self._gap_length[j] = 0
+        self._long_gap[j] = False
+        self._last_valid[j] = (row.position, value)
+
+    def _drain(self) -> List[np.ndarray]:
+        rows = []
+        while self._pending and self._pending[0].unresolved == 0:
+            rows.append(self._emit(self._pending.popleft()))
+        return rows
+
+    def _emit(self, row: _PendingRow) -> np.ndarray:
+        ext = self.extractor
+        window = ext.window
+        t = self._emitted
+        self._emitted += 1
+
+        means, stds, mins, maxs = [], [], [], []
+        for j, value in enumerate(row.values):
+            valid = value == value
+            if valid:
+                if self._ref[j] is None:
+                    self._ref[j] = value
+                shifted = value - self._ref[j]
+                self._sum[j] += shifted
+                self._sq[j] += shifted * shifted
+                self._valid[j] += 1
+
+                min_dq = self._min_dq[j]
+                while min_dq and min_dq[-1][1] >= value:
+                    min_dq.pop()
+                min_dq.append((t, value))
+                max_dq = self._max_dq[j]
+                while max_dq and max_dq[-1][1] <= value:
+                    max_dq.pop()
+                max_dq.append((t, value))
+
+            self._sum_hist[j].append(self._sum[j])
+            self._sq_hist[j].append(self._sq[j])
+            self._valid_hist[j].append(self._valid[j])
+            for dq in (self._min_dq[j], self._max_dq[j]):
+                while dq and dq[0][0] <= t - window:
+                    dq.popleft()
+
+            # History deques hold prefix sums up to (and excluding) the window start
+            count = self._valid_hist[j][-1] - self._valid_hist[j][0]
+            if count > 0:
+                window_sum = self._sum_hist[j][-1] - self._sum_hist[j][0]
+                window_sq = self._sq_hist[j][-1] - self._sq_hist[j][0]
+                mean_shift = window_sum / count
+                var = window_sq / count - mean_shift * mean_shift
+                means.append(self._ref[j] + mean_shift)
+                stds.append(math.sqrt(max(var, 0.0)))
+                mins.append(self._min_dq[j][0][1])
+                maxs.append(self._max_dq[j][0][1])
+            else:
+                means.append(np.nan)
+                stds.append(np.nan)
+                mins.append(np.nan)
+                maxs.append(np.nan)
+
+        by_stat = {"mean": means, "std": stds, "min": mins, "max": maxs}
+        output = list(row.values)
+        for stat in ext.stats:
+            output.extend(by_stat[stat])
+
+        if ext.time_features:
+            ts = row.timestamp
+            since_last = 0.0 if self._last_timestamp is None else ts - self._last_timestamp
+            self._last_timestamp = ts
+            output.extend([
+                (ts % SECONDS_PER_DAY) / 3600.0,
+                (ts // SECONDS_PER_DAY + 3.0) % 7.0,
+                since_last
+            ])
+
+        return np.array(output, dtype=np.float64)
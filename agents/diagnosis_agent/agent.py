@@ -7,6 +7,12 @@ import os
 from crewai import Agent, Task, Crew
 from langchain_openai import ChatOpenAI
 
+from agents.diagnosis_agent.dtc_analyzer import get_dtc_index, extract_codes
+from agents.diagnosis_agent.rule_engine import DiagnosisRuleEngine, format_diagnosis
+from agents.diagnosis_agent.similarity_cache import get_similarity_cache, report_confidence
+from utils.config import load_config
+from utils.streaming import agent_system_prompt, stream_text
+
 class DiagnosisAgent:
     """Agent for diagnosing vehicle issues and predicting failures"""
     
@@ -24,6 +30,12 @@ class DiagnosisAgent:
             llm=self.llm,
             verbose=True
         )
+        
+        self.rule_engine = DiagnosisRuleEngine()
+        
+        config = load_config("agents_config").get("agents", {}).get("diagnosis_agent", {})
+        self.similarity_cache = get_similarity_cache() \
+            if config.get("similarity_cache_enabled", True) else None
     
     def diagnose(self, analysis_result, vehicle_info):
         """
@@ -32,16 +44,96 @@ class DiagnosisAgent:
         Args:
             analysis_result: Analysis output from Data Analysis Agent
             vehicle_info: Dictionary with model, year, type
+                (optional sensor_data and dtc_codes enable the rule-based fast path)
             
         Returns:
             Diagnosis report with failure predictions and cost estimates
         """
+        dtc_codes = self._dtc_codes(analysis_result, vehicle_info)
+        local = self._local_diagnosis(vehicle_info, dtc_codes)
+        if local:
+            return self._with_dtc_reference(local, dtc_codes)
+        
+        task = Task(
+            description=self._task_description(analysis_result, vehicle_info),
+            agent=self.agent,
+            expected_output="Detailed diagnosis with component-specific predictions and cost estimates"
+        )
+        
+        crew = Crew(
+            agents=[self.agent],
+            tasks=[task],
+            verbose=False
+        )
+        
+        result = str(crew.kickoff())
+        self._remember(vehicle_info, result, dtc_codes)
+        return self._with_dtc_reference(result, dtc_codes)
+    
+    def diagnose_stream(self, analysis_result, vehicle_info):
+        """
+        Stream the diagnosis report token by token
+        
+        Local fast paths yield the whole report at once. A streamed LLM
+        report is only added to the similarity cache if it was read to the
+        end; closing the generator early stops generation.
+        
+        Yields:
+            Text chunks of the diagnosis report
+        """
+        dtc_codes = self._dtc_codes(analysis_result, vehicle_info)
+        local = self._local_diagnosis(vehicle_info, dtc_codes)
+        if local:
+            yield self._with_dtc_reference(local, dtc_codes)
+            return
+        
+        parts = []
+        for chunk in stream_text(self.llm, agent_system_prompt(self.agent),
+                                 self._task_description(analysis_result, vehicle_info)):
+            parts.append(chunk)
+            yield chunk
+        result = "".join(parts)
+        self._remember(vehicle_info, result, dtc_codes)
+        reference = self._with_dtc_reference(result, dtc_codes)[len(result):]
+        if reference:
+            yield reference
+    
+    @staticmethod
+    def _dtc_codes(analysis_result, vehicle_info):
+        """Trouble codes from vehicle_info plus any mentioned in the analysis"""
+        return list(dict.fromkeys(
+            list(vehicle_info.get("dtc_codes", [])) + extract_codes(analysis_result)
+        ))
+    
+    def _local_diagnosis(self, vehicle_info, dtc_codes):
+        """Diagnosis without the LLM, or None if the case needs one"""
+        # Routine single-fault cases are answered from the signature table
+        fast_result = self.rule_engine.evaluate(
+            vehicle_info.get("sensor_data"), vehicle_info.get("type", "Unknown"), dtc_codes
+        )
+        if fast_result:
+            return format_diagnosis(fast_result)
+        
+        # Vehicles with a near-identical sensor profile reuse a past diagnosis
+        sensor_data = vehicle_info.get("sensor_data")
+        if self.similarity_cache and sensor_data:
+            cached = self.similarity_cache.lookup(vehicle_info, sensor_data, dtc_codes)
+            if cached:
+                return cached["diagnosis"]
+        return None
+    
+    def _remember(self, vehicle_info, result, dtc_codes):
+        sensor_data = vehicle_info.get("sensor_data")
+        if self.similarity_cache and sensor_data:
+            self.similarity_cache.add(vehicle_info, sensor_data, result,
+                                      confidence=report_confidence(result), dtc_codes=dtc_codes)
+    
+    @staticmethod
+    def _task_description(analysis_result, vehicle_info):
         model = vehicle_info.get("model", "Unknown")
         year = vehicle_info.get("year", "Unknown")
         vehicle_type = vehicle_info.get("type", "Unknown")
-        
-        task = Task(
-            description=f"""
+        return f"""
             Based on this analysis: {analysis_result}
             
             For vehicle: {model} ({year}) - {vehicle_type}
@@ -53,25 +145,21 @@ class DiagnosisAgent:
             4. Estimated Repair Cost: [in INR - Indian Rupees]
             5. Safety Risk: LOW/MEDIUM/HIGH
             6. Urgency: Can wait / Schedule soon / Immediate
+            7. Confidence: [percentage, how sure you are of this diagnosis]
             
             Cost Guidelines (India):
             - Brake pads: ₹3,000-6,000
             - Oil change: ₹2,000-4,000
             - Battery replacement: ₹8,000-15,000
             - EV battery service: ₹25,000-50,000
-            """,
-            agent=self.agent,
-            expected_output="Detailed diagnosis with component-specific predictions and cost estimates"
-        )
-        
-        crew = Crew(
-            agents=[self.agent],
-            tasks=[task],
-            verbose=False
-        )
-        
-        result = crew.kickoff()
-        return str(result)
+            """
+    
+    def _with_dtc_reference(self, report, dtc_codes):
+        """Append locally resolved DTC descriptions (no extra LLM tokens)"""
+        dtc_reference = get_dtc_index().format_reference(dtc_codes)
+        if dtc_reference:
+            return f"{report}\n\n{dtc_reference}"
+        return report
 
 
 if __name__ == "__main__":
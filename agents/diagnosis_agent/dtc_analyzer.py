@@ -0,0 +1,163 @@
+"""
+DTC Analyzer
+Indexed lookup of diagnostic trouble codes (DTCs)
+
+The definitions file (agents_config.yaml `dtc_database_path`) is loaded
+once into sorted parallel tuples:
+- exact lookups go through a code -> row dictionary
+- prefix/family queries (e.g. "P02xx") bisect the sorted code list
+- codes missing from the file are still classified by their SAE J2012
+  family into the ml_config `dtc_classifier` classes
+"""
+
+import json
+import re
+from bisect import bisect_left
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+from utils.config import load_config
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent
+DTC_PATTERN = re.compile(r"\b([PCBU][0-3][0-9A-F]{3})\b", re.IGNORECASE)
+
+# SAE J2012 code families -> dtc_classifier classes (longest prefix wins)
+FAMILY_CLASSES = {
+    "P00": "emissions",
+    "P01": "engine",
+    "P02": "engine",
+    "P03": "engine",
+    "P04": "emissions",
+    "P05": "electrical",
+    "P06": "electrical",
+    "P07": "transmission",
+    "P08": "transmission",
+    "P09": "transmission",
+    "P0A": "electrical",
+    "P0B": "electrical",
+    "P": "engine",
+    "C": "brakes",
+    "B": "electrical",
+    "U": "electrical",
+}
+
+
+class DTCIndex:
+    """Compact, read-only index over DTC definitions"""
+
+    def __init__(self, definitions: Dict[str, Dict[str, str]]):
+        codes = sorted(code.upper() for code in definitions)
+        by_code = {code.upper(): info for code, info in definitions.items()}
+        self._codes = tuple(codes)
+        self._descriptions = tuple(by_code[c].get("description", "") for c in codes)
+        self._severities = tuple(by_code[c].get("severity", "medium") for c in codes)
+        self._categories = tuple(by_code[c].get("category") or self._family_class(c) for c in codes)
+        self._rows = {code: row for row, code in enumerate(codes)}
+
+    @classmethod
+    def from_file(cls, path: Path) -> "DTCIndex":
+        """Load the index from a dtc_definitions.json file"""
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        return cls(data.get("codes", data))
+
+    def __len__(self) -> int:
+        return len(self._codes)
+
+    def __contains__(self, code: str) -> bool:
+        return code.upper() in self._rows
+
+    @staticmethod
+    def _family_class(code: str) -> Optional[str]:
+        for length in (3, 1):
+            category = FAMILY_CLASSES.get(code[:length])
+            if category:
+                return category
+        return None
+
+    def _entry(self, row: int) -> Dict[str, str]:
+        return {
+            "code": self._codes[row],
+            "description": self._descriptions[row],
+            "category": self._categories[row],
+            "severity": self._severities[row]
+        }
+
+    def lookup(self, code: str) -> Optional[Dict[str, str]]:
+        """
+        Resolve a single code
+
+        Args:
+            code: DTC such as 'P0217'
+
+        Returns:
+            Dict with code, description, category and severity, or None
+        """
+        row = self._rows.get(code.strip().upper())
+        return None if row is None else self._entry(row)
+
+    def classify(self, code: str) -> Optional[str]:
+        """Map a code to a dtc_classifier class, known or not"""
+        code = code.strip().upper()
+        row = self._rows.get(code)
+        if row is not None:
+            return self._categories[row]
+        return self._family_class(code)
+
+    def family(self, pattern: str) -> List[Dict[str, str]]:
+        """
+        All known codes in a family
+
+        Args:
+            pattern: Prefix with optional trailing wildcards, e.g. 'P02xx',
+                'P02' or 'C'
+
+        Returns:
+            Matching entries in code order
+        """
+        prefix = pattern.strip().upper().rstrip("X*")
+        start = bisect_left(self._codes, prefix)
+        # Every code with this prefix sorts before prefix + a char above 'Z'
+        end = bisect_left(self._codes, prefix + "~", lo=start)
+        return [self._entry(row) for row in range(start, end)]
+
+    def resolve(self, codes: Iterable[str]) -> List[Dict[str, str]]:
+        """Resolve several codes; unknown codes keep their family class"""
+        resolved = []
+        for code in codes:
+            entry = self.lookup(code)
+            if entry is None:
+                code = code.strip().upper()
+                entry = {"code": code, "description": "Unknown code",
+                         "category": self._family_class(code), "severity": "unknown"}
+            resolved.append(entry)
+        return resolved
+
+    def format_reference(self, codes: Iterable[str]) -> str:
+        """Human-readable DTC reference block for a diagnosis report"""
+        lines = [
+            f"- {e['code']}: {e['description']} ({e['category']}, severity: {e['severity']})"
+            for e in self.resolve(codes)
+        ]
+        return "DTC Reference:\n" + "\n".join(lines) if lines else ""
+
+
+def extract_codes(text: str) -> List[str]:
+    """Find DTCs mentioned in free text, in order of first appearance"""
+    seen = []
+    for match in DTC_PATTERN.findall(text or ""):
+        code = match.upper()
+        if code not in seen:
+            seen.append(code)
+    return seen
+
+
+@lru_cache(maxsize=1)
+def get_dtc_index() -> DTCIndex:
+    """Shared index loaded from agents_config.yaml `dtc_database_path`"""
+    config = load_config("agents_config").get("agents", {}).get("diagnosis_agent", {})
+    path = Path(config.get("dtc_database_path", "data/dtc_codes/dtc_definitions.json"))
+    if not path.is_absolute():
+        path = PROJECT_ROOT / path
+    return DTCIndex.from_file(path)
@@ -0,0 +1,233 @@
+"""
+Diagnosis Rule Engine
+Deterministic fast path for well-known failure signatures
+
+Routine cases (a single worn-brake, low-oil-pressure, weak-battery or EV
+thermal signature, or a healthy vehicle) are diagnosed from a fixed table
+using the same thresholds and cost guidelines as the LLM prompts. Cases
+with several signatures, a reading out of range in a way the matched
+signature does not explain, a sensor the table does not know, or no
+sensor data return None so the caller falls back to the LLM.
+"""
+
+from typing import Any, Dict, Iterable, List, Optional
+
+# Normal operating ranges (same as the Data Analysis Agent thresholds)
+NORMAL_RANGES = {
+    "ICE": {
+        "engine_temp": (80, 90),
+        "oil_pressure": (40, 60),
+        "battery_voltage": (12.6, 14.4),
+        "brake_wear": (0, 50),
+    },
+    "EV": {
+        "battery_soh": (85, 100),
+        "battery_temp": (20, 45),
+        "motor_temp": (0, 80),
+        "brake_wear": (0, 50),
+    },
+}
+
+# Other reported sensors: checked too, but not part of the similarity
+# profile. A sensor in neither table sends the case to the LLM.
+SECONDARY_RANGES = {
+    "ICE": {
+        "coolant_level": (60, 100),
+        "tire_pressure": (30, 36),
+    },
+    "EV": {
+        "range_remaining": (0, float("inf")),
+        "charging_cycles": (0, 1500),
+    },
+}
+
+# Known signatures: a sensor condition per severity level, plus the
+# DTCs that confirm it. Costs follow the Indian cost guidelines.
+SIGNATURES = [
+    {
+        "name": "worn_brakes",
+        "vehicle_types": ("ICE", "EV"),
+        "sensors": {"brake_wear": {"critical": (">", 75), "warning": (">", 50)}},
+        "dtc_families": ("C",),
+        "component": "Brake pads",
+        "cost_range": (3000, 6000),
+        "critical": {"probability": 85, "time_to_failure": "7-10 days",
+                     "safety_risk": "HIGH", "urgency": "Immediate"},
+        "warning": {"probability": 40, "time_to_failure": "4-6 weeks",
+                    "safety_risk": "MEDIUM", "urgency": "Schedule soon"},
+    },
+    {
+        "name": "low_oil_pressure",
+        "vehicle_types": ("ICE",),
+        "sensors": {"oil_pressure": {"critical": ("<", 30), "warning": ("<", 40)}},
+        "dtc_codes": ("P0520", "P0522", "P0524"),
+        "component": "Engine oil / oil pump",
+        "cost_range": (2000, 4000),
+        "critical": {"probability": 80, "time_to_failure": "3-7 days",
+                     "safety_risk": "HIGH", "urgency": "Immediate"},
+        "warning": {"probability": 45, "time_to_failure": "2-3 weeks",
+                    "safety_risk": "MEDIUM", "urgency": "Schedule soon"},
+    },
+    {
+        "name": "weak_12v_battery",
+        "vehicle_types": ("ICE",),
+        "sensors": {"battery_voltage": {"critical": ("<", 12.0), "warning": ("<", 12.6)}},
+        "dtc_codes": ("P0560", "P0562", "B1318"),
+        "component": "12V battery",
+        "cost_range": (8000, 15000),
+        "critical": {"probability": 80, "time_to_failure": "1-2 weeks",
+                     "safety_risk": "MEDIUM", "urgency": "Immediate"},
+        "warning": {"probability": 50, "time_to_failure": "4-8 weeks",
+                    "safety_risk": "LOW", "urgency": "Schedule soon"},
+    },
+    {
+        "name": "ev_battery_thermal",
+        "vehicle_types": ("EV",),
+        "sensors": {
+            "battery_temp": {"critical": (">", 60), "warning": (">", 45)},
+            "battery_soh": {"critical": ("<", 70), "warning": ("<", 85)},
+        },
+        "dtc_codes": ("P0A7E", "P0A80", "P0AA6"),
+        "component": "EV battery pack / thermal management",
+        "cost_range": (25000, 50000),
+        "critical": {"probability": 75, "time_to_failure": "1-2 weeks",
+                     "safety_risk": "HIGH", "urgency": "Immediate"},
+        "warning": {"probability": 45, "time_to_failure": "1-2 months",
+                    "safety_risk": "MEDIUM", "urgency": "Schedule soon"},
+    },
+]
+
+LEVELS = ("critical", "warning")
+
+
+def _breaches(value: float, condition: tuple) -> bool:
+    op, threshold = condition
+    return value > threshold if op == ">" else value < threshold
+
+
+class DiagnosisRuleEngine:
+    """Table-driven diagnosis for routine single-fault cases"""
+
+    def __init__(self, signatures: Optional[List[Dict[str, Any]]] = None):
+        self.signatures = signatures or SIGNATURES
+        self._ranges = {
+            vehicle_type: dict(ranges, **SECONDARY_RANGES.get(vehicle_type, {}))
+            for vehicle_type, ranges in NORMAL_RANGES.items()
+        }
+
+    def evaluate(self, sensor_data: Dict[str, float], vehicle_type: str,
+                 dtc_codes: Iterable[str] = ()) -> Optional[Dict[str, Any]]:
+        """
+        Diagnose a routine case without the LLM
+
+        Args:
+            sensor_data: Latest sensor readings
+            vehicle_type: 'ICE' or 'EV'
+            dtc_codes: Active trouble codes
+
+        Returns:
+            Structured diagnosis, or None when the case is ambiguous
+        """
+        vehicle_type = (vehicle_type or "").upper()
+        if not sensor_data or vehicle_type not in NORMAL_RANGES:
+            return None
+
+        matches = []
+        for sig in self.signatures:
+            if vehicle_type not in sig["vehicle_types"]:
+                continue
+            level = self._level(sig, sensor_data)
+            if level:
+                matches.append((sig, level))
+        if len(matches) > 1:
+            return None
+
+        # Readings out of range (either bound) that the matched signature does
+        # not explain, and sensors the table does not know, need the LLM
+        ranges = self._ranges[vehicle_type]
+        for sensor, value in sensor_data.items():
+            if sensor not in ranges:
+                return None
+            low, high = ranges[sensor]
+            if value is None or low <= value <= high:
+                continue
+            if not matches or not self._explains_reading(matches[0][0], sensor, value):
+                return None
+
+        codes = [code.upper() for code in dtc_codes]
+        if not matches:
+            return self._healthy() if not codes else None
+
+        sig, level = matches[0]
+        if any(not self._explains(sig, code) for code in codes):
+            return None
+        outcome = sig[level]
+        return {
+            "source": "rule_engine",
+            "signature": sig["name"],
+            "level": level,
+            "primary_issue": sig["component"],
+            "evidence": self._evidence(sig, sensor_data),
+            "failure_probability": outcome["probability"],
+            "time_to_failure": outcome["time_to_failure"],
+            "cost_range": sig["cost_range"],
+            "safety_risk": outcome["safety_risk"],
+            "urgency": outcome["urgency"],
+        }
+
+    @staticmethod
+    def _level(sig: Dict[str, Any], sensor_data: Dict[str, float]) -> Optional[str]:
+        for level in LEVELS:
+            for sensor, conditions in sig["sensors"].items():
+                value = sensor_data.get(sensor)
+                if value is not None and _breaches(value, conditions[level]):
+                    return level
+        return None
+
+    @staticmethod
+    def _explains_reading(sig: Dict[str, Any], sensor: str, value: float) -> bool:
+        # The warning condition is the signature's side of the normal range
+        conditions = sig["sensors"].get(sensor)
+        return conditions is not None and _breaches(value, conditions["warning"])
+
+    @staticmethod
+    def _explains(sig: Dict[str, Any], code: str) -> bool:
+        return code in sig.get("dtc_codes", ()) or \
+            any(code.startswith(family) for family in sig.get("dtc_families", ()))
+
+    @staticmethod
+    def _evidence(sig: Dict[str, Any], sensor_data: Dict[str, float]) -> str:
+        return ", ".join(
+            f"{sensor.replace('_', ' ')} {sensor_data[sensor]}"
+            for sensor in sig["sensors"] if sensor in sensor_data
+        )
+
+    @staticmethod
+    def _healthy() -> Dict[str, Any]:
+        return {
+            "source": "rule_engine",
+            "signature": "healthy",
+            "level": "normal",
+            "primary_issue": "No component at risk",
+            "evidence": "all readings within normal range",
+            "failure_probability": 5,
+            "time_to_failure": "No failure expected before next scheduled service",
+            "cost_range": (0, 0),
+            "safety_risk": "LOW",
+            "urgency": "Can wait",
+        }
+
+
+def format_diagnosis(result: Dict[str, Any]) -> str:
+    """Render a rule-engine diagnosis in the same shape as the LLM report"""
+    low, high = result["cost_range"]
+    cost = f"₹{low:,}-{high:,}" if high else "No repair needed"
+    return "\n".join([
+        f"1. Primary Issue: {result['primary_issue']} ({result['evidence']})",
+        f"2. Failure Probability: {result['failure_probability']}%",
+        f"3. Time to Failure: {result['time_to_failure']}",
+        f"4. Estimated Repair Cost: {cost}",
+        f"5. Safety Risk: {result['safety_risk']}",
+        f"6. Urgency: {result['urgency']}",
+    ])
+
@@ -0,0 +1,248 @@
+"""
+Diagnosis Similarity Cache
+Reuses past diagnoses for vehicles with nearly identical sensor profiles
+
+Entries are partitioned by vehicle type, model, active DTCs and the
+secondary sensors reported (tire pressure, coolant level, ...). Within a
+partition each sensor profile, primary and secondary readings alike, is
+scaled by its normal operating range (so 1.0 = the width of the normal
+band) and kept in a numpy matrix; a
+lookup is one vectorized distance computation against that matrix.
+Everything stays in process memory, so it works fully offline.
+
+A reused report is adapted to the new vehicle: its model year and the
+sensor readings it quotes are replaced by the new vehicle's values.
+"""
+
+import re
+import threading
+import time
+from collections import deque
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+
+from agents.diagnosis_agent.rule_engine import NORMAL_RANGES, SECONDARY_RANGES
+from utils.config import load_config
+
+_CONFIDENCE_PATTERN = re.compile(r"Confidence[\s*:]*(\d+(?:\.\d+)?)\s*%", re.IGNORECASE)
+
+
+def report_confidence(diagnosis: str) -> Optional[float]:
+    """Confidence (0-1) a report states for itself ("Confidence: 85%"), or None"""
+    match = _CONFIDENCE_PATTERN.search(diagnosis or "")
+    if not match:
+        return None
+    return min(float(match.group(1)) / 100, 1.0)
+
+
+def _number(value: Any) -> str:
+    return f"{value:g}" if isinstance(value, float) else str(value)
+
+
+def adapt_diagnosis(diagnosis: str, source_vehicle: Dict[str, Any], source_sensors: Dict[str, float],
+                    vehicle_info: Dict[str, Any], sensor_data: Dict[str, float]) -> str:
+    """
+    Rewrite a stored report for another vehicle
+
+    The model year and every reading quoted after its sensor name
+    ("brake wear 80", "Low oil pressure (28 PSI)") are replaced by the
+    new vehicle's values.
+    """
+    text = diagnosis
+    old_year, new_year = source_vehicle.get("year"), vehicle_info.get("year")
+    if old_year and new_year and old_year != new_year:
+        text = re.sub(rf"(?<![\d,.]){re.escape(str(old_year))}(?![\d,])", str(new_year), text)
+    for sensor, old in source_sensors.items():
+        new = sensor_data.get(sensor)
+        if new is None or new == old:
+            continue
+        label = r"[\s_]".join(map(re.escape, sensor.split("_")))
+        text = re.sub(rf"(\b{label}\b[^\d\n]{{0,20}}){re.escape(_number(old))}(?![\d.])",
+                      lambda match: match.group(1) + _number(new), text, flags=re.IGNORECASE)
+    return text
+
+
+class _Partition:
+    """Growable matrix of sensor vectors plus their diagnoses"""
+
+    def __init__(self, dims: int, capacity: int = 64):
+        self.vectors = np.empty((capacity, dims), dtype=np.float64)
+        self.entries: List[Dict[str, Any]] = []
+
+    def add(self, vector: np.ndarray, entry: Dict[str, Any]):
+        n = len(self.entries)
+        if n == self.vectors.shape[0]:
+            grown = np.empty((n * 2, self.vectors.shape[1]), dtype=np.float64)
+            grown[:n] = self.vectors
+            self.vectors = grown
+        self.vectors[n] = vector
+        self.entries.append(entry)
+
+    def nearest(self, vector: np.ndarray):
+        n = len(self.entries)
+        if n == 0:
+            return None, None
+        distances = np.sqrt(((self.vectors[:n] - vector) ** 2).mean(axis=1))
+        row = int(distances.argmin())
+        return row, float(distances[row])
+
+
+class DiagnosisSimilarityCache:
+    """Nearest-neighbour cache of diagnoses keyed by sensor signature"""
+
+    def __init__(self, max_distance: Optional[float] = None,
+                 min_confidence: Optional[float] = None,
+                 max_entries_per_partition: int = 10000):
+        """
+        Initialize the cache (defaults come from agents_config.yaml)
+
+        Args:
+            max_distance: Largest RMS distance, in normal-range widths,
+                at which a stored diagnosis may be reused
+            min_confidence: Minimum confidence of a reused diagnosis
+            max_entries_per_partition: New entries beyond this are ignored
+        """
+        config = load_config("agents_config").get("agents", {}).get("diagnosis_agent", {})
+        self.max_distance = config.get("similarity_max_distance", 0.1) \
+            if max_distance is None else max_distance
+        self.min_confidence = config.get("prediction_confidence_threshold", 0.75) \
+            if min_confidence is None else min_confidence
+        self.max_entries = max_entries_per_partition
+
+        self._partitions: Dict[tuple, _Partition] = {}
+        self._lock = threading.Lock()
+        self.lookups = 0
+        self.hits = 0
+        self._latencies_us: deque = deque(maxlen=1000)
+
+    @staticmethod
+    def _key(vehicle_info: Dict[str, Any], dtc_codes: Iterable[str]) -> tuple:
+        return (
+            str(vehicle_info.get("type", "")).upper(),
+            str(vehicle_info.get("model", "")).lower(),
+            tuple(sorted(code.upper() for code in dtc_codes))
+        )
+
+    @staticmethod
+    def _profile(vehicle_type: str, sensor_data: Dict[str, float]):
+        """(secondary sensors present, scaled vector), or (None, None) without every primary reading"""
+        ranges = NORMAL_RANGES.get(vehicle_type)
+        if not ranges or not all(sensor in sensor_data for sensor in ranges):
+            return None, None
+        # Secondary sensors without a finite band (e.g. range remaining) cannot be scaled
+        secondary = {sensor: (low, high) for sensor, (low, high) in SECONDARY_RANGES.get(vehicle_type, {}).items()
+                     if sensor in sensor_data and np.isfinite(high - low)}
+        vector = np.array([
+            (sensor_data[sensor] - low) / (high - low)
+            for sensor, (low, high) in sorted(dict(ranges, **secondary).items())
+        ], dtype=np.float64)
+        return tuple(sorted(secondary)), vector
+
+    def lookup(self, vehicle_info: Dict[str, Any], sensor_data: Dict[str, float],
+               dtc_codes: Iterable[str] = ()) -> Optional[Dict[str, Any]]:
+        """
+        Find a reusable diagnosis for a sensor profile
+
+        Args:
+            vehicle_info: Dictionary with model and type
+            sensor_data: Latest sensor readings
+            dtc_codes: Active trouble codes
+
+        Returns:
+            Dict with diagnosis (adapted to this vehicle), confidence and
+            distance, or None on a miss
+        """
+        started = time.perf_counter()
+        key = self._key(vehicle_info, dtc_codes)
+        secondary, vector = self._profile(key[0], sensor_data or {})
+        key += (secondary,)
+        result = None
+        with self._lock:
+            self.lookups += 1
+            partition = self._partitions.get(key)
+            if vector is not None and partition is not None:
+                row, distance = partition.nearest(vector)
+                if row is not None and distance <= self.max_distance:
+                    entry = partition.entries[row]
+                    confidence = self._confidence(entry["confidence"], distance)
+                    if confidence >= self.min_confidence:
+                        self.hits += 1
+                        result = dict(entry, confidence=round(confidence, 3), distance=round(distance, 4))
+            self._latencies_us.append((time.perf_counter() - started) * 1e6)
+        if result is None:
+            return None
+        return {
+            "diagnosis": adapt_diagnosis(result["diagnosis"], result["vehicle"], result["sensor_data"],
+                                         vehicle_info, sensor_data),
+            "confidence": result["confidence"],
+            "distance": result["distance"],
+            "source": "similarity_cache"
+        }
+
+    def _confidence(self, stored: Optional[float], distance: float) -> float:
+        """
+        Confidence of reusing an entry at `distance`
+
+        A stated confidence fades to half at max_distance. Without one the
+        confidence comes from the distance alone (1.0 for an identical
+        profile, 0 at max_distance).
+        """
+        closeness = 1.0 - distance / self.max_distance if self.max_distance else 1.0
+        if stored is None:
+            return closeness
+        return stored * (0.5 + 0.5 * closeness)
+
+    def add(self, vehicle_info: Dict[str, Any], sensor_data: Dict[str, float],
+            diagnosis: str, confidence: Optional[float] = None,
+            dtc_codes: Iterable[str] = ()) -> bool:
+        """
+        Store a diagnosis for later reuse
+
+        Args:
+            confidence: Confidence of the diagnosis (0-1); None if unknown,
+                in which case reuse depends on distance alone
+
+        Returns:
+            True if the entry was stored
+        """
+        key = self._key(vehicle_info, dtc_codes)
+        secondary, vector = self._profile(key[0], sensor_data or {})
+        key += (secondary,)
+        if vector is None:
+            return False
+        with self._lock:
+            partition = self._partitions.get(key)
+            if partition is None:
+                partition = self._partitions[key] = _Partition(len(vector))
+            if len(partition.entries) >= self.max_entries:
+                return False
+            partition.add(vector, {
+                "diagnosis": diagnosis,
+                "confidence": confidence,
+                "vehicle": {"model": vehicle_info.get("model"), "year": vehicle_info.get("year")},
+                "sensor_data": dict(sensor_data),
+                "created_at": time.time()
+            })
+        return True
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Hit rate and lookup latency"""
+        with self._lock:
+            latencies = np.array(self._latencies_us) if self._latencies_us else np.zeros(1)
+            return {
+                "entries": sum(len(p.entries) for p in self._partitions.values()),
+                "partitions": len(self._partitions),
+                "lookups": self.lookups,
+                "hits": self.hits,
+                "hit_rate": round(self.hits / self.lookups, 3) if self.lookups else 0.0,
+                "lookup_latency_us_mean": round(float(latencies.mean()), 2),
+                "lookup_latency_us_p95": round(float(np.percentile(latencies, 95)), 2)
+            }
+
+
+@lru_cache(maxsize=1)
+def get_similarity_cache() -> DiagnosisSimilarityCache:
+    """Process-wide cache shared by all DiagnosisAgent instances"""
+    return DiagnosisSimilarityCache()
@@ -7,6 +7,9 @@ import os
 from crewai import Agent, Task, Crew
 from langchain_openai import ChatOpenAI
 
+from agents.feedback_agent.sentiment_analyzer import get_sentiment_analyzer, llm_sentiment
+from agents.feedback_agent.survey_manager import SURVEY_TEMPLATE, render_survey
+
 class FeedbackAgent:
     """Agent for customer feedback collection"""
     
@@ -24,19 +27,34 @@ class FeedbackAgent:
             verbose=True
         )
     
-    def generate_survey(self):
-        """Generate customer satisfaction survey"""
+    def generate_survey(self, language="en", template=None):
+        """
+        Generate customer satisfaction survey
+        
+        Args:
+            language: Language code of the survey text
+            template: Survey template (defaults to SURVEY_TEMPLATE); the
+                questions and their order are kept as given
+        """
+        template = template or SURVEY_TEMPLATE
         task = Task(
-            description="""
-            Generate a post-service satisfaction survey with:
-            1. Service quality rating (1-5)
-            2. Wait time satisfaction (1-5)
-            3. Technician professionalism (1-5)
-            4. Would you recommend us? (Yes/No)
+            description=f"""
+            Write a short, friendly post-service satisfaction survey in language '{language}'.
+            Keep exactly these questions, in this order, with their answer formats:
+            {render_survey(template)}
             """,
             agent=self.agent,
             expected_output="Customer satisfaction survey"
         )
         
         crew = Crew(agents=[self.agent], tasks=[task], verbose=False)
-        return str(crew.kickoff())
\ No newline at end of file
+        return str(crew.kickoff())
+    
+    def analyze_sentiment(self, comments):
+        """
+        Sentiment of survey comments; scored locally, with only the
+        low-confidence ones sent to the LLM in a single call
+        """
+        return get_sentiment_analyzer().analyze(
+            comments, llm_classify=lambda uncertain: llm_sentiment(self.llm, uncertain)
+        )
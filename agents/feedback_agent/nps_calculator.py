@@ -0,0 +1,274 @@
+"""
+NPS Calculator
+Running satisfaction aggregates over ingested survey responses
+
+Each response updates a fixed number of counters: the fleet-wide, service
+center and technician aggregates, each for the response's tumbling time
+window and for all time. An aggregate holds only sums and counts (NPS
+buckets and per-question rating sums), so ingestion is O(1) per response
+and dashboard queries merge a handful of aggregates instead of rescanning
+raw responses, which are not kept.
+
+Timestamps are kept as naive UTC: aware ones are converted, naive ones
+are taken to be UTC already.
+"""
+
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from agents.feedback_agent.survey_manager import SURVEY_TEMPLATE
+from utils.config import load_config
+
+DIMENSIONS = ("all", "center", "technician")
+
+
+def to_utc(when: Any) -> datetime:
+    """Naive UTC datetime from a datetime or ISO string (naive input is taken as UTC)"""
+    if isinstance(when, str):
+        when = datetime.fromisoformat(when)
+    if when.tzinfo is not None:
+        when = when.astimezone(timezone.utc).replace(tzinfo=None)
+    return when
+
+
+def nps(promoters: int, passives: int, detractors: int) -> Optional[float]:
+    """Net Promoter Score (-100..100), None without responses"""
+    total = promoters + passives + detractors
+    return round((promoters - detractors) * 100 / total, 1) if total else None
+
+
+class Aggregate:
+    """Counters for one (dimension, key, window)"""
+
+    __slots__ = ("responses", "promoters", "passives", "detractors", "rating_sums", "rating_counts",
+                 "sentiments")
+
+    def __init__(self):
+        self.responses = 0
+        self.promoters = 0
+        self.passives = 0
+        self.detractors = 0
+        self.rating_sums: Dict[str, float] = {}
+        self.rating_counts: Dict[str, int] = {}
+        self.sentiments: Dict[str, int] = {}
+
+    def add(self, nps_score: Optional[int], ratings: Dict[str, float], sentiment: Optional[str] = None):
+        self.responses += 1
+        if sentiment:
+            self.sentiments[sentiment] = self.sentiments.get(sentiment, 0) + 1
+        if nps_score is not None:
+            if nps_score >= 9:
+                self.promoters += 1
+            elif nps_score >= 7:
+                self.passives += 1
+            else:
+                self.detractors += 1
+        for question, value in ratings.items():
+            self.rating_sums[question] = self.rating_sums.get(question, 0.0) + value
+            self.rating_counts[question] = self.rating_counts.get(question, 0) + 1
+
+    def merge(self, other: "Aggregate"):
+        self.responses += other.responses
+        self.promoters += other.promoters
+        self.passives += other.passives
+        self.detractors += other.detractors
+        for question, value in other.rating_sums.items():
+            self.rating_sums[question] = self.rating_sums.get(question, 0.0) + value
+            self.rating_counts[question] = self.rating_counts.get(question, 0) + other.rating_counts[question]
+        for label, value in other.sentiments.items():
+            self.sentiments[label] = self.sentiments.get(label, 0) + value
+
+    def to_dict(self) -> Dict[str, Any]:
+        scored = self.promoters + self.passives + self.detractors
+        return {
+            "responses": self.responses,
+            "nps": nps(self.promoters, self.passives, self.detractors),
+            "promoters": self.promoters,
+            "passives": self.passives,
+            "detractors": self.detractors,
+            "nps_responses": scored,
+            "mean_ratings": {q: round(self.rating_sums[q] / self.rating_counts[q], 2)
+                             for q in self.rating_sums},
+            "sentiment": dict(self.sentiments),
+        }
+
+
+class FeedbackAggregator:
+    """Incremental NPS and rating aggregates per center, technician and window"""
+
+    def __init__(self, window_hours: float = 24, retention_windows: int = 90,
+                 template: Optional[Dict[str, Any]] = None, max_tracked_ids: int = 100000):
+        """
+        Args:
+            window_hours: Length of a tumbling window
+            retention_windows: Windowed aggregates kept per key (all-time
+                aggregates are always kept)
+            template: Survey template the answers are validated against
+            max_tracked_ids: Recent response ids remembered to drop redeliveries
+        """
+        self.window = timedelta(hours=window_hours)
+        self.retention_windows = retention_windows
+        template = template or SURVEY_TEMPLATE
+        self._questions = {q["id"]: q for q in template["questions"]}
+        self.max_tracked_ids = max_tracked_ids
+        # (dimension, key) -> {window start (None = all time) -> Aggregate}
+        self._aggregates: Dict[Tuple[str, Optional[str]], Dict[Optional[datetime], Aggregate]] = {}
+        self._seen: "OrderedDict[str, None]" = OrderedDict()
+        self._latest_window: Optional[datetime] = None
+        self._lock = threading.Lock()
+
+    def window_start(self, when: datetime) -> datetime:
+        """Start of the tumbling window containing `when`"""
+        epoch = datetime(2000, 1, 1, tzinfo=when.tzinfo)
+        return epoch + ((when - epoch) // self.window) * self.window
+
+    def _parse(self, response: Dict[str, Any]) -> Tuple[datetime, Optional[int], Dict[str, float]]:
+        """Validate one response -> (submitted_at, nps score, ratings)"""
+        submitted = to_utc(response.get("submitted_at") or datetime.now(timezone.utc))
+        nps_score, ratings = None, {}
+        for question_id, value in (response.get("answers") or {}).items():
+            question = self._questions.get(question_id)
+            if question is None or value is None:
+                continue
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                raise ValueError(f"{question_id}: expected a number, got {value!r}")
+            low, high = question.get("scale", (None, None))
+            if low is not None and not low <= value <= high:
+                raise ValueError(f"{question_id}: {value} is outside {low}-{high}")
+            if question["type"] == "nps":
+                if value != int(value):
+                    raise ValueError(f"{question_id}: expected a whole number, got {value!r}")
+                nps_score = int(value)
+            else:
+                ratings[question_id] = float(value)
+        return submitted, nps_score, ratings
+
+    def add(self, response: Dict[str, Any]) -> bool:
+        """
+        Fold one completed survey into the aggregates
+
+        Args:
+            response: Dict with answers ({question_id: value}) and optional
+                response_id, center_id, technician_id, submitted_at and
+                sentiment (label of the comment)
+
+        Returns:
+            False if the response_id was already ingested
+
+        Raises:
+            ValueError: An answer is not valid for its question
+        """
+        submitted, nps_score, ratings = self._parse(response)
+        window = self.window_start(submitted)
+        keys = [("all", None)]
+        if response.get("center_id"):
+            keys.append(("center", response["center_id"]))
+        if response.get("technician_id"):
+            keys.append(("technician", response["technician_id"]))
+
+        response_id = response.get("response_id")
+        with self._lock:
+            if response_id is not None and response_id in self._seen:
+                return False
+            if self._latest_window is None or window > self._latest_window:
+                self._latest_window = window
+                self._prune()
+            # Late responses for windows past retention only count all-time
+            buckets = (None, window) if window >= self._cutoff() else (None,)
+            for key in keys:
+                windows = self._aggregates.setdefault(key, {})
+                for bucket in buckets:
+                    aggregate = windows.get(bucket)
+                    if aggregate is None:
+                        aggregate = windows[bucket] = Aggregate()
+                    aggregate.add(nps_score, ratings, response.get("sentiment"))
+            # Only once counted, so a response that failed can be redelivered
+            if response_id is not None:
+                self._seen[response_id] = None
+                if len(self._seen) > self.max_tracked_ids:
+                    self._seen.popitem(last=False)
+        return True
+
+    def add_many(self, responses: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Ingest a batch; invalid responses are reported, not raised
+
+        Returns:
+            Dict with accepted, duplicates and rejected ([{index, error}])
+        """
+        accepted, duplicates, rejected = 0, 0, []
+        for index, response in enumerate(responses):
+            try:
+                if self.add(response):
+                    accepted += 1
+                else:
+                    duplicates += 1
+            except (ValueError, TypeError) as e:
+                rejected.append({"index": index, "error": str(e)})
+        return {"accepted": accepted, "duplicates": duplicates, "rejected": rejected}
+
+    def _cutoff(self) -> datetime:
+        return self._latest_window - self.window * (self.retention_windows - 1)
+
+    def _prune(self):
+        """Drop windowed aggregates older than the retention (runs once per new window)"""
+        cutoff = self._cutoff()
+        for windows in self._aggregates.values():
+            for start in [s for s in windows if s is not None and s < cutoff]:
+                del windows[start]
+
+    def summary(self, dimension: str = "all", key: Optional[str] = None,
+                since: Optional[datetime] = None, until: Optional[datetime] = None) -> Dict[str, Any]:
+        """
+        Aggregate for one center/technician (or everything)
+
+        Without since/until this is the all-time aggregate; otherwise the
+        windows starting in [window of since, until) are merged. since and
+        until may be aware or naive UTC.
+        """
+        if dimension not in DIMENSIONS:
+            raise ValueError(f"Unknown dimension: {dimension}")
+        since = to_utc(since) if since is not None else None
+        until = to_utc(until) if until is not None else None
+        with self._lock:
+            windows = self._aggregates.get((dimension, None if dimension == "all" else key), {})
+            if since is None and until is None:
+                merged = Aggregate()
+                if None in windows:
+                    merged.merge(windows[None])
+            else:
+                first = self.window_start(since) if since else None
+                merged = Aggregate()
+                for start, aggregate in windows.items():
+                    if start is None or (first and start < first) or (until and start >= until):
+                        continue
+                    merged.merge(aggregate)
+        return dict(merged.to_dict(), dimension=dimension, key=key)
+
+    def series(self, dimension: str = "all", key: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Per-window aggregates, oldest first (window_start in UTC)"""
+        with self._lock:
+            windows = self._aggregates.get((dimension, None if dimension == "all" else key), {})
+            items = sorted((s, a.to_dict()) for s, a in windows.items() if s is not None)
+        return [dict(data, window_start=start.replace(tzinfo=timezone.utc).isoformat()) for start, data in items]
+
+    def leaderboard(self, dimension: str = "center") -> List[Dict[str, Any]]:
+        """All-time aggregates for every center or technician, best NPS first"""
+        with self._lock:
+            rows = [dict(windows[None].to_dict(), key=key)
+                    for (dim, key), windows in self._aggregates.items()
+                    if dim == dimension and None in windows]
+        return sorted(rows, key=lambda r: (r["nps"] is None, -(r["nps"] or 0), -r["responses"]))
+
+
+@lru_cache(maxsize=1)
+def get_feedback_aggregator() -> FeedbackAggregator:
+    """Shared aggregator configured from agents_config.yaml `feedback_agent`"""
+    config = load_config("agents_config").get("agents", {}).get("feedback_agent", {})
+    return FeedbackAggregator(
+        window_hours=config.get("aggregate_window_hours", 24),
+        retention_windows=config.get("aggregate_retention_windows", 90),
+    )
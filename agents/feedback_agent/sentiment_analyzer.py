@@ -0,0 +1,222 @@
+"""
+Sentiment Analyzer
+Local, batched sentiment scoring of survey comments
+
+Comments are scored against a weighted lexicon tuned for service
+feedback, with negation ("not helpful") and intensifiers ("very rude")
+handled over the token stream. Negation stops at the end of a clause
+(punctuation, "but", "though"), and "can't recommend them enough" is
+emphasis, not negation. A batch is tokenized once, token weights
+are looked up with C-level `map` calls into flat numpy arrays, and the
+per-comment sums are a few `bincount`s, so scoring runs at well over ten
+thousand comments per second on one core.
+
+Each comment gets a confidence from how much sentiment evidence it has
+and how one-sided it is. Only comments below `sentiment_confidence_threshold`
+(no known words, or mixed signals) are sent to the LLM, in one batched
+prompt; where no LLM is at hand (`local_labels`) they get no label.
+"""
+
+import re
+from functools import lru_cache
+from itertools import chain, repeat
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from agents.customer_engagement_agent.intent_classifier import tokenize
+from utils.config import load_config
+
+LABELS = ("negative", "neutral", "positive")
+
+LEXICON = {
+    # positive
+    "excellent": 3, "outstanding": 3, "amazing": 3, "fantastic": 3, "perfect": 3, "superb": 3,
+    "great": 2.5, "awesome": 2.5, "wonderful": 2.5, "love": 2.5, "loved": 2.5, "brilliant": 2.5,
+    "good": 2, "like": 1, "liked": 1.5, "happy": 2, "pleased": 2, "satisfied": 2, "recommend": 2, "professional": 2,
+    "friendly": 2, "helpful": 2, "courteous": 2, "polite": 2, "quick": 1.5, "fast": 1.5,
+    "efficient": 2, "smooth": 1.5, "easy": 1.5, "clean": 1.5, "fixed": 1.5, "resolved": 1.5,
+    "thorough": 2, "knowledgeable": 2, "transparent": 1.5, "reasonable": 1.5, "fair": 1,
+    "affordable": 1.5, "prompt": 1.5, "timely": 1.5, "thanks": 1, "thank": 1, "nice": 1.5,
+    "fine": 1, "ok": 0.5, "okay": 0.5, "best": 2.5, "impressed": 2.5, "reliable": 2,
+    "on-time": 1.5, "convenient": 1.5, "explained": 1, "clear": 1, "trust": 1.5,
+    # negative
+    "terrible": -3, "horrible": -3, "awful": -3, "worst": -3, "disgusting": -3, "scam": -3,
+    "rude": -2.5, "useless": -2.5, "incompetent": -2.5, "unprofessional": -2.5, "pathetic": -3,
+    "bad": -2, "poor": -2, "disappointed": -2, "disappointing": -2, "unhappy": -2, "angry": -2.5,
+    "frustrated": -2, "frustrating": -2, "slow": -1.5, "late": -1.5, "delay": -1.5, "delayed": -1.5,
+    "waiting": -1, "waited": -1, "expensive": -1.5, "overpriced": -2, "overcharged": -2.5,
+    "dirty": -2, "broken": -1.5, "damaged": -2, "scratched": -2, "scratch": -1.5, "mess": -2,
+    "ignored": -2, "unresolved": -2, "problem": -1, "issue": -0.5, "complaint": -1.5, "complaints": -1.5, "never": -1,
+    "hidden": -1, "confusing": -1.5, "careless": -2, "worse": -2, "hate": -2.5, "avoid": -2,
+    "noisy": -1, "unclear": -1.5, "lost": -1.5, "wrong": -2, "mistake": -1.5,
+}
+NEGATORS = frozenset({
+    "not", "no", "never", "nothing", "hardly", "without", "cannot", "can't", "won't", "isn't",
+    "wasn't", "weren't", "didn't", "don't", "doesn't", "aren't", "couldn't", "wouldn't", "nor",
+})
+INTENSIFIERS = {
+    "very": 1.5, "really": 1.5, "extremely": 2.0, "super": 1.5, "so": 1.3, "highly": 1.5,
+    "absolutely": 1.6, "totally": 1.5, "incredibly": 1.8, "quite": 1.2, "too": 1.3,
+    "slightly": 0.5, "somewhat": 0.6, "little": 0.6,
+}
+# A negator flips the next NEGATION_SCOPE words of its clause (scaled, as "not good" < "bad")
+NEGATION_SCOPE = 3
+NEGATION_FACTOR = -0.75
+# Modifiers do not reach past these
+CLAUSE_BREAKS = re.compile(r"[.,;:!?]|\b(?:but|though|although|however)\b", re.IGNORECASE)
+
+
+class SentimentAnalyzer:
+    """Lexicon scorer with LLM fallback for low-confidence comments"""
+
+    def __init__(self, lexicon: Optional[Dict[str, float]] = None, confidence_threshold: float = 0.5,
+                 max_llm_comments: int = 50):
+        """
+        Args:
+            lexicon: word -> weight (defaults to LEXICON)
+            confidence_threshold: Below this, a comment goes to the LLM
+            max_llm_comments: Cap on comments escalated per batch
+        """
+        self.lexicon = {word: float(weight) for word, weight in (lexicon or LEXICON).items() if weight}
+        self.confidence_threshold = confidence_threshold
+        self.max_llm_comments = max_llm_comments
+
+    def score(self, comments: Sequence[str]) -> Dict[str, np.ndarray]:
+        """
+        Score a batch locally
+
+        Returns:
+            Dict of arrays aligned with `comments`: polarity (-1..1),
+            confidence (0..1) and label (index into LABELS)
+        """
+        n = len(comments)
+        parts = [CLAUSE_BREAKS.split(c or "") for c in comments]
+        clauses = [tokenize(part) for part in chain.from_iterable(parts)]
+        clause_lengths = np.fromiter(map(len, clauses), dtype=np.intp, count=len(clauses))
+        comment_of_clause = np.repeat(np.arange(n), np.fromiter(map(len, parts), dtype=np.intp, count=n))
+        lengths = np.bincount(comment_of_clause, weights=clause_lengths, minlength=n).astype(np.intp)
+        tokens = list(chain.from_iterable(clauses))
+        size = len(tokens)
+        weights = np.fromiter(map(self.lexicon.get, tokens, repeat(0.0)), dtype=np.float64, count=size)
+        negators = np.fromiter(map(NEGATORS.__contains__, tokens), dtype=bool, count=size)
+        boosts = np.fromiter(map(INTENSIFIERS.get, tokens, repeat(1.0)), dtype=np.float64, count=size)
+        enough = np.fromiter(map("enough".__eq__, tokens), dtype=bool, count=size)
+        doc = np.repeat(np.arange(n), lengths)
+        clause = np.repeat(np.arange(len(clauses)), clause_lengths)
+
+        # "can't thank them enough" is emphasis: that negator flips nothing
+        for shift in range(1, NEGATION_SCOPE + 2):
+            same = clause[shift:] == clause[:-shift]
+            negators[:-shift] &= ~(enough[shift:] & same)
+
+        # Modifiers only reach forward within the same clause
+        factor = np.ones(size)
+        for shift in range(1, NEGATION_SCOPE + 1):
+            flipped = negators[:-shift] & (clause[shift:] == clause[:-shift])
+            factor[shift:][flipped] *= NEGATION_FACTOR
+        boosted = clause[1:] == clause[:-1]
+        factor[1:][boosted] *= boosts[:-1][boosted]
+        weights *= factor
+
+        positive = np.bincount(doc, weights=np.maximum(weights, 0), minlength=n)
+        negative = np.bincount(doc, weights=np.maximum(-weights, 0), minlength=n)
+        evidence = positive + negative
+        polarity = (positive - negative) / (evidence + 1)
+        # One-sided and well supported -> confident; mixed or unknown words -> not
+        agreement = np.abs(positive - negative) / np.maximum(evidence, 1e-9)
+        confidence = agreement * (1 - np.exp(-evidence / 2))
+        label = np.where(polarity > 0.2, 2, np.where(polarity < -0.2, 0, 1))
+        return {"polarity": polarity, "confidence": confidence, "label": label}
+
+    def analyze(self, comments: Sequence[str],
+                llm_classify: Optional[Callable[[List[str]], List[Optional[str]]]] = None
+                ) -> List[Dict[str, Any]]:
+        """
+        Label comments, escalating low-confidence ones to the LLM
+
+        Args:
+            comments: Free-text comments
+            llm_classify: Labels a list of comments in one call (None for
+                local-only scoring); a None label keeps the local one
+
+        Returns:
+            One dict per comment: label, polarity, confidence, source
+        """
+        scored = self.score(comments)
+        results = [
+            {"label": LABELS[label], "polarity": round(polarity, 3), "confidence": round(confidence, 3),
+             "source": "lexicon"}
+            for label, polarity, confidence in zip(scored["label"].tolist(), scored["polarity"].tolist(),
+                                                   scored["confidence"].tolist())
+        ]
+        uncertain = np.flatnonzero(scored["confidence"] < self.confidence_threshold)
+        # Least confident first when the cap applies
+        uncertain = uncertain[np.argsort(scored["confidence"][uncertain], kind="stable")]
+        uncertain = [i for i in uncertain.tolist() if (comments[i] or "").strip()][:self.max_llm_comments]
+        if llm_classify and uncertain:
+            try:
+                labels = llm_classify([comments[i] for i in uncertain])
+            except Exception:
+                labels = []
+            for i, label in zip(uncertain, labels):
+                if label in LABELS:
+                    results[i]["label"] = label
+                    results[i]["source"] = "llm"
+        return results
+
+    def local_labels(self, comments: Sequence[str]) -> List[Optional[str]]:
+        """Lexicon labels without the LLM; None where confidence is below the threshold"""
+        scored = self.score(comments)
+        return [LABELS[label] if confidence >= self.confidence_threshold else None
+                for label, confidence in zip(scored["label"].tolist(), scored["confidence"].tolist())]
+
+
+_LLM_LINE = re.compile(r"^\s*(\d+)\s*[:.)-]\s*(positive|negative|neutral)\b", re.IGNORECASE | re.MULTILINE)
+
+
+def llm_sentiment(llm, comments: Sequence[str]) -> List[Optional[str]]:
+    """Label comments with one LLM call; None where the reply has no label"""
+    numbered = "\n".join(f"{i}. {' '.join(c.split())}" for i, c in enumerate(comments, 1))
+    prompt = (
+        "Classify the sentiment of each customer comment about a vehicle service visit as "
+        "positive, negative or neutral. Answer with one line per comment in the form "
+        f"'<number>: <label>' and nothing else.\n\n{numbered}"
+    )
+    reply = llm.invoke(prompt).content
+    labels: List[Optional[str]] = [None] * len(comments)
+    for number, label in _LLM_LINE.findall(reply):
+        if 1 <= int(number) <= len(comments):
+            labels[int(number) - 1] = label.lower()
+    return labels
+
+
+@lru_cache(maxsize=1)
+def get_sentiment_analyzer() -> SentimentAnalyzer:
+    """Shared analyzer configured from agents_config.yaml `feedback_agent`"""
+    config = load_config("agents_config").get("agents", {}).get("feedback_agent", {})
+    return SentimentAnalyzer(
+        confidence_threshold=config.get("sentiment_confidence_threshold", 0.5),
+        max_llm_comments=config.get("sentiment_max_llm_comments", 50),
+    )
+
+
+if __name__ == "__main__":
+    import random
+    import time
+
+    random.seed(1)
+    phrases = ["the technician was very friendly", "waited three hours, not happy", "great service",
+               "they overcharged me and the car came back dirty", "ok", "not bad at all",
+               "explained everything clearly and fixed the brakes", "the staff were rude",
+               "quick and professional, would recommend", "the coffee machine was new"]
+    comments = [" ".join(random.sample(phrases, random.randint(1, 3))) for _ in range(100000)]
+    analyzer = SentimentAnalyzer()
+    for batch in (1000, 10000, 100000):
+        started = time.perf_counter()
+        for i in range(0, len(comments), batch):
+            scored = analyzer.score(comments[i:i + batch])
+        elapsed = time.perf_counter() - started
+        print(f"batch {batch:>6}: {len(comments) / elapsed:,.0f} comments/sec")
+    scored = analyzer.score(comments)
+    print(f"escalated to LLM: {(scored['confidence'] < analyzer.confidence_threshold).mean():.1%}")
@@ -0,0 +1,178 @@
+"""
+Survey Manager
+Versioned post-service surveys, generated once and served from memory
+
+A survey's questions are fixed by SURVEY_TEMPLATE; the LLM only words
+the survey text. The template version is a hash of its content, so a
+survey is generated once per (template version, language), written to
+`survey_store_dir` and then served from memory with an ETag. Editing the
+template changes the version and triggers exactly one regeneration per
+language; everything else is a dictionary lookup.
+
+The ETag also hashes the served text, so the plain-template fallback and
+a later LLM survey are never mistaken for each other by caches. Only the
+configured `survey_languages` are served, so arbitrary codes cannot run
+up LLM calls or memory.
+"""
+
+import hashlib
+import json
+import os
+import re
+import threading
+from datetime import datetime
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Optional
+
+from utils.config import load_config
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent
+LANGUAGE_PATTERN = re.compile(r"^[a-z]{2,3}(-[A-Za-z0-9]{2,8})?$")
+
+SURVEY_TEMPLATE = {
+    "template_id": "post_service",
+    "title": "Post-Service Satisfaction Survey",
+    "questions": [
+        {"id": "service_quality", "text": "How would you rate the quality of the service?",
+         "type": "rating", "scale": [1, 5]},
+        {"id": "wait_time", "text": "How satisfied were you with the wait time?",
+         "type": "rating", "scale": [1, 5]},
+        {"id": "technician", "text": "How professional was the technician?",
+         "type": "rating", "scale": [1, 5]},
+        {"id": "recommend", "text": "How likely are you to recommend us to a friend?",
+         "type": "nps", "scale": [0, 10]},
+    ],
+}
+
+
+def template_version(template: Dict[str, Any]) -> str:
+    """Content hash of a survey template"""
+    encoded = json.dumps(template, sort_keys=True, ensure_ascii=False).encode("utf-8")
+    return hashlib.sha256(encoded).hexdigest()[:16]
+
+
+def render_survey(template: Dict[str, Any]) -> str:
+    """Plain-text survey straight from the template (no LLM)"""
+    lines = [template["title"], ""]
+    for number, question in enumerate(template["questions"], 1):
+        if question["type"] in ("rating", "nps"):
+            low, high = question["scale"]
+            answer = f"({low}-{high})"
+        else:
+            answer = "(Yes/No)"
+        lines.append(f"{number}. {question['text']} {answer}")
+    return "\n".join(lines)
+
+
+class SurveyManager:
+    """In-memory, file-backed store of generated surveys"""
+
+    def __init__(self, generate: Callable[[Dict[str, Any], str], str],
+                 template: Optional[Dict[str, Any]] = None, store_dir: Optional[Path] = None,
+                 languages: Optional[Iterable[str]] = None):
+        """
+        Args:
+            generate: (template, language) -> survey text; called once per
+                template version and language
+            template: Survey template (defaults to SURVEY_TEMPLATE)
+            store_dir: Where generated surveys are kept across restarts
+                (None keeps them in memory only)
+            languages: Language codes that may be requested (None allows
+                any well-formed code)
+        """
+        self.generate = generate
+        self.template = template or SURVEY_TEMPLATE
+        self.version = template_version(self.template)
+        self.store_dir = Path(store_dir) if store_dir else None
+        self.languages = frozenset(languages) if languages is not None else None
+        self._surveys: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self.generations = 0
+
+    def _path(self, language: str) -> Optional[Path]:
+        if self.store_dir is None:
+            return None
+        return self.store_dir / f"{self.template['template_id']}-{self.version}-{language}.json"
+
+    def get(self, language: str = "en") -> Dict[str, Any]:
+        """
+        Survey for a language, generating it on first use
+
+        Returns:
+            Dict with survey (text), questions, template_id, version,
+            language, etag, generated_at, source and body (the
+            pre-serialized JSON response)
+
+        Raises:
+            ValueError: Not a language code such as 'en' or 'pt-BR', or not
+                one of the configured languages
+        """
+        entry = self._surveys.get(language)
+        if entry is not None:
+            return entry
+        if not LANGUAGE_PATTERN.match(language):
+            raise ValueError(f"Invalid language code: {language!r}")
+        if self.languages is not None and language not in self.languages:
+            raise ValueError(f"Unsupported survey language: {language!r}")
+        with self._lock:
+            # Concurrent first requests wait here instead of each generating
+            entry = self._surveys.get(language)
+            if entry is None:
+                entry = self._load(language) or self._create(language)
+                self._surveys[language] = entry
+        return entry
+
+    def _load(self, language: str) -> Optional[Dict[str, Any]]:
+        path = self._path(language)
+        if path is None or not path.exists():
+            return None
+        with open(path, encoding="utf-8") as f:
+            return self._entry(json.load(f))
+
+    def _create(self, language: str) -> Dict[str, Any]:
+        self.generations += 1
+        try:
+            text, source = self.generate(self.template, language), "llm"
+        except Exception:
+            # Serve the plain template now; it is not stored, so a restart retries the LLM
+            text, source = render_survey(self.template), "template"
+        record = {
+            "survey": text,
+            "questions": self.template["questions"],
+            "template_id": self.template["template_id"],
+            "version": self.version,
+            "language": language,
+            "generated_at": datetime.now().isoformat(),
+            "source": source,
+        }
+        path = self._path(language)
+        if path is not None and source == "llm":
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = path.with_suffix(f".{os.getpid()}.tmp")
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(record, f, indent=2, ensure_ascii=False)
+            os.replace(tmp, path)
+        return self._entry(record)
+
+    @staticmethod
+    def _entry(record: Dict[str, Any]) -> Dict[str, Any]:
+        digest = hashlib.sha256(f'{record["source"]}\n{record["survey"]}'.encode("utf-8")).hexdigest()[:12]
+        entry = dict(record, etag=f'"{record["version"]}-{record["language"]}-{digest}"')
+        entry["body"] = json.dumps({"success": True, **entry}, ensure_ascii=False).encode("utf-8")
+        return entry
+
+
+def _generate_with_agent(template: Dict[str, Any], language: str) -> str:
+    from agents.feedback_agent.agent import FeedbackAgent
+    return FeedbackAgent().generate_survey(language=language, template=template)
+
+
+@lru_cache(maxsize=1)
+def get_survey_manager() -> SurveyManager:
+    """Shared manager using FeedbackAgent and agents_config.yaml `survey_store_dir` and `survey_languages`"""
+    config = load_config("agents_config").get("agents", {}).get("feedback_agent", {})
+    store_dir = Path(config.get("survey_store_dir", "data/surveys"))
+    if not store_dir.is_absolute():
+        store_dir = PROJECT_ROOT / store_dir
+    return SurveyManager(_generate_with_agent, store_dir=store_dir, languages=config.get("survey_languages"))
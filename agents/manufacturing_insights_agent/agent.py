@@ -0,0 +1,82 @@
+"""
+Manufacturing Insights Agent
+Finds failure patterns across the fleet and drafts root-cause and CAPA candidates
+"""
+
+import os
+from crewai import Agent
+from langchain_openai import ChatOpenAI
+
+from agents.manufacturing_insights_agent.failure_aggregator import (
+    build_failure_aggregator, format_insights, get_failure_aggregator
+)
+from agents.manufacturing_insights_agent.pattern_detector import get_pattern_detector
+from utils.mock_data import get_vehicle
+
+class ManufacturingInsightsAgent:
+    """Agent for fleet-level defect analysis"""
+    
+    def __init__(self, failures=None, patterns=None):
+        self.llm = ChatOpenAI(
+            model=os.getenv("OPENAI_MODEL", "gpt-4o-mini"),
+            temperature=0.2
+        )
+        
+        self.agent = Agent(
+            role="Manufacturing Quality Engineer",
+            goal="Identify recurring defects and their root causes",
+            backstory="Expert in root cause analysis and CAPA for vehicle manufacturing",
+            llm=self.llm,
+            verbose=True
+        )
+        # Fleet-wide counts fed by every diagnosis: exact cohorts and bounded sketches
+        self.failures = failures or get_failure_aggregator()
+        self.patterns = patterns or get_pattern_detector()
+    
+    def record_diagnosis(self, vehicle_info, diagnosis):
+        """
+        Count a diagnosis in the fleet aggregates
+        
+        Returns:
+            Insights for cohorts this diagnosis pushed over the threshold
+        """
+        record = dict(vehicle_info, diagnosis=diagnosis)
+        self.patterns.add(record)
+        return self.failures.add(record)
+    
+    def analyze_defects(self, defect_data, summarize=True):
+        """
+        Analyze a batch of defect reports
+        
+        Args:
+            defect_data: Dicts with issue (or component), frequency, and
+                model/year or a vehicle_id to look them up
+            summarize: Add an LLM-written summary to the local report
+        """
+        batch = build_failure_aggregator()
+        records = []
+        for defect in defect_data:
+            vehicle = get_vehicle(defect.get("vehicle_id")) or {}
+            records.append(dict({k: vehicle[k] for k in ("model", "year", "dtc_codes") if k in vehicle},
+                                **defect))
+        batch.add_many(records)
+        
+        # Latest analysis per cohort, largest cohorts first
+        latest = {}
+        for insight in batch.insights:
+            latest[tuple(insight["cohort"].values())] = insight
+        insights = sorted(latest.values(), key=lambda i: -i["failures"])
+        report = format_insights(insights)
+        if not (summarize and insights):
+            return report
+        
+        try:
+            summary = self.llm.invoke(
+                "You are a manufacturing quality engineer. In at most five sentences, summarize "
+                "these fleet failure findings for the plant quality team, naming the most likely "
+                "root causes and which corrective actions to start first. Do not invent data.\n\n"
+                + report
+            ).content
+        except Exception:
+            return report
+        return f"{summary.strip()}\n\n{report}"
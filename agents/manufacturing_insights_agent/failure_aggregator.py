@@ -0,0 +1,473 @@
+"""
+Failure Aggregator
+Columnar fleet-failure counts with threshold-triggered root-cause analysis
+
+Each diagnosis is dictionary-encoded into integer codes for model, year,
+component and DTC and counted into a cube with one row per combination
+seen so far. Ingestion is a few dictionary lookups and an array
+increment; raw diagnoses are not kept. A group-by over any subset of the
+dimensions packs the projected codes into one int64 key and sums the
+counts with `np.unique`/`bincount`, so its cost depends on the number of
+distinct cohorts, not on how many diagnoses have been recorded.
+
+When a (model, year, component) cohort reaches `batch_analysis_threshold`
+failures, and again each time it doubles, the cohort is analysed: a DTC
+or a model year that accounts for most of its failures becomes a
+root-cause candidate, and candidates at `rca_confidence_threshold` get
+CAPA (corrective and preventive action) drafts.
+
+Reports that find nothing to repair are not failures and are skipped.
+A vehicle diagnosed again for the same fault is still one failure:
+FailureReports passes only the first report per (vehicle, component) on
+to the counts and sketches.
+"""
+
+import threading
+from collections import OrderedDict, deque
+from datetime import datetime
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from agents.customer_engagement_agent.script_templates import NO_ISSUE, classify_issues, parse_diagnosis
+from agents.diagnosis_agent.dtc_analyzer import extract_codes, get_dtc_index
+from utils.config import load_config
+
+DIMENSIONS = ("model", "year", "component", "dtc")
+# Cohort cube dimensions; the DTC cube adds "dtc"
+COHORT = DIMENSIONS[:3]
+NO_DTC = "none"
+UNKNOWN = "unknown"
+
+
+@lru_cache(maxsize=4096)
+def component_name(text: Optional[str]) -> str:
+    """Normalized component for an issue description ("Brake wear" -> "brakes", "no_issue" if none)"""
+    text = " ".join((text or "").split())
+    if not text:
+        return UNKNOWN
+    name = classify_issues(text)[0]
+    return text.lower() if name == "general" else name
+
+
+def parse_failure(record: Dict[str, Any]) -> Optional[Tuple[Tuple[Any, Any, str], List[str], int]]:
+    """
+    Validate one diagnosis record
+
+    Returns:
+        ((model, year, component), DTCs or [NO_DTC], count), or None if the
+        report finds nothing to repair
+
+    Raises:
+        ValueError: count is not a positive integer
+    """
+    diagnosis = record.get("diagnosis") or ""
+    issue = (record.get("component") or record.get("issue") or record.get("primary_issue")
+             or parse_diagnosis(diagnosis)["primary_issue"])
+    codes = record.get("dtc_codes")
+    if codes is None:
+        codes = [record["dtc"]] if record.get("dtc") else extract_codes(diagnosis)
+    dtcs = list(dict.fromkeys(c.strip().upper() for c in codes if c and c.strip())) or [NO_DTC]
+    weight = record.get("count", record.get("frequency", 1))
+    if isinstance(weight, bool) or not isinstance(weight, int) or weight < 1:
+        raise ValueError(f"count must be a positive integer, got {weight!r}")
+    year = record.get("year")
+    if isinstance(year, str) and year.isdigit():
+        year = int(year)
+    component = component_name(issue)
+    if component == NO_ISSUE:
+        return None
+    cohort = (record.get("model") or UNKNOWN, year if year is not None else UNKNOWN, component)
+    return cohort, dtcs, weight
+
+
+class FailureReports:
+    """(vehicle, component) pairs already counted, so repeat diagnoses count once"""
+
+    def __init__(self, max_reports: int = 100000):
+        """
+        Args:
+            max_reports: Pairs remembered; past this the oldest are forgotten
+                (and a further report of one would count again)
+        """
+        self.max_reports = max_reports
+        self._seen: "OrderedDict[Tuple[Any, str], None]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def first(self, record: Dict[str, Any]) -> bool:
+        """
+        True if the record is a failure not yet reported for its vehicle
+
+        Records without a vehicle_id (e.g. batch imports) are always new.
+
+        Raises:
+            ValueError: count is not a positive integer
+        """
+        parsed = parse_failure(record)
+        if parsed is None:
+            return False
+        vehicle_id = record.get("vehicle_id")
+        if vehicle_id is None:
+            return True
+        key = (vehicle_id, parsed[0][2])
+        with self._lock:
+            if key in self._seen:
+                return False
+            self._seen[key] = None
+            if len(self._seen) > self.max_reports:
+                self._seen.popitem(last=False)
+        return True
+
+
+class _Dictionary:
+    """Value <-> integer code for one dimension"""
+
+    def __init__(self):
+        self.values: List[Any] = []
+        self.codes: Dict[Any, int] = {}
+
+    def encode(self, value: Any) -> int:
+        code = self.codes.get(value)
+        if code is None:
+            code = self.codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+
+class _Cube:
+    """Growable (cell codes, count) columns with a codes -> cell dictionary"""
+
+    def __init__(self, dims: int, capacity: int = 1024):
+        self.codes = np.empty((capacity, dims), dtype=np.int32)
+        self.counts = np.zeros(capacity, dtype=np.int64)
+        self.cells: Dict[Tuple[int, ...], int] = {}
+
+    def add(self, key: Tuple[int, ...], weight: int) -> int:
+        """Add to a cell and return its new count"""
+        cell = self.cells.get(key)
+        if cell is None:
+            cell = len(self.cells)
+            if cell == len(self.counts):
+                codes = np.empty((cell * 2, self.codes.shape[1]), dtype=np.int32)
+                codes[:cell] = self.codes
+                counts = np.zeros(cell * 2, dtype=np.int64)
+                counts[:cell] = self.counts
+                self.codes, self.counts = codes, counts
+            self.codes[cell] = key
+            self.cells[key] = cell
+        self.counts[cell] += weight
+        return int(self.counts[cell])
+
+    def view(self) -> Tuple[np.ndarray, np.ndarray]:
+        n = len(self.cells)
+        return self.codes[:n], self.counts[:n]
+
+
+class FailureAggregator:
+    """Incremental failure counts by model, year, component and DTC"""
+
+    def __init__(self, threshold: int = 10, confidence_threshold: float = 0.8,
+                 capa_enabled: bool = True, max_insights: int = 1000, dtc_index=None):
+        """
+        Args:
+            threshold: Failures that make a cohort worth analysing
+            confidence_threshold: Root-cause confidence that counts as confident
+                and gets CAPA drafts
+            capa_enabled: Draft corrective/preventive actions
+            max_insights: Most recent insights kept
+            dtc_index: DTC definitions (defaults to the shared DTCIndex)
+        """
+        self.threshold = max(1, threshold)
+        self.confidence_threshold = confidence_threshold
+        self.capa_enabled = capa_enabled
+        self.dtc_index = dtc_index
+        self._dictionaries = {dim: _Dictionary() for dim in DIMENSIONS}
+        self._cohorts = _Cube(len(COHORT))
+        self._dtcs = _Cube(len(DIMENSIONS))
+        # Cohort cell -> failure count of its next analysis
+        self._next_analysis: Dict[int, int] = {}
+        self.insights: "deque[Dict[str, Any]]" = deque(maxlen=max_insights)
+        self.total = 0
+        self._lock = threading.Lock()
+
+    def add(self, record: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """
+        Count one diagnosis (or `count` identical ones)
+
+        Args:
+            record: Dict with model, year, component (or issue/primary_issue,
+                or a diagnosis report to parse it from), dtc_codes and an
+                optional count/frequency
+
+        Returns:
+            Insights triggered by this record (usually none; none for a
+            report that finds nothing to repair)
+
+        Raises:
+            ValueError: count is not a positive integer
+        """
+        return self._count(record) or []
+
+    def _count(self, record: Dict[str, Any]) -> Optional[List[Dict[str, Any]]]:
+        """Insights triggered by the record, None if it is not a failure"""
+        parsed = parse_failure(record)
+        if parsed is None:
+            return None
+        cohort, dtcs, weight = parsed
+        with self._lock:
+            key = tuple(self._dictionaries[dim].encode(value) for dim, value in zip(COHORT, cohort))
+            failures = self._cohorts.add(key, weight)
+            encode_dtc = self._dictionaries["dtc"].encode
+            for dtc in dtcs:
+                self._dtcs.add(key + (encode_dtc(dtc),), weight)
+            self.total += weight
+
+            cell = self._cohorts.cells[key]
+            due = self._next_analysis.get(cell, self.threshold)
+            if failures < due:
+                return []
+            while due <= failures:
+                due *= 2
+            self._next_analysis[cell] = due
+            insight = self._analyze(key, failures)
+            self.insights.append(insight)
+        return [insight]
+
+    def add_many(self, records: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Count a batch; invalid records are reported, not raised
+
+        Returns:
+            Dict with accepted, skipped (reports finding nothing to repair),
+            rejected ([{index, error}]) and insights
+        """
+        accepted, skipped, rejected, insights = 0, 0, [], []
+        for index, record in enumerate(records):
+            try:
+                triggered = self._count(record)
+            except (ValueError, TypeError, AttributeError) as e:
+                rejected.append({"index": index, "error": str(e)})
+                continue
+            if triggered is None:
+                skipped += 1
+            else:
+                insights.extend(triggered)
+                accepted += 1
+        return {"accepted": accepted, "skipped": skipped, "rejected": rejected, "insights": insights}
+
+    def _mask(self, codes: np.ndarray, dims: Sequence[str], where: Dict[str, Any]) -> Optional[np.ndarray]:
+        """Rows matching `where`; None if a filter value was never seen"""
+        mask = np.ones(len(codes), dtype=bool)
+        for dim, value in where.items():
+            code = self._dictionaries[dim].codes.get(value)
+            if code is None:
+                return None
+            mask &= codes[:, dims.index(dim)] == code
+        return mask
+
+    def group_by(self, by: Sequence[str] = ("model",), where: Optional[Dict[str, Any]] = None,
+                 top: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Failure counts per cohort
+
+        Args:
+            by: Dimensions to group on (any of DIMENSIONS, [] for the total)
+            where: Equality filters, e.g. {"model": "Honda City", "year": 2021}
+            top: Largest groups only
+
+        Returns:
+            Rows with the group values, failures and share (of the matching
+            failures), largest first. With "dtc" in `by` or `where` a failure
+            reporting several DTCs counts once per DTC.
+
+        Raises:
+            ValueError: Unknown dimension
+        """
+        by, where = list(by), dict(where or {})
+        for dim in list(by) + list(where):
+            if dim not in DIMENSIONS:
+                raise ValueError(f"Unknown dimension: {dim}")
+        with_dtc = "dtc" in by or "dtc" in where
+        dims = DIMENSIONS if with_dtc else COHORT
+        with self._lock:
+            codes, counts = (self._dtcs if with_dtc else self._cohorts).view()
+            mask = self._mask(codes, dims, where)
+            if mask is None or not mask.any():
+                return []
+            codes, counts = codes[mask], counts[mask]
+            # Mixed-radix key over the grouped columns
+            packed = np.zeros(len(codes), dtype=np.int64)
+            for dim in by:
+                packed = packed * len(self._dictionaries[dim].values) + codes[:, dims.index(dim)]
+            _, first, inverse = np.unique(packed, return_index=True, return_inverse=True)
+            sums = np.bincount(inverse.ravel(), weights=counts).astype(np.int64)
+            order = np.argsort(-sums, kind="stable")[:top]
+            total = int(counts.sum())
+            group_codes = codes[first[order]]
+            values = {dim: [self._dictionaries[dim].values[c] for c in group_codes[:, dims.index(dim)].tolist()]
+                      for dim in by}
+        return [
+            dict({dim: values[dim][i] for dim in by}, failures=failures, share=round(failures / total, 4))
+            for i, failures in enumerate(sums[order].tolist())
+        ]
+
+    def count(self, **where) -> int:
+        """Failures matching the filters (each failure once, unless filtering on dtc)"""
+        rows = self.group_by([], where)
+        return rows[0]["failures"] if rows else 0
+
+    def _analyze(self, key: Tuple[int, ...], failures: int) -> Dict[str, Any]:
+        """Root-cause and CAPA candidates for one cohort (called under the lock)"""
+        model, year, component = (self._dictionaries[dim].values[c] for dim, c in zip(COHORT, key))
+        causes = []
+
+        # One DTC behind most of the cohort's failures
+        codes, counts = self._dtcs.view()
+        in_cohort = np.all(codes[:, :3] == key, axis=1)
+        dtc_codes, dtc_counts = codes[in_cohort, 3], counts[in_cohort]
+        none = self._dictionaries["dtc"].codes.get(NO_DTC)
+        if none is not None:
+            dtc_counts = np.where(dtc_codes == none, 0, dtc_counts)
+        if len(dtc_counts) and dtc_counts.max() > 0:
+            row = int(dtc_counts.argmax())
+            dtc = self._dictionaries["dtc"].values[int(dtc_codes[row])]
+            reported = int(dtc_counts[row])
+            entry = (self.dtc_index or get_dtc_index()).lookup(dtc) if dtc != NO_DTC else None
+            causes.append({
+                "type": "dtc",
+                "dtc": dtc,
+                "description": entry["description"] if entry else "Unknown code",
+                "severity": entry["severity"] if entry else "unknown",
+                "evidence": f"{reported} of {failures} failures report {dtc}",
+                "confidence": round(reported / failures, 3),
+            })
+
+        # Failures of this component on this model concentrated in one model year
+        codes, counts = self._cohorts.view()
+        same_part = (codes[:, 0] == key[0]) & (codes[:, 2] == key[2])
+        model_failures = int(counts[same_part].sum())
+        if model_failures > failures:
+            causes.append({
+                "type": "model_year",
+                "year": year,
+                "evidence": f"{failures} of {model_failures} {model} {component} failures are {year} vehicles",
+                "confidence": round(failures / model_failures, 3),
+            })
+
+        causes.sort(key=lambda c: -c["confidence"])
+        for cause in causes:
+            cause["confident"] = cause["confidence"] >= self.confidence_threshold
+        cohort = {"model": model, "year": year, "component": component}
+        capa = [action for cause in causes if cause["confident"]
+                for action in _capa(cohort, cause)] if self.capa_enabled else []
+        return {
+            "cohort": cohort,
+            "failures": failures,
+            "fleet_share": round(failures / self.total, 4),
+            "root_causes": causes,
+            "confident": any(c["confident"] for c in causes),
+            "capa": capa,
+            "detected_at": datetime.now().isoformat(),
+        }
+
+    def recent_insights(self, limit: int = 20) -> List[Dict[str, Any]]:
+        """Latest insights, newest first"""
+        with self._lock:
+            return list(self.insights)[::-1][:limit]
+
+
+def _capa(cohort: Dict[str, Any], cause: Dict[str, Any]) -> List[Dict[str, str]]:
+    """Draft corrective and preventive actions for a confident root cause"""
+    vehicles = f"{cohort['year']} {cohort['model']}"
+    part = cohort["component"].replace("_", " ")
+    if cause["type"] == "dtc":
+        corrective = (f"Check {vehicles} vehicles for {cause['dtc']} ({cause['description']}) "
+                      f"and repair the {part} at the next service visit")
+        preventive = (f"Engineering review of the {part} circuit behind {cause['dtc']}: "
+                      f"design margin, supplier quality and calibration")
+        if cause.get("severity") in ("high", "critical"):
+            corrective += "; evaluate a service campaign"
+    else:
+        corrective = f"Inspect the {part} on all {vehicles} vehicles in service"
+        preventive = (f"Audit {cohort['year']} {cohort['model']} {part} production: "
+                      f"supplier lots and assembly process changes that year")
+    return [
+        {"type": "corrective", "action": corrective, "root_cause": cause["type"]},
+        {"type": "preventive", "action": preventive, "root_cause": cause["type"]},
+    ]
+
+
+def format_insights(insights: Sequence[Dict[str, Any]]) -> str:
+    """Plain-text report of cohort insights (no LLM)"""
+    if not insights:
+        return "No cohort has reached the analysis threshold."
+    lines = []
+    for insight in insights:
+        cohort = insight["cohort"]
+        lines.append(f"{cohort['year']} {cohort['model']} - {cohort['component']}: "
+                     f"{insight['failures']} failures ({insight['fleet_share']:.0%} of fleet failures)")
+        for cause in insight["root_causes"]:
+            mark = "confident" if cause["confident"] else "tentative"
+            lines.append(f"  Root cause ({mark}, {cause['confidence']:.0%}): {cause['evidence']}")
+        if not insight["root_causes"]:
+            lines.append("  Root cause: no concentration found yet")
+        for action in insight["capa"]:
+            lines.append(f"  {action['type'].capitalize()} action: {action['action']}")
+    return "\n".join(lines)
+
+
+def build_failure_aggregator() -> FailureAggregator:
+    """New aggregator configured from agents_config.yaml `manufacturing_insights_agent`"""
+    config = load_config("agents_config").get("agents", {}).get("manufacturing_insights_agent", {})
+    return FailureAggregator(
+        threshold=config.get("batch_analysis_threshold", 10),
+        confidence_threshold=config.get("rca_confidence_threshold", 0.8),
+        capa_enabled=config.get("capa_auto_generation", True),
+    )
+
+
+@lru_cache(maxsize=1)
+def get_failure_aggregator() -> FailureAggregator:
+    """Shared fleet-wide aggregator"""
+    return build_failure_aggregator()
+
+
+@lru_cache(maxsize=1)
+def get_failure_reports() -> FailureReports:
+    """Shared first-report filter in front of the aggregator and pattern sketches"""
+    return FailureReports()
+
+
+if __name__ == "__main__":
+    import random
+    import time
+    from collections import Counter
+
+    random.seed(7)
+    models = [f"Model {i}" for i in range(40)]
+    components = ["brakes", "engine_oil", "battery_12v", "cooling", "ev_battery", "transmission",
+                  "suspension", "steering", "infotainment", "hvac"]
+    dtcs = ["P0217", "P0524", "P0A7E", "C0035", "P0562", "B1000", "U0100", "P0300", None]
+    size = 1_000_000
+    records = [{"model": random.choice(models), "year": random.randint(2015, 2024),
+                "component": random.choice(components), "dtc": random.choice(dtcs)}
+               for _ in range(size)]
+
+    aggregator = FailureAggregator(threshold=10 ** 9)
+    started = time.perf_counter()
+    for record in records:
+        aggregator.add(record)
+    elapsed = time.perf_counter() - started
+    print(f"ingest: {size / elapsed:,.0f} diagnoses/sec")
+
+    for by, where in ((["model"], None), (["model", "year"], None), (["component", "dtc"], None),
+                      (["year"], {"component": "brakes"})):
+        started = time.perf_counter()
+        rows = aggregator.group_by(by, where, top=5)
+        cube = (time.perf_counter() - started) * 1000
+        started = time.perf_counter()
+        Counter(tuple(r[d] for d in by) for r in records
+                if all(r[d] == v for d, v in (where or {}).items()))
+        scan = (time.perf_counter() - started) * 1000
+        print(f"group by {by} where {where}: {cube:.2f} ms (rescan {scan:.0f} ms), top {rows[0]}")
@@ -0,0 +1,457 @@
+"""
+Pattern Detector
+Fixed-size, mergeable sketches of failure patterns per cohort
+
+Exact counts (failure_aggregator.py) grow with every distinct
+(model, year, component, DTC) combination. For long diagnosis histories
+each (model, year) cohort instead keeps three small sketches, per
+tumbling window and for all time:
+- CountMinSketch of DTC frequencies: never underestimates; overestimates
+  by at most `error` x the cohort's DTC count with probability 1 - `delta`
+  (width e/error, depth ln(1/delta))
+- HyperLogLog of distinct affected vehicles: relative standard error
+  1.04 / sqrt(2 ** precision), e.g. 1.6% at precision 12 (4 KB)
+- SpaceSaving of the top failing components: k counters; every component
+  with more than N/k failures is listed, each count overestimates by at
+  most N/k (the reported `error` is a tighter per-item bound)
+
+Fleet-wide, per-model and per-year sketches are kept alongside the
+(model, year) ones, so a query merges at most `retention_windows` sketches
+of fixed size, however much history has been recorded.
+
+Memory: a sketch is about 15 KB with the defaults (count-min 272 x 5
+int64, 4 KB HyperLogLog, 32 counters), so the detector holds about
+15 KB x (1 + models + years + model-years) x (retention_windows + 1);
+e.g. 40 models over 10 years with 30 windows is about 210 MB at most. Sketches with the same
+parameters merge exactly (element-wise sum or max), so shards and time
+windows can be combined; hashes are keyed BLAKE2b digests, stable across
+processes.
+"""
+
+import heapq
+import math
+import threading
+from datetime import datetime, timedelta
+from functools import lru_cache
+from hashlib import blake2b
+from itertools import count as sequence
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from agents.manufacturing_insights_agent.failure_aggregator import NO_DTC, parse_failure
+from utils.config import load_config
+
+
+def hash64(value: Any, person: bytes = b"") -> int:
+    """Stable 64-bit hash of str(value)"""
+    digest = blake2b(str(value).encode("utf-8"), digest_size=8, person=person).digest()
+    return int.from_bytes(digest, "little")
+
+
+class CountMinSketch:
+    """Approximate frequency counts in width x depth counters"""
+
+    def __init__(self, width: int = 272, depth: int = 5):
+        self.width = width
+        self.depth = depth
+        self.table = np.zeros((depth, width), dtype=np.int64)
+        self.total = 0
+        self._rows = np.arange(depth)
+        self._offsets = self._rows * width
+
+    @classmethod
+    def from_error(cls, error: float = 0.01, delta: float = 0.01) -> "CountMinSketch":
+        """Sketch whose estimates exceed the truth by <= error x total with probability 1 - delta"""
+        return cls(width=math.ceil(math.e / error), depth=math.ceil(math.log(1 / delta)))
+
+    def cells(self, item: Any) -> np.ndarray:
+        """Flat table positions of an item, one per row"""
+        # Double hashing: row i uses column h1 + i * h2
+        h = hash64(item, b"count-min")
+        return self._offsets + ((h & 0xFFFFFFFF) + self._rows * (h >> 32)) % self.width
+
+    def add(self, item: Any, count: int = 1, cells: Optional[np.ndarray] = None):
+        """Count an item (`cells` skips rehashing an item already located)"""
+        self.table.reshape(-1)[self.cells(item) if cells is None else cells] += count
+        self.total += count
+
+    def estimate(self, item: Any) -> int:
+        return int(self.table.reshape(-1)[self.cells(item)].min())
+
+    def merge(self, other: "CountMinSketch"):
+        if self.table.shape != other.table.shape:
+            raise ValueError("Count-min sketches have different dimensions")
+        self.table += other.table
+        self.total += other.total
+
+    @property
+    def max_error(self) -> float:
+        """Overestimate bound (holds with probability 1 - e ** -depth)"""
+        return math.e / self.width * self.total
+
+    @property
+    def nbytes(self) -> int:
+        return self.table.nbytes
+
+
+class HyperLogLog:
+    """Approximate distinct count in 2 ** precision one-byte registers"""
+
+    def __init__(self, precision: int = 12):
+        if not 4 <= precision <= 18:
+            raise ValueError("HyperLogLog precision must be between 4 and 18")
+        self.precision = precision
+        self.registers = np.zeros(1 << precision, dtype=np.uint8)
+
+    def position(self, item: Any) -> Tuple[int, int]:
+        """(register, rank) of an item"""
+        h = hash64(item, b"hyperloglog")
+        # Rank of the first set bit in the next 52 bits (plenty for any fleet)
+        rest = (h << self.precision & 0xFFFFFFFFFFFFFFFF) >> 12
+        return h >> (64 - self.precision), 53 - rest.bit_length()
+
+    def add(self, item: Any, position: Optional[Tuple[int, int]] = None):
+        """Add an item (`position` skips rehashing an item already located)"""
+        register, rank = self.position(item) if position is None else position
+        if rank > self.registers[register]:
+            self.registers[register] = rank
+
+    def count(self) -> int:
+        m = len(self.registers)
+        estimate = 0.7213 / (1 + 1.079 / m) * m * m / np.ldexp(1.0, -self.registers.astype(np.int64)).sum()
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if estimate <= 2.5 * m and zeros:
+            # Linear counting is more accurate while many registers are empty
+            estimate = m * math.log(m / zeros)
+        return int(round(estimate))
+
+    def merge(self, other: "HyperLogLog"):
+        if self.precision != other.precision:
+            raise ValueError("HyperLogLog sketches have different precision")
+        np.maximum(self.registers, other.registers, out=self.registers)
+
+    @property
+    def relative_error(self) -> float:
+        """Relative standard error of count()"""
+        return 1.04 / math.sqrt(len(self.registers))
+
+    @property
+    def nbytes(self) -> int:
+        return self.registers.nbytes
+
+
+class SpaceSaving:
+    """Top-k heavy hitters with per-item overestimate bounds"""
+
+    def __init__(self, k: int = 32):
+        self.k = k
+        # item -> [count, error]
+        self.counters: Dict[Any, List[int]] = {}
+        self.total = 0
+        # Lazy min-heap of (count, tiebreak, item); stale entries are skipped on eviction
+        self._heap: List[Tuple[int, int, Any]] = []
+        self._pushes = sequence()
+
+    def _push(self, item: Any, value: int):
+        heapq.heappush(self._heap, (value, next(self._pushes), item))
+        if len(self._heap) > 4 * self.k + 64:
+            self._rebuild()
+
+    def _rebuild(self):
+        self._heap = [(c, next(self._pushes), item) for item, (c, _) in self.counters.items()]
+        heapq.heapify(self._heap)
+
+    def _floor(self) -> int:
+        """Count any untracked item may have had"""
+        if len(self.counters) < self.k:
+            return 0
+        return min(c for c, _ in self.counters.values())
+
+    def add(self, item: Any, count: int = 1):
+        self.total += count
+        counter = self.counters.get(item)
+        if counter is not None:
+            counter[0] += count
+        elif len(self.counters) < self.k:
+            counter = self.counters[item] = [count, 0]
+        else:
+            # Replace the smallest counter; the newcomer inherits its count as error
+            while True:
+                floor, _, smallest = heapq.heappop(self._heap)
+                current = self.counters.get(smallest)
+                if current is not None and current[0] == floor:
+                    break
+            del self.counters[smallest]
+            counter = self.counters[item] = [floor + count, floor]
+        self._push(item, counter[0])
+
+    def merge(self, other: "SpaceSaving"):
+        if self.k != other.k:
+            raise ValueError("Heavy-hitter sketches have different sizes")
+        floors = (self._floor(), other._floor())
+        merged = {}
+        for item in set(self.counters) | set(other.counters):
+            total, error = 0, 0
+            for counters, floor in zip((self.counters, other.counters), floors):
+                c, e = counters.get(item, (floor, floor))
+                total += c
+                error += e
+            merged[item] = [total, error]
+        kept = sorted(merged.items(), key=lambda kv: -kv[1][0])[:self.k]
+        self.counters = {item: counter for item, counter in kept}
+        self.total += other.total
+        self._rebuild()
+
+    def top(self, n: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Heaviest items: count (upper bound) and error (count - error is a lower bound)"""
+        ranked = sorted(self.counters.items(), key=lambda kv: (-kv[1][0], kv[1][1]))[:n]
+        return [{"item": item, "count": count, "error": error} for item, (count, error) in ranked]
+
+    @property
+    def max_error(self) -> float:
+        return self.total / self.k
+
+
+class CohortSketch:
+    """DTC frequencies, distinct vehicles and top components of one cohort"""
+
+    __slots__ = ("failures", "dtcs", "vehicles", "components")
+
+    def __init__(self, dtc_error: float = 0.01, dtc_delta: float = 0.01, hll_precision: int = 12,
+                 top_components: int = 32):
+        self.failures = 0
+        self.dtcs = CountMinSketch.from_error(dtc_error, dtc_delta)
+        self.vehicles = HyperLogLog(hll_precision)
+        self.components = SpaceSaving(top_components)
+
+    def locate(self, vehicle_id: Optional[str], dtcs: Iterable[str]):
+        """Hash a diagnosis once for every sketch with the same parameters"""
+        return (self.vehicles.position(vehicle_id) if vehicle_id else None,
+                [self.dtcs.cells(dtc) for dtc in dtcs])
+
+    def add(self, vehicle_id: Optional[str], component: str, dtcs: Iterable[str], count: int = 1,
+            located=None):
+        vehicle, cells = self.locate(vehicle_id, dtcs) if located is None else located
+        self.failures += count
+        if vehicle is not None:
+            self.vehicles.add(vehicle_id, vehicle)
+        self.components.add(component, count)
+        for dtc, dtc_cells in zip(dtcs, cells):
+            self.dtcs.add(dtc, count, dtc_cells)
+
+    def merge(self, other: "CohortSketch"):
+        self.failures += other.failures
+        self.dtcs.merge(other.dtcs)
+        self.vehicles.merge(other.vehicles)
+        self.components.merge(other.components)
+
+    @property
+    def nbytes(self) -> int:
+        return self.dtcs.nbytes + self.vehicles.nbytes
+
+
+
+def local_time(when: Any) -> datetime:
+    """
+    Naive local datetime from a datetime or ISO string
+
+    Windows are keyed in naive local time (as datetime.now()); aware
+    values are converted so they compare with them.
+    """
+    if isinstance(when, str):
+        when = datetime.fromisoformat(when)
+    if when.tzinfo is not None:
+        when = when.astimezone().replace(tzinfo=None)
+    return when
+
+class PatternDetector:
+    """Windowed cohort sketches for failure-pattern queries over long histories"""
+
+    def __init__(self, window_hours: float = 24, retention_windows: int = 30, dtc_error: float = 0.01,
+                 dtc_delta: float = 0.01, hll_precision: int = 12, top_components: int = 32):
+        """
+        Args:
+            window_hours: Length of a tumbling window
+            retention_windows: Windowed sketches kept per cohort (all-time
+                sketches are always kept)
+            dtc_error: Count-min overestimate bound, as a fraction of DTC reports
+            dtc_delta: Probability the count-min bound is exceeded
+            hll_precision: log2 of the HyperLogLog register count
+            top_components: Heavy-hitter counters per cohort
+        """
+        self.window = timedelta(hours=window_hours)
+        self.retention_windows = retention_windows
+        self._params = dict(dtc_error=dtc_error, dtc_delta=dtc_delta, hll_precision=hll_precision,
+                            top_components=top_components)
+        # (model, year), None for "any" -> {window start (None = all time) -> CohortSketch}
+        self._sketches: Dict[Tuple[Any, Any], Dict[Optional[datetime], CohortSketch]] = {}
+        self._latest_window: Optional[datetime] = None
+        # Hashes a diagnosis once; every sketch shares its parameters
+        self._locator = self.new_sketch()
+        self._lock = threading.Lock()
+
+    def new_sketch(self) -> CohortSketch:
+        return CohortSketch(**self._params)
+
+    def window_start(self, when: datetime) -> datetime:
+        """Start of the tumbling window containing `when` (naive local time)"""
+        when = local_time(when)
+        epoch = datetime(2000, 1, 1)
+        return epoch + ((when - epoch) // self.window) * self.window
+
+    def add(self, record: Dict[str, Any]):
+        """
+        Sketch one diagnosis
+
+        Args:
+            record: Diagnosis as for FailureAggregator.add, plus vehicle_id
+                and an optional diagnosed_at
+
+        Reports that find nothing to repair are skipped.
+
+        Raises:
+            ValueError: count is not a positive integer
+        """
+        parsed = parse_failure(record)
+        if parsed is None:
+            return
+        (model, year, component), dtcs, count = parsed
+        dtcs = [dtc for dtc in dtcs if dtc != NO_DTC]
+        window = self.window_start(record.get("diagnosed_at") or datetime.now())
+        located = self._locator.locate(record.get("vehicle_id"), dtcs)
+        with self._lock:
+            if self._latest_window is None or window > self._latest_window:
+                self._latest_window = window
+                self._prune()
+            buckets = (None, window) if window >= self._cutoff() else (None,)
+            for key in ((None, None), (model, None), (None, year), (model, year)):
+                windows = self._sketches.setdefault(key, {})
+                for bucket in buckets:
+                    sketch = windows.get(bucket)
+                    if sketch is None:
+                        sketch = windows[bucket] = self.new_sketch()
+                    sketch.add(record.get("vehicle_id"), component, dtcs, count, located)
+
+    def _cutoff(self) -> datetime:
+        return self._latest_window - self.window * (self.retention_windows - 1)
+
+    def _prune(self):
+        cutoff = self._cutoff()
+        for windows in self._sketches.values():
+            for start in [s for s in windows if s is not None and s < cutoff]:
+                del windows[start]
+
+    def sketch(self, model: Optional[str] = None, year: Optional[int] = None,
+               since: Optional[datetime] = None, until: Optional[datetime] = None) -> CohortSketch:
+        """Merged sketch of a cohort (all models without model, all years without year)"""
+        merged = self.new_sketch()
+        with self._lock:
+            windows = self._sketches.get((model, year), {})
+            if since is None and until is None:
+                if None in windows:
+                    merged.merge(windows[None])
+            else:
+                first = self.window_start(since) if since else None
+                for start, sketch in windows.items():
+                    if start is None or (first and start < first) or (until and start >= local_time(until)):
+                        continue
+                    merged.merge(sketch)
+        return merged
+
+    def merge(self, other: "PatternDetector"):
+        """Fold in the sketches of another shard (same parameters)"""
+        with self._lock:
+            for key, windows in other._sketches.items():
+                mine = self._sketches.setdefault(key, {})
+                for start, sketch in windows.items():
+                    if start not in mine:
+                        mine[start] = self.new_sketch()
+                    mine[start].merge(sketch)
+            if other._latest_window and (self._latest_window is None
+                                         or other._latest_window > self._latest_window):
+                self._latest_window = other._latest_window
+                self._prune()
+
+    def summary(self, model: Optional[str] = None, year: Optional[int] = None,
+                since: Optional[datetime] = None, until: Optional[datetime] = None,
+                dtcs: Iterable[str] = (), top: int = 10) -> Dict[str, Any]:
+        """
+        Approximate failure pattern of a cohort
+
+        Returns:
+            Dict with failures, distinct_vehicles, top_components,
+            dtc_counts (estimates for `dtcs`) and error_bounds
+        """
+        sketch = self.sketch(model, year, since, until)
+        return {
+            "model": model,
+            "year": year,
+            "failures": sketch.failures,
+            "distinct_vehicles": sketch.vehicles.count(),
+            "top_components": [
+                {"component": e["item"], "failures": e["count"], "error": e["error"]}
+                for e in sketch.components.top(top)
+            ],
+            "dtc_counts": {code.upper(): sketch.dtcs.estimate(code.upper()) for code in dtcs},
+            "error_bounds": {
+                "dtc_count_overestimate": round(sketch.dtcs.max_error, 2),
+                "dtc_confidence": round(1 - math.exp(-sketch.dtcs.depth), 4),
+                "distinct_vehicles_relative_error": round(sketch.vehicles.relative_error, 4),
+                "component_count_overestimate": round(sketch.components.max_error, 2),
+            },
+        }
+
+    @property
+    def nbytes(self) -> int:
+        """Approximate memory held by the sketches"""
+        with self._lock:
+            return sum(s.nbytes for windows in self._sketches.values() for s in windows.values())
+
+
+@lru_cache(maxsize=1)
+def get_pattern_detector() -> PatternDetector:
+    """Shared detector configured from agents_config.yaml `manufacturing_insights_agent`"""
+    config = load_config("agents_config").get("agents", {}).get("manufacturing_insights_agent", {})
+    return PatternDetector(
+        window_hours=config.get("sketch_window_hours", 24),
+        retention_windows=config.get("sketch_retention_windows", 30),
+        dtc_error=config.get("sketch_dtc_error", 0.01),
+        dtc_delta=config.get("sketch_dtc_delta", 0.01),
+        hll_precision=config.get("sketch_hll_precision", 12),
+        top_components=config.get("sketch_top_components", 32),
+    )
+
+
+if __name__ == "__main__":
+    import random
+    import time
+    from collections import Counter
+
+    random.seed(11)
+    size = 200_000
+    components = [f"part_{i}" for i in range(200)]
+    weights = [1 / (i + 1) for i in range(len(components))]
+    dtcs = [f"P{i:04d}" for i in range(2000)]
+    records = [{"model": "Model A", "year": 2022, "vehicle_id": f"V{random.randint(0, 50000)}",
+                "component": random.choices(components, weights)[0],
+                "dtc_codes": [random.choice(dtcs[:50] if random.random() < 0.5 else dtcs)]}
+               for _ in range(size)]
+
+    detector = PatternDetector()
+    started = time.perf_counter()
+    for record in records:
+        detector.add(record)
+    print(f"ingest: {size / (time.perf_counter() - started):,.0f} diagnoses/sec, "
+          f"{detector.nbytes / 1024:.0f} KB of sketches")
+
+    started = time.perf_counter()
+    summary = detector.summary("Model A", 2022, dtcs=dtcs[:3], top=3)
+    print(f"query: {(time.perf_counter() - started) * 1000:.2f} ms")
+    true_dtcs = Counter(r["dtc_codes"][0] for r in records)
+    print("distinct vehicles:", summary["distinct_vehicles"],
+          "exact:", len({r["vehicle_id"] for r in records}))
+    print("dtc estimates:", summary["dtc_counts"], "exact:", {d: true_dtcs[d] for d in dtcs[:3]})
+    print("top components:", summary["top_components"],
+          "exact:", Counter(r["component"] for r in records).most_common(3))
+    print("bounds:", summary["error_bounds"])
@@ -31,11 +31,13 @@ class AgentOrchestrator:
     - Handles inter-agent communication
     """
     
-    def __init__(self):
+    def __init__(self, monitor: Optional[Any] = None):
         self.agents: Dict[str, Any] = {}
         self.task_queue: asyncio.Queue = asyncio.Queue()
         self.logger = logging.getLogger("orchestrator")
         self.is_running = False
+        # Security monitor (e.g. UEBAAgent) that sees every routed task
+        self.monitor = monitor
         
         self.logger.info("Agent Orchestrator initialized")
     
@@ -72,12 +74,13 @@ class AgentOrchestrator:
         self.logger.info("All agents stopped")
     
     async def submit_task(self, task_type: TaskType, task_data: Dict[str, Any], 
-                          priority: TaskPriority = TaskPriority.MEDIUM):
-        """Submit a task to the appropriate agent"""
+                          priority: TaskPriority = TaskPriority.MEDIUM, source: str = "orchestrator"):
+        """Submit a task to the appropriate agent on behalf of `source` (the sending agent)"""
         task = {
             "task_id": f"task_{datetime.now().timestamp()}",
             "task_type": task_type.value,
             "priority": priority.value,
+            "source": source,
             "data": task_data,
             "timestamp": datetime.now().isoformat()
         }
@@ -110,6 +113,14 @@ class AgentOrchestrator:
         }
         
         agent_key = agent_mapping.get(task_type)
+        if agent_key is None:
+            # A malformed task, not a security event
+            self.logger.error(f"Task {task['task_id']} has unknown task type: {task_type}")
+            return None
+        
+        if self.monitor is not None and not self.monitor.allow_task(task, agent_key, agent_key in self.agents):
+            self.logger.warning(f"Task {task['task_id']} refused: sender is blocked")
+            return None
         
         if agent_key and agent_key in self.agents:
             agent = self.agents[agent_key]
@@ -150,7 +161,9 @@ class AgentOrchestrator:
 
 # Example usage
 async def main():
-    orchestrator = AgentOrchestrator()
+    from agents.ueba_agent.agent import get_ueba_agent
+    
+    orchestrator = AgentOrchestrator(monitor=get_ueba_agent())
     
     # Register agents (to be implemented)
     # orchestrator.register_agent("data_analysis", DataAnalysisAgent(...))
@@ -4,17 +4,24 @@ Books maintenance appointments
 """
 
 import os
-from crewai import Agent, Task, Crew
+from crewai import Agent
 from langchain_openai import ChatOpenAI
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
+
+from agents.scheduling_agent.availability_checker import SlotUnavailableError, requested_slot
+from agents.scheduling_agent.booking_manager import get_booking_manager
+from agents.scheduling_agent.optimizer import BatchScheduler
+from agents.scheduling_agent.service_locator import get_service_center_index
+from utils.config import load_config
 
 class SchedulingAgent:
     """Agent for appointment scheduling"""
     
-    def __init__(self):
+    def __init__(self, bookings=None):
         self.llm = ChatOpenAI(
             model=os.getenv("OPENAI_MODEL", "gpt-4o-mini"),
-            temperature=0.3
+            temperature=0.3,
+            max_tokens=120
         )
         
         self.agent = Agent(
@@ -24,25 +31,144 @@ class SchedulingAgent:
             llm=self.llm,
             verbose=True
         )
+        
+        self.bookings = bookings or get_booking_manager()
+        self.calendar = self.bookings.calendar
+        self.locator = get_service_center_index()
+        config = load_config("agents_config").get("agents", {}).get("scheduling_agent", {})
+        self.max_attempts = config.get("max_booking_attempts", 3)
+    
+    def book_slot(self, customer_info):
+        """
+        Reserve the earliest free slot matching the customer's preference
+        
+        Args:
+            customer_info: Dict with name, phone, optional preferred_time
+                ('morning'/'afternoon'/'evening'), center_id, location
+                ((lat, lon) of the vehicle, used when no center_id is given)
+                and slot (a specific start time to book; aware times are
+                converted to local time)
+        
+        Returns:
+            Dict with booking_id, center_id, bay, start and end (plus
+            distance_km when booked by location)
+        
+        Raises:
+            SlotUnavailableError: Nothing free within the booking window,
+                or the requested slot is taken or has already passed
+            UnknownServiceCenterError: center_id is not a known center
+        """
+        self.calendar.advance(date.today())
+        customer = {"name": customer_info.get("name"), "phone": customer_info.get("phone")}
+        centers = self._candidate_centers(customer_info)
+        
+        if customer_info.get("slot") is not None:
+            center_id, distance = centers[0]
+            record = self.bookings.reserve(center_id, requested_slot(customer_info["slot"]), customer)
+            return self._appointment(record, distance)
+        
+        # Nearest center first; move on when it has nothing free
+        for center_id, distance in centers:
+            try:
+                return self._appointment(self._book_earliest(center_id, customer_info, customer), distance)
+            except SlotUnavailableError:
+                if len(centers) == 1:
+                    raise
+        raise SlotUnavailableError(f"No free slots at the {len(centers)} nearest service centers")
+    
+    def _candidate_centers(self, customer_info):
+        """(center_id, distance_km) pairs to try, nearest first"""
+        if customer_info.get("center_id"):
+            return [(customer_info["center_id"], None)]
+        if customer_info.get("location"):
+            lat, lon = customer_info["location"]
+            nearby = [(c["center_id"], c["distance_km"]) for c in self.locator.within(lat, lon)
+                      if c["center_id"] in self.calendar.bays]
+            if not nearby:
+                raise SlotUnavailableError(f"No service center within {self.locator.radius_km} km")
+            return nearby
+        return [(next(iter(self.calendar.bays)), None)]
+    
+    def _book_earliest(self, center_id, customer_info, customer):
+        # Another request can take the slot between lookup and reserve; try the next one
+        for _ in range(self.max_attempts):
+            slot = self._earliest_slot(center_id, customer_info.get("preferred_time"))
+            try:
+                return self.bookings.reserve(center_id, slot, customer)
+            except SlotUnavailableError:
+                continue
+        raise SlotUnavailableError(f"Could not book at {center_id} after {self.max_attempts} attempts")
+    
+    def _earliest_slot(self, center_id, period):
+        # Same-day bookings need at least an hour's notice
+        earliest = datetime.now() + timedelta(hours=1)
+        free = self.bookings.next_free(center_id, n=1, after=earliest,
+                                       period=period if period in ("morning", "afternoon", "evening") else None)
+        if not free and period:
+            free = self.bookings.next_free(center_id, n=1, after=earliest)
+        if not free:
+            raise SlotUnavailableError(f"No free slots at {center_id} in the booking window")
+        return free[0]
+    
+    def _appointment(self, record, distance_km=None):
+        appointment = {
+            "booking_id": record["hold_id"],
+            "center_id": record["center_id"],
+            "bay": record["bay"],
+            "start": record["start"],
+            "end": record["start"] + timedelta(minutes=self.calendar.slot_minutes),
+        }
+        if distance_km is not None:
+            appointment["distance_km"] = distance_km
+        return appointment
+    
+    def schedule_batch(self, vehicles):
+        """
+        Plan and book slots for many flagged vehicles at once
+        
+        Args:
+            vehicles: Dicts with vehicle_id, lat, lon and urgency (see
+                optimizer.URGENCY_WEIGHTS)
+        
+        Returns:
+            BatchScheduler.assign() result with booking_id added to each
+            assignment; plans whose slot was taken meanwhile move to
+            unassigned
+        """
+        self.calendar.advance(date.today())
+        plan = BatchScheduler(self.calendar, self.locator).assign(vehicles)
+        booked = []
+        for assignment in plan["assignments"]:
+            try:
+                record = self.bookings.reserve(assignment["center_id"], assignment["start"],
+                                               {"vehicle_id": assignment["vehicle_id"]})
+            except SlotUnavailableError:
+                plan["unassigned"].append(assignment["vehicle_id"])
+                continue
+            booked.append(dict(assignment, booking_id=record["hold_id"]))
+        plan["assignments"] = booked
+        plan["report"]["booking_conflicts"] = len(plan["unassigned"]) - plan["report"]["unassigned"]
+        return plan
+    
+    def confirmation_message(self, customer_info, booking):
+        """SMS confirmation for a booked slot; the LLM only phrases it"""
+        when = booking["start"].strftime("%A %d %B, %I:%M %p")
+        fallback = (f"Hi {customer_info.get('name')}, your service appointment at "
+                    f"{booking['center_id']} is confirmed for {when}. Reply CANCEL to cancel.")
+        prompt = (
+            f"Write a short, friendly SMS (max 40 words) confirming a vehicle service "
+            f"appointment for {customer_info.get('name')} at service center "
+            f"{booking['center_id']} on {when}. Use exactly this date and time."
+        )
+        try:
+            return self.llm.invoke(prompt).content.strip() or fallback
+        except Exception:
+            return fallback
     
     def schedule_appointment(self, customer_info):
         """Schedule appointment for customer"""
-        tomorrow = (datetime.now() + timedelta(days=1)).strftime("%Y-%m-%d")
-        
-        task = Task(
-            description=f"""
-            Book appointment for: {customer_info.get('name')}
-            Phone: {customer_info.get('phone')}
-            
-            Available slots:
-            - {tomorrow} 10:00 AM
-            - {tomorrow} 2:00 PM
-            
-            Confirm booking and generate SMS notification.
-            """,
-            agent=self.agent,
-            expected_output="Appointment confirmation"
-        )
-        
-        crew = Crew(agents=[self.agent], tasks=[task], verbose=False)
-        return str(crew.kickoff())
\ No newline at end of file
+        try:
+            booking = self.book_slot(customer_info)
+        except SlotUnavailableError as e:
+            return f"Sorry {customer_info.get('name')}, {e}. We will call you back with options."
+        return self.confirmation_message(customer_info, booking)
@@ -0,0 +1,300 @@
+"""
+Availability Checker
+Bitmap calendars of service bays per service center
+
+Each bay's booking horizon (`preferred_booking_window_days` days of
+fixed-length slots within opening hours) is one integer bitmap: bit i set
+means slot i is taken. A slot is free at a center when at least one bay
+has the bit clear, so "any bay free" for the whole horizon is a single
+AND over the bay bitmaps, and finding the next N free slots is a few bit
+operations rather than a scan over appointments.
+
+Updates take only the lock of the bay they touch, so bookings for
+different bays and centers never wait on each other.
+
+Slot times are naive local datetimes; aware ones are converted on the way
+in (local_time).
+"""
+
+import threading
+from datetime import date, datetime, time, timedelta
+from functools import lru_cache
+from typing import Dict, List, Optional
+
+from agents.scheduling_agent.service_locator import get_service_center_index
+from utils.config import load_config
+
+PERIOD_HOURS = {
+    "morning": (0, 12),
+    "afternoon": (12, 17),
+    "evening": (17, 24),
+}
+
+
+class SlotUnavailableError(Exception):
+    """The requested slot has no free bay (or is outside the horizon)"""
+
+
+class UnknownServiceCenterError(LookupError):
+    """The calendar has no service center with that id"""
+
+
+def local_time(when: datetime) -> datetime:
+    """`when` as a naive local datetime (aware values are converted)"""
+    if when.tzinfo is None:
+        return when
+    return when.astimezone().replace(tzinfo=None)
+
+
+def requested_slot(when: datetime, now: Optional[datetime] = None) -> datetime:
+    """
+    A customer-chosen slot start in calendar time
+
+    Raises:
+        SlotUnavailableError: The slot has already started
+    """
+    when = local_time(when)
+    if when < (now or datetime.now()):
+        raise SlotUnavailableError(f"{when:%Y-%m-%d %H:%M} has already passed")
+    return when
+
+
+class ServiceCalendar:
+    """Per-bay slot bitmaps for a set of service centers"""
+
+    def __init__(self, centers: Dict[str, int], opening_hour: int = 9, closing_hour: int = 18,
+                 slot_minutes: int = 60, horizon_days: int = 7, start_date: Optional[date] = None):
+        """
+        Args:
+            centers: center_id -> number of service bays
+            opening_hour: First slot starts at this hour
+            closing_hour: Last slot ends by this hour
+            slot_minutes: Length of one appointment slot
+            horizon_days: Days ahead that can be booked (today included)
+            start_date: First day of the horizon (defaults to today)
+        """
+        self.opening_hour = opening_hour
+        self.slot_minutes = slot_minutes
+        self.slots_per_day = (closing_hour - opening_hour) * 60 // slot_minutes
+        self.horizon_days = horizon_days
+        self.total_slots = self.slots_per_day * horizon_days
+        self.full_mask = (1 << self.total_slots) - 1
+        self.start_date = start_date or date.today()
+        self.bays: Dict[str, List[int]] = {center: [0] * count for center, count in centers.items()}
+        self._bay_locks = {center: [threading.Lock() for _ in range(count)]
+                           for center, count in centers.items()}
+
+        # Slots of each period of the day, repeated for every day of the horizon
+        self.period_masks = {}
+        for period, (start_hour, end_hour) in PERIOD_HOURS.items():
+            day_mask = 0
+            for i in range(self.slots_per_day):
+                hour = self.slot_start(i).hour
+                if start_hour <= hour < end_hour:
+                    day_mask |= 1 << i
+            self.period_masks[period] = sum(day_mask << (d * self.slots_per_day)
+                                            for d in range(horizon_days))
+
+    # --- slot <-> time -------------------------------------------------------
+
+    def slot_start(self, index: int) -> datetime:
+        """Start time of slot `index` of the horizon"""
+        day, offset = divmod(index, self.slots_per_day)
+        start = datetime.combine(self.start_date + timedelta(days=day), time(self.opening_hour))
+        return start + timedelta(minutes=offset * self.slot_minutes)
+
+    def slot_index(self, when: datetime) -> int:
+        """Index of the slot starting at `when`"""
+        day = (when.date() - self.start_date).days
+        minutes = (when.hour - self.opening_hour) * 60 + when.minute
+        offset, remainder = divmod(minutes, self.slot_minutes)
+        if remainder or when.second or not 0 <= offset < self.slots_per_day \
+                or not 0 <= day < self.horizon_days:
+            raise SlotUnavailableError(f"{when:%Y-%m-%d %H:%M} is not a bookable slot")
+        return day * self.slots_per_day + offset
+
+    def first_slot_after(self, when: datetime) -> int:
+        """Index of the first slot starting at or after `when`"""
+        day = (when.date() - self.start_date).days
+        if day < 0:
+            return 0
+        minutes = (when.hour - self.opening_hour) * 60 + when.minute + (1 if when.second else 0)
+        offset = max(0, -(-minutes // self.slot_minutes))
+        if offset >= self.slots_per_day:
+            day, offset = day + 1, 0
+        return min(day * self.slots_per_day + offset, self.total_slots)
+
+    # --- queries -------------------------------------------------------------
+
+    def _bays(self, center_id: str) -> List[int]:
+        try:
+            return self.bays[center_id]
+        except KeyError:
+            raise UnknownServiceCenterError(f"Unknown service center: {center_id}") from None
+
+    def bay_count(self, center_id: str) -> int:
+        """
+        Number of bays at a center
+
+        Raises:
+            UnknownServiceCenterError: No such center
+        """
+        return len(self._bays(center_id))
+
+    def free_mask(self, center_id: str) -> int:
+        """Bitmap of slots with at least one free bay"""
+        busy_everywhere = self.full_mask
+        for bitmap in self._bays(center_id):
+            busy_everywhere &= bitmap
+        return self.full_mask & ~busy_everywhere
+
+    def next_free(self, center_id: str, n: int = 3, after: Optional[datetime] = None,
+                  period: Optional[str] = None) -> List[datetime]:
+        """
+        The next `n` slots with a free bay
+
+        Args:
+            center_id: Service center
+            n: Number of slots to return
+            after: Earliest start time (defaults to now)
+            period: Restrict to 'morning', 'afternoon' or 'evening'
+        """
+        mask = self.free_mask(center_id)
+        mask &= ~((1 << self.first_slot_after(after or datetime.now())) - 1)
+        if period:
+            mask &= self.period_masks[period]
+        slots = []
+        while mask and len(slots) < n:
+            lowest = mask & -mask
+            slots.append(self.slot_start(lowest.bit_length() - 1))
+            mask ^= lowest
+        return slots
+
+    def free_bay(self, center_id: str, when: datetime) -> Optional[int]:
+        """A free bay at `when`, or None"""
+        bit = 1 << self.slot_index(when)
+        for bay, bitmap in enumerate(self._bays(center_id)):
+            if not bitmap & bit:
+                return bay
+        return None
+
+    def utilization(self, center_id: str) -> float:
+        """Share of bay-slots booked over the horizon"""
+        bays = self._bays(center_id)
+        booked = sum(bin(bitmap).count("1") for bitmap in bays)
+        return booked / (len(bays) * self.total_slots) if bays else 0.0
+
+    # --- updates -------------------------------------------------------------
+
+    def try_take(self, center_id: str, index: int, bay: int) -> bool:
+        """Atomically mark a bay-slot taken; False if it already was"""
+        bit = 1 << index
+        bays = self._bays(center_id)
+        with self._bay_locks[center_id][bay]:
+            if bays[bay] & bit:
+                return False
+            bays[bay] |= bit
+            return True
+
+    def give_back(self, center_id: str, index: int, bay: int):
+        """Mark a bay-slot free again"""
+        bays = self._bays(center_id)
+        with self._bay_locks[center_id][bay]:
+            bays[bay] &= ~(1 << index)
+
+    def reserve(self, center_id: str, when: datetime, bay: Optional[int] = None) -> int:
+        """
+        Book a slot
+
+        Args:
+            center_id: Service center
+            when: Slot start time
+            bay: Specific bay, or None for any free bay
+
+        Returns:
+            The bay that was booked
+
+        Raises:
+            SlotUnavailableError: No free bay at that time
+        """
+        index = self.slot_index(when)
+        candidates = [bay] if bay is not None else range(self.bay_count(center_id))
+        for candidate in candidates:
+            if self.try_take(center_id, index, candidate):
+                return candidate
+        raise SlotUnavailableError(f"No free bay at {center_id} on {when:%Y-%m-%d %H:%M}")
+
+    def release(self, center_id: str, when: datetime, bay: int):
+        """Free a previously reserved slot"""
+        self.give_back(center_id, self.slot_index(when), bay)
+
+    def advance(self, today: date):
+        """Move the horizon forward, dropping days that have passed"""
+        if self.start_date >= today:
+            return
+        locks = [lock for center_locks in self._bay_locks.values() for lock in center_locks]
+        for lock in locks:
+            lock.acquire()
+        try:
+            # Measured under the locks: another thread may have advanced first
+            days = (today - self.start_date).days
+            if days <= 0:
+                return
+            shift = min(days, self.horizon_days) * self.slots_per_day
+            for bays in self.bays.values():
+                for i, bitmap in enumerate(bays):
+                    bays[i] = bitmap >> shift
+            self.start_date = today
+        finally:
+            for lock in reversed(locks):
+                lock.release()
+
+
+def calendar_from_config() -> ServiceCalendar:
+    """
+    Calendar built from agents_config.yaml `scheduling_agent`
+
+    Bays per center come from `service_centers` if set, else from the
+    service center locations file.
+    """
+    config = load_config("agents_config").get("agents", {}).get("scheduling_agent", {})
+    centers = config.get("service_centers") or {
+        center["center_id"]: center.get("bays", 1) for center in get_service_center_index().centers
+    }
+    return ServiceCalendar(
+        centers=centers,
+        opening_hour=config.get("opening_hour", 9),
+        closing_hour=config.get("closing_hour", 18),
+        slot_minutes=config.get("slot_minutes", 60),
+        horizon_days=config.get("preferred_booking_window_days", 7),
+    )
+
+
+@lru_cache(maxsize=1)
+def get_service_calendar() -> ServiceCalendar:
+    """Shared calendar for the process"""
+    return calendar_from_config()
+
+
+if __name__ == "__main__":
+    import random
+    import timeit
+
+    calendar = ServiceCalendar({f"SC{i:03d}": 6 for i in range(50)})
+    now = datetime.combine(calendar.start_date, time(8))
+    centers = list(calendar.bays)
+    random.seed(1)
+
+    def book_random():
+        center = random.choice(centers)
+        slots = calendar.next_free(center, n=3, after=now, period=random.choice(["morning", "afternoon"]))
+        if slots:
+            calendar.reserve(center, random.choice(slots))
+
+    queries = 20000
+    seconds = timeit.timeit(lambda: calendar.next_free(random.choice(centers), n=5, after=now),
+                            number=queries)
+    print(f"next_free: {queries / seconds:,.0f} queries/sec")
+    seconds = timeit.timeit(book_random, number=queries)
+    print(f"find + reserve: {queries / seconds:,.0f} bookings/sec")
+    print(f"utilization SC000: {calendar.utilization('SC000'):.0%}")
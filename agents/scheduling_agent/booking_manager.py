@@ -0,0 +1,204 @@
+"""
+Booking Manager
+Optimistic slot reservations with short-lived holds
+
+A booking is taken in two steps: hold() claims a free bay (the claim is
+an atomic test-and-set on that bay's bitmap in the calendar) and
+confirm() turns the hold into a booking. Holds that are not confirmed
+within the TTL expire and the bay is freed, so abandoned calls and
+checkouts never block a slot for long. Records whose slot has left the
+calendar horizon (the day has passed) are dropped.
+
+Every hold record carries a version, and state changes (confirm, release,
+expire) are compare-and-swap operations on it. A confirm racing an
+expiry therefore has exactly one winner. The CAS is guarded by one of a
+fixed set of striped locks chosen by hold id, and bitmap updates by the
+bay's own lock; there is no store-wide lock, so independent bookings
+proceed in parallel.
+"""
+
+import heapq
+import threading
+import time
+import uuid
+from datetime import datetime
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Optional
+
+from agents.scheduling_agent.availability_checker import (
+    ServiceCalendar, SlotUnavailableError, get_service_calendar, local_time
+)
+from utils.config import load_config
+
+
+class HoldExpiredError(SlotUnavailableError):
+    """The hold expired, was released or is unknown"""
+
+
+class BookingManager:
+    """Reservation store on top of a ServiceCalendar"""
+
+    def __init__(self, calendar: ServiceCalendar, hold_ttl_seconds: float = 120.0,
+                 clock: Callable[[], float] = time.monotonic, stripes: int = 64):
+        self.calendar = calendar
+        self.hold_ttl_seconds = hold_ttl_seconds
+        self.clock = clock
+        self._records: Dict[str, Dict[str, Any]] = {}
+        self._stripes = [threading.Lock() for _ in range(stripes)]
+        # (expires_at, hold_id) for lazy expiry, (start, hold_id) for purging past days
+        self._expiries: List = []
+        self._starts: List = []
+        self._expiry_lock = threading.Lock()
+
+    def _cas(self, hold_id: str, expected_version: int, new_record: Dict[str, Any]) -> bool:
+        """Replace a record only if nobody changed it since it was read"""
+        with self._stripes[hash(hold_id) % len(self._stripes)]:
+            current = self._records.get(hold_id)
+            if current is None or current["version"] != expected_version:
+                return False
+            self._records[hold_id] = new_record
+            return True
+
+    def hold(self, center_id: str, start: datetime, customer: Dict[str, Any],
+             bay: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Claim a bay at `start` for hold_ttl_seconds
+
+        Returns:
+            Hold record (hold_id, center_id, bay, start, status, expires_at)
+
+        Raises:
+            SlotUnavailableError: Every bay is taken
+            UnknownServiceCenterError: No such center
+        """
+        self.expire_holds()
+        start = local_time(start)
+        index = self.calendar.slot_index(start)
+        candidates = [bay] if bay is not None else range(self.calendar.bay_count(center_id))
+        for candidate in candidates:
+            if self.calendar.try_take(center_id, index, candidate):
+                record = {
+                    "hold_id": uuid.uuid4().hex,
+                    "center_id": center_id,
+                    "bay": candidate,
+                    "start": start,
+                    "customer": customer,
+                    "status": "held",
+                    "version": 1,
+                    "expires_at": self.clock() + self.hold_ttl_seconds,
+                }
+                self._records[record["hold_id"]] = record
+                with self._expiry_lock:
+                    heapq.heappush(self._expiries, (record["expires_at"], record["hold_id"]))
+                    heapq.heappush(self._starts, (start, record["hold_id"]))
+                return dict(record)
+        raise SlotUnavailableError(f"No free bay at {center_id} on {start:%Y-%m-%d %H:%M}")
+
+    def confirm(self, hold_id: str) -> Dict[str, Any]:
+        """
+        Turn a live hold into a booking (idempotent)
+
+        Raises:
+            HoldExpiredError: The hold expired or was released first
+        """
+        record = self._records.get(hold_id)
+        if record is None:
+            raise HoldExpiredError(f"Unknown hold {hold_id}")
+        if record["status"] == "confirmed":
+            return dict(record)
+        if record["status"] != "held" or self.clock() >= record["expires_at"]:
+            self._expire(record)
+            raise HoldExpiredError(f"Hold {hold_id} is no longer valid")
+        confirmed = dict(record, status="confirmed", version=record["version"] + 1, expires_at=None)
+        if not self._cas(hold_id, record["version"], confirmed):
+            return self.confirm(hold_id)  # changed under us; re-evaluate
+        return dict(confirmed)
+
+    def release(self, hold_id: str) -> bool:
+        """Cancel a hold or booking; False if it was already gone"""
+        while True:
+            record = self._records.get(hold_id)
+            if record is None or record["status"] not in ("held", "confirmed"):
+                return False
+            released = dict(record, status="released", version=record["version"] + 1)
+            if self._cas(hold_id, record["version"], released):
+                self._give_back(record)
+                return True
+
+    def reserve(self, center_id: str, start: datetime, customer: Dict[str, Any],
+                bay: Optional[int] = None) -> Dict[str, Any]:
+        """Hold and immediately confirm (atomic reserve-or-fail)"""
+        return self.confirm(self.hold(center_id, start, customer, bay)["hold_id"])
+
+    def _expire(self, record: Dict[str, Any]):
+        if record["status"] != "held":
+            return
+        expired = dict(record, status="expired", version=record["version"] + 1)
+        if self._cas(record["hold_id"], record["version"], expired):
+            self._give_back(record)
+
+    def _give_back(self, record: Dict[str, Any]):
+        try:
+            index = self.calendar.slot_index(record["start"])
+        except SlotUnavailableError:
+            return  # the slot has already left the booking window
+        self.calendar.give_back(record["center_id"], index, record["bay"])
+
+    def expire_holds(self):
+        """Free bays of holds whose TTL has passed"""
+        now = self.clock()
+        due = []
+        with self._expiry_lock:
+            while self._expiries and self._expiries[0][0] <= now:
+                due.append(heapq.heappop(self._expiries)[1])
+        for hold_id in due:
+            record = self._records.get(hold_id)
+            if record:
+                self._expire(record)
+        self.purge_past()
+
+    def purge_past(self) -> int:
+        """
+        Drop records whose slot is before the calendar horizon
+
+        Returns:
+            Number of records dropped
+        """
+        horizon_start = datetime.combine(self.calendar.start_date, datetime.min.time())
+        past = []
+        with self._expiry_lock:
+            while self._starts and self._starts[0][0] < horizon_start:
+                past.append(heapq.heappop(self._starts)[1])
+        for hold_id in past:
+            record = self._records.get(hold_id)
+            if record:
+                self._expire(record)
+            with self._stripes[hash(hold_id) % len(self._stripes)]:
+                self._records.pop(hold_id, None)
+        return len(past)
+
+    def next_free(self, center_id: str, n: int = 3, after: Optional[datetime] = None,
+                  period: Optional[str] = None) -> List[datetime]:
+        """Calendar free slots, after dropping expired holds"""
+        self.expire_holds()
+        return self.calendar.next_free(center_id, n=n, after=after, period=period)
+
+    def get(self, hold_id: str) -> Optional[Dict[str, Any]]:
+        record = self._records.get(hold_id)
+        return dict(record) if record else None
+
+    def confirmed_bookings(self) -> List[Dict[str, Any]]:
+        return [dict(r) for r in list(self._records.values()) if r["status"] == "confirmed"]
+
+    def get_stats(self) -> Dict[str, int]:
+        stats: Dict[str, int] = {}
+        for record in list(self._records.values()):
+            stats[record["status"]] = stats.get(record["status"], 0) + 1
+        return stats
+
+
+@lru_cache(maxsize=1)
+def get_booking_manager() -> BookingManager:
+    """Shared reservation store on the process-wide calendar"""
+    config = load_config("agents_config").get("agents", {}).get("scheduling_agent", {})
+    return BookingManager(get_service_calendar(), config.get("hold_ttl_seconds", 120))
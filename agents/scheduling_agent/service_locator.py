@@ -0,0 +1,327 @@
+"""
+Service Center Locator
+Radius and k-nearest searches over the service network
+
+Center coordinates are bucketed into a uniform latitude/longitude grid
+(cells `cell_km` tall). A query only looks at the centers in the cells
+its search circle can overlap; the candidate rows for each (cell, radius)
+pair are computed once and cached. Centers are stored as unit vectors, so
+testing candidates against the radius is a single matrix-vector product
+(cosine of the central angle) and exact great-circle distances are only
+computed for the hits. Cost therefore depends on how many centers are
+nearby, not on the size of the network. Batch queries group vehicles by
+grid cell and share one product per cell.
+"""
+
+import json
+import math
+from collections import defaultdict
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from utils.config import load_config
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+# Half the Earth's circumference: no two points are farther apart
+MAX_DISTANCE_KM = math.pi * EARTH_RADIUS_KM
+
+_EMPTY = np.empty(0, dtype=np.intp)
+
+
+def unit_vectors(lat, lon) -> np.ndarray:
+    """(lat, lon) in degrees -> points on the unit sphere, shape (..., 3)"""
+    lat, lon = np.radians(lat), np.radians(lon)
+    return np.stack([np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)], axis=-1)
+
+
+def _unit_vector(lat: float, lon: float) -> np.ndarray:
+    lat, lon = math.radians(lat), math.radians(lon)
+    return np.array([math.cos(lat) * math.cos(lon), math.cos(lat) * math.sin(lon), math.sin(lat)])
+
+
+def distance_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Great-circle (haversine) distance between two points in km"""
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 \
+        + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(min(a, 1.0)))
+
+
+def _km(cosines: np.ndarray) -> np.ndarray:
+    # Rounding can push the cosine of a zero angle just past 1
+    return EARTH_RADIUS_KM * np.arccos(np.minimum(cosines, 1.0))
+
+
+class ServiceCenterIndex:
+    """Grid index over service center locations"""
+
+    def __init__(self, centers: Sequence[Dict[str, Any]], cell_km: float = 50.0,
+                 radius_km: float = 50.0, max_cached_cells: int = 100000):
+        """
+        Args:
+            centers: Dicts with center_id, lat, lon (plus any other fields)
+            cell_km: Grid cell height; about the typical search radius
+            radius_km: Default radius for within()
+            max_cached_cells: Candidate sets kept before the cache is reset
+        """
+        self.centers = [dict(c) for c in centers]
+        self.cell_km = cell_km
+        self.radius_km = radius_km
+        self.max_cached_cells = max_cached_cells
+        self._rows = {c["center_id"]: row for row, c in enumerate(self.centers)}
+        lat = np.array([c["lat"] for c in self.centers], dtype=np.float64)
+        lon = np.array([c["lon"] for c in self.centers], dtype=np.float64)
+        self._xyz = unit_vectors(lat, lon).reshape(-1, 3)
+
+        self._cell_deg = cell_km / KM_PER_DEGREE
+        self._lon_cells = math.ceil(360 / self._cell_deg)
+        cells = defaultdict(list)
+        for row, center in enumerate(self.centers):
+            cells[self._cell(center["lat"], center["lon"])].append(row)
+        self._cells = {key: np.array(rows, dtype=np.intp) for key, rows in cells.items()}
+        # (cell, radius_km) -> rows of every center within radius_km of any point in the cell
+        self._neighbourhoods: Dict[Tuple[int, int, float], np.ndarray] = {}
+
+    @classmethod
+    def from_file(cls, path: Path, **kwargs) -> "ServiceCenterIndex":
+        """Load centers from a locations.json file"""
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        return cls(data.get("centers", data), **kwargs)
+
+    def __len__(self) -> int:
+        return len(self.centers)
+
+    def get(self, center_id: str) -> Optional[Dict[str, Any]]:
+        row = self._rows.get(center_id)
+        return dict(self.centers[row]) if row is not None else None
+
+    # --- grid ----------------------------------------------------------------
+
+    def _cell(self, lat: float, lon: float) -> Tuple[int, int]:
+        return (math.floor(lat / self._cell_deg),
+                math.floor((lon + 180) / self._cell_deg) % self._lon_cells)
+
+    def _box(self, lat: float, lon: float, radius_km: float) -> np.ndarray:
+        """Rows of centers in the cells a circle around (lat, lon) overlaps"""
+        lat_span = radius_km / KM_PER_DEGREE
+        if abs(lat) + lat_span >= 90:
+            lon_span = 180.0  # the circle reaches a pole
+        else:
+            # Degrees of longitude shrink toward the poles; size the box
+            # for the parallel nearest the pole that the circle touches
+            lon_span = min(180.0, lat_span / math.cos(math.radians(abs(lat) + lat_span)))
+        i0 = math.floor((lat - lat_span) / self._cell_deg)
+        i1 = math.floor((lat + lat_span) / self._cell_deg)
+        if lon_span >= 180:
+            columns = range(self._lon_cells)
+        else:
+            j0 = math.floor((lon - lon_span + 180) / self._cell_deg)
+            j1 = min(math.floor((lon + lon_span + 180) / self._cell_deg), j0 + self._lon_cells - 1)
+            columns = [j % self._lon_cells for j in range(j0, j1 + 1)]
+
+        if (i1 - i0 + 1) * len(columns) > len(self._cells):
+            # Box covers more cells than are occupied; walk the occupied ones
+            wanted = set(columns)
+            parts = [rows for (i, j), rows in self._cells.items() if i0 <= i <= i1 and j in wanted]
+        else:
+            cells = self._cells
+            parts = [cells[key] for key in ((i, j) for i in range(i0, i1 + 1) for j in columns)
+                     if key in cells]
+        if not parts:
+            return _EMPTY
+        return parts[0] if len(parts) == 1 else np.concatenate(parts)
+
+    def _candidates(self, cell: Tuple[int, int], radius_km: float) -> np.ndarray:
+        """Rows of centers that may be within radius_km of a point in `cell`"""
+        key = (cell[0], cell[1], radius_km)
+        rows = self._neighbourhoods.get(key)
+        if rows is None:
+            i, j = cell
+            lat = (i + 0.5) * self._cell_deg
+            lon = (j + 0.5) * self._cell_deg - 180
+            # Every point of the cell is within this distance of its centre
+            half_diagonal = max(distance_km(lat, lon, i * self._cell_deg, j * self._cell_deg - 180),
+                                distance_km(lat, lon, (i + 1) * self._cell_deg, j * self._cell_deg - 180))
+            rows = self._box(lat, lon, radius_km + half_diagonal)
+            if len(self._neighbourhoods) >= self.max_cached_cells:
+                self._neighbourhoods.clear()
+            self._neighbourhoods[key] = rows
+        return rows
+
+    def _result(self, rows: np.ndarray, distances: np.ndarray) -> List[Dict[str, Any]]:
+        centers = self.centers
+        # Hit lists are short; sorting Python floats beats numpy call overhead
+        return [dict(centers[row], distance_km=round(km, 2))
+                for km, row in sorted(zip(distances.tolist(), rows.tolist()))]
+
+    # --- single queries ------------------------------------------------------
+
+    def within(self, lat: float, lon: float, radius_km: Optional[float] = None) -> List[Dict[str, Any]]:
+        """
+        Centers within `radius_km` of a location, nearest first
+
+        Returns:
+            Center dicts with an added distance_km
+        """
+        radius_km = self.radius_km if radius_km is None else radius_km
+        rows = self._candidates(self._cell(lat, lon), radius_km)
+        cosines = self._xyz[rows] @ _unit_vector(lat, lon)
+        inside = cosines >= math.cos(min(radius_km / EARTH_RADIUS_KM, math.pi))
+        return self._result(rows[inside], _km(cosines[inside]))
+
+    def nearest(self, lat: float, lon: float, k: int = 3,
+                max_km: Optional[float] = None) -> List[Dict[str, Any]]:
+        """
+        The `k` nearest centers, optionally no farther than `max_km`
+
+        The search circle starts at one cell and grows until it holds k
+        centers; anything outside it is farther than everything inside.
+        """
+        limit = MAX_DISTANCE_KM if max_km is None else max_km
+        cell = self._cell(lat, lon)
+        point = _unit_vector(lat, lon)
+        radius = min(self.cell_km, limit)
+        while True:
+            rows = self._candidates(cell, radius)
+            cosines = self._xyz[rows] @ point
+            inside = np.flatnonzero(cosines >= math.cos(min(radius / EARTH_RADIUS_KM, math.pi)))
+            if len(inside) >= k or radius >= limit:
+                break
+            radius = min(radius * 4, limit)
+        if len(inside) > k:
+            inside = inside[np.argpartition(-cosines[inside], k - 1)[:k]]
+        return self._result(rows[inside], _km(cosines[inside]))
+
+    # --- batch queries -------------------------------------------------------
+
+    def _groups(self, points) -> Tuple[np.ndarray, Iterator[Tuple[Tuple[int, int], np.ndarray]]]:
+        """Unit vectors of the points and their indexes grouped by grid cell"""
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        groups = defaultdict(list)
+        for index, (lat, lon) in enumerate(points.tolist()):
+            groups[self._cell(lat, lon)].append(index)
+        vectors = unit_vectors(points[:, 0], points[:, 1])
+        return vectors, ((cell, np.array(indexes, dtype=np.intp)) for cell, indexes in groups.items())
+
+    def within_batch(self, points, radius_km: Optional[float] = None) -> List[List[Dict[str, Any]]]:
+        """
+        within() for many locations at once
+
+        Args:
+            points: Sequence of (lat, lon)
+
+        Returns:
+            One result list per point, in input order
+        """
+        radius_km = self.radius_km if radius_km is None else radius_km
+        threshold = math.cos(min(radius_km / EARTH_RADIUS_KM, math.pi))
+        vectors, groups = self._groups(points)
+        results: List[List[Dict[str, Any]]] = [[] for _ in range(len(vectors))]
+        for cell, indexes in groups:
+            rows = self._candidates(cell, radius_km)
+            if not len(rows):
+                continue
+            matrix = vectors[indexes] @ self._xyz[rows].T
+            for index, cosines in zip(indexes.tolist(), matrix):
+                inside = cosines >= threshold
+                results[index] = self._result(rows[inside], _km(cosines[inside]))
+        return results
+
+    def nearest_batch(self, points, k: int = 3,
+                      max_km: Optional[float] = None) -> List[List[Dict[str, Any]]]:
+        """nearest() for many locations at once, in input order"""
+        rows, distances = self.nearest_arrays(points, k, max_km)
+        return [self._result(r[r >= 0], d[r >= 0]) for r, d in zip(rows, distances)]
+
+    def nearest_arrays(self, points, k: int = 3,
+                       max_km: Optional[float] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        k-nearest search for many locations, as arrays
+
+        Returns:
+            (rows, distances_km), both shaped (len(points), k) and sorted
+            nearest first; rows index `centers`, missing neighbours are
+            padded with row -1 and distance inf
+        """
+        limit = MAX_DISTANCE_KM if max_km is None else max_km
+        vectors, groups = self._groups(points)
+        all_rows = np.full((len(vectors), k), -1, dtype=np.intp)
+        all_distances = np.full((len(vectors), k), np.inf)
+        for cell, indexes in groups:
+            radius = min(self.cell_km, limit)
+            while True:
+                rows = self._candidates(cell, radius)
+                matrix = vectors[indexes] @ self._xyz[rows].T
+                within_radius = matrix >= math.cos(min(radius / EARTH_RADIUS_KM, math.pi))
+                if radius >= limit or (within_radius.sum(axis=1) >= k).all():
+                    break
+                radius = min(radius * 4, limit)
+            # Anything inside the final radius is nearer than anything outside it
+            matrix[~within_radius] = -np.inf
+            top = min(k, len(rows))
+            if not top:
+                continue
+            best = np.argpartition(-matrix, top - 1, axis=1)[:, :top] if len(rows) > top \
+                else np.broadcast_to(np.arange(top), (len(indexes), top))
+            cosines = np.take_along_axis(matrix, best, axis=1)
+            order = np.argsort(-cosines, axis=1, kind="stable")
+            best = np.take_along_axis(best, order, axis=1)
+            cosines = np.take_along_axis(cosines, order, axis=1)
+            found = np.isfinite(cosines)
+            all_rows[indexes, :top] = np.where(found, rows[best], -1)
+            all_distances[indexes, :top] = np.where(found, _km(np.where(found, cosines, 1.0)), np.inf)
+        return all_rows, all_distances
+
+
+def _scan(index: ServiceCenterIndex, lat: float, lon: float, radius_km: float) -> List[str]:
+    """Vectorized scan over every center (benchmark baseline)"""
+    distances = _km(index._xyz @ _unit_vector(lat, lon))
+    rows = np.flatnonzero(distances <= radius_km)
+    return [index.centers[r]["center_id"] for r in rows[np.argsort(distances[rows], kind="stable")]]
+
+
+@lru_cache(maxsize=1)
+def get_service_center_index() -> ServiceCenterIndex:
+    """Shared index loaded from agents_config.yaml `service_centers_path`"""
+    config = load_config("agents_config").get("agents", {}).get("scheduling_agent", {})
+    path = Path(config.get("service_centers_path", "data/service_centers/locations.json"))
+    if not path.is_absolute():
+        path = PROJECT_ROOT / path
+    return ServiceCenterIndex.from_file(path, radius_km=config.get("service_center_radius_km", 50))
+
+
+if __name__ == "__main__":
+    import random
+    import timeit
+
+    random.seed(1)
+    # Centers spread over India's bounding box, vehicles clustered around cities
+    centers = [{"center_id": f"SC{i:05d}", "lat": random.uniform(8, 32), "lon": random.uniform(68, 92)}
+               for i in range(20000)]
+    index = ServiceCenterIndex(centers)
+    cities = [(random.uniform(10, 30), random.uniform(70, 90)) for _ in range(20)]
+    vehicles = [(lat + random.gauss(0, 0.3), lon + random.gauss(0, 0.3))
+                for lat, lon in (random.choice(cities) for _ in range(2000))]
+    queries = iter(vehicles * 10)
+    index.within_batch(vehicles, 50)  # fill the candidate cache
+
+    assert [c["center_id"] for c in index.within(*vehicles[0], 50)] == _scan(index, *vehicles[0], 50)
+    for name, query in [
+        ("linear scan (50 km)", lambda: _scan(index, *next(queries), 50)),
+        ("within (50 km)", lambda: index.within(*next(queries), 50)),
+        ("nearest (k=3)", lambda: index.nearest(*next(queries), k=3)),
+    ]:
+        seconds = timeit.timeit(query, number=len(vehicles))
+        print(f"{name}: {seconds / len(vehicles) * 1e6:,.1f} µs/query")
+    for name, query in [
+        ("within_batch (50 km)", lambda: index.within_batch(vehicles, 50)),
+        ("nearest_batch (k=3)", lambda: index.nearest_batch(vehicles, k=3)),
+    ]:
+        seconds = timeit.timeit(query, number=1)
+        print(f"{name}: {seconds / len(vehicles) * 1e6:,.1f} µs/vehicle")
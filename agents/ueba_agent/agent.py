@@ -0,0 +1,153 @@
+"""
+UEBA Agent
+User and entity behavior analytics for agents and API clients
+"""
+
+import time
+from collections import deque
+from functools import lru_cache
+
+from agents.base_agent import BaseAgent
+from agents.ueba_agent.anomaly_detector import get_rule_engine
+from agents.ueba_agent.threat_scorer import scorer_from_config
+from utils.config import load_config
+
+class UEBAAgent(BaseAgent):
+    """Security agent that watches every orchestrator task and API call"""
+    
+    def __init__(self, engine=None, config=None, rules_config=None):
+        super().__init__(agent_id="ueba", agent_name="ueba_agent")
+        self.engine = engine or get_rule_engine()
+        if config is None:
+            config = load_config("agents_config").get("agents", {}).get("ueba_agent", {})
+        rules_config = rules_config if rules_config is not None else load_config("ueba_rules")
+        self.score_threshold = config.get("anomaly_score_threshold", 0.75)
+        self.auto_block = config.get("auto_block_enabled", True)
+        self.alert_channels = config.get("alert_channels", [])
+        # sender -> destinations it may send tasks to ("*" = any); unlisted senders may reach any agent
+        self.allowed_routes = config.get("allowed_routes", {})
+        self.actions = rules_config.get("actions", {})
+        self.threats = scorer_from_config(rules_config.get("threat_scoring", {}),
+                                          capacity=self.engine.max_entities)
+        self.alerts = deque(maxlen=1000)
+        # agent -> block expiry (None = until unblocked)
+        self.blocked = {}
+        # agent -> throttle expiry
+        self.throttled = {}
+    
+    async def initialize(self) -> bool:
+        return True
+    
+    async def shutdown(self) -> bool:
+        return True
+    
+    async def process_task(self, task):
+        """Evaluate the events of an orchestrator task ({"events": [...]} or one event)"""
+        data = task.get("data", {})
+        events = data.get("events") or [data]
+        alerts = [alert for event in events for alert in self.observe(event)]
+        self.update_activity()
+        return {"alerts": alerts}
+    
+    def observe(self, event):
+        """
+        Evaluate one event and apply the actions of any rules it trips
+        
+        Returns:
+            Alerts raised by the event
+        """
+        alerts = self.engine.observe(event)
+        for alert in alerts:
+            self._apply(alert)
+        return alerts
+    
+    def allow_task(self, task, agent_key, registered=True):
+        """
+        Record an orchestrator task against its sender
+        
+        A task to an unregistered agent, or to one outside the sender's
+        allowed_routes, is a routing violation.
+        
+        Returns:
+            False if the sender is blocked
+        """
+        sender = task.get("source") or task.get("data", {}).get("source") or "unknown"
+        self.observe({"type": "task", "agent": sender, "destination": agent_key,
+                      "allowed_route": registered and self.route_allowed(sender, agent_key)})
+        return not self.is_blocked(sender)
+    
+    def route_allowed(self, sender, destination):
+        routes = self.allowed_routes.get(sender)
+        return routes is None or "*" in routes or destination in routes
+    
+    def _apply(self, alert):
+        action = alert["action"]
+        if not self.actions.get(action, {}).get("enabled", True):
+            action = "log"
+        agent, now = alert["agent"], alert["timestamp"]
+        score = self.threats.add(agent, alert["severity"], now, alert["rule"])
+        level = self.threats.level(score)
+        block = self.actions.get("block", {})
+        if action == "block" and self.auto_block:
+            self.blocked[agent] = (now + block.get("duration_minutes", 60) * 60
+                                   if block.get("auto_unblock", False) else None)
+        elif (level == "critical" and self.auto_block and block.get("enabled", True)
+              and len(self.threats.sources(agent, now)) >= 2):
+            # Different anomalies adding up earn a timed block; one rule firing
+            # again and again (a burst of parallel requests) keeps its own action
+            action = "block"
+            if agent not in self.blocked:
+                self.blocked[agent] = now + block.get("duration_minutes", 60) * 60
+        elif action == "throttle":
+            throttle = self.actions.get("throttle", {})
+            self.throttled = {key: until for key, until in self.throttled.items() if until > now}
+            self.throttled[agent] = now + throttle.get("duration_minutes", 1) * 60
+        alert = dict(alert, applied=action, threat_score=round(score, 1), threat_level=level,
+                     escalated=alert["score"] >= self.score_threshold or level == "critical")
+        if alert["escalated"]:
+            alert["channels"] = self.alert_channels
+            self.logger.warning(f"{alert['rule']} by {agent}: {alert['description']} "
+                                f"({alert['measure']} > {alert['threshold']}, action: {action})")
+        else:
+            self.logger.info(f"{alert['rule']} by {agent} ({alert['measure']} > {alert['threshold']})")
+        self.alerts.append(alert)
+    
+    def is_blocked(self, agent, now=None):
+        if agent not in self.blocked:
+            return False
+        until = self.blocked[agent]
+        if until is not None and (now or time.time()) >= until:
+            del self.blocked[agent]
+            return False
+        return True
+    
+    def is_throttled(self, agent, now=None):
+        until = self.throttled.get(agent)
+        if until is None:
+            return False
+        if (now or time.time()) >= until:
+            self.throttled.pop(agent, None)
+            return False
+        return True
+    
+    def unblock(self, agent):
+        """Admin review: lift a block"""
+        self.blocked.pop(agent, None)
+        self.threats.reset(agent)
+    
+    def threat(self, agent, now=None):
+        """Current (decayed) threat score and level of an agent"""
+        score = self.threats.score(agent, now or time.time())
+        return {"agent": agent, "score": round(score, 1), "level": self.threats.level(score)}
+    
+    def top_threats(self, limit=10, now=None):
+        return self.threats.top(now or time.time(), limit)
+    
+    def recent_alerts(self, limit=50):
+        """Latest alerts, newest first"""
+        return list(self.alerts)[::-1][:limit]
+
+@lru_cache(maxsize=1)
+def get_ueba_agent():
+    """Shared agent for the API and the orchestrator"""
+    return UEBAAgent()
@@ -0,0 +1,121 @@
+"""
+Behavior Monitor
+Per-entity behavioral baselines in fixed-size arrays
+
+Every monitored entity (agent, API client) gets one row of preallocated
+numpy arrays holding a time-decayed mean and variance per metric. An
+observation t seconds old weighs exp(-t / time_constant), and the decay
+is applied lazily when the next observation arrives, so there are no
+timers and an idle entity costs nothing. At capacity the least recently
+seen entity's row is reused. 10,000 entities x 8 metrics take about 3 MB.
+
+A baseline is only trusted once it has `min_samples` observations. The
+gate counts samples, not time since the process started, so a restarted
+server relearns its baselines as soon as traffic has been seen again.
+"""
+
+import math
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+
+class BaselineStore:
+    """Time-decayed mean/variance per (entity, metric)"""
+
+    def __init__(self, metrics: Sequence[str], capacity: int = 10000,
+                 time_constant_seconds: float = 7 * 86400, min_samples: int = 10):
+        """
+        Args:
+            metrics: Metric names (one column each)
+            capacity: Entities kept; the least recently seen is replaced
+            time_constant_seconds: Age at which an observation's weight has
+                fallen to 1/e
+            min_samples: Observations of a metric before it is used
+        """
+        self.metrics = {name: column for column, name in enumerate(metrics)}
+        self.capacity = capacity
+        self.time_constant = time_constant_seconds
+        self.min_samples = min_samples
+        shape = (capacity, max(len(self.metrics), 1))
+        self.mean = np.zeros(shape)
+        self.variance = np.zeros(shape)
+        self.weight = np.zeros(shape)
+        self.updated = np.zeros(shape)
+        self.samples = np.zeros(shape, dtype=np.int32)
+        self.last_seen = np.full(capacity, -np.inf)
+        self._rows: Dict[str, int] = {}
+        self._entities: List[Optional[str]] = [None] * capacity
+        self._free = list(range(capacity - 1, -1, -1))
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def row(self, entity: str, t: float) -> int:
+        """Row of an entity, allocating (or recycling) one on first sight"""
+        row = self._rows.get(entity)
+        if row is None:
+            if self._free:
+                row = self._free.pop()
+            else:
+                row = int(self.last_seen.argmin())
+                del self._rows[self._entities[row]]
+            self._rows[entity] = row
+            self._entities[row] = entity
+            self.weight[row] = 0.0
+            self.samples[row] = 0
+        self.last_seen[row] = t
+        return row
+
+    def forget(self, entity: str):
+        row = self._rows.pop(entity, None)
+        if row is not None:
+            self._entities[row] = None
+            self.last_seen[row] = -np.inf
+            self._free.append(row)
+
+    def update(self, row: int, column: int, x: float, t: float):
+        """Fold an observation into a baseline"""
+        if self.samples[row, column] == 0:
+            self.mean[row, column] = x
+            self.variance[row, column] = 0.0
+            weight = 1.0
+        else:
+            elapsed = t - self.updated[row, column]
+            decay = math.exp(-elapsed / self.time_constant) if elapsed > 0 else 1.0
+            weight = self.weight[row, column] * decay + 1.0
+            share = 1.0 / weight
+            delta = x - self.mean[row, column]
+            self.mean[row, column] += share * delta
+            self.variance[row, column] = (1 - share) * (self.variance[row, column] + share * delta * delta)
+        self.weight[row, column] = weight
+        self.samples[row, column] += 1
+        if t > self.updated[row, column]:
+            self.updated[row, column] = t
+
+    def learning(self, row: int, column: int) -> bool:
+        return self.samples[row, column] < self.min_samples
+
+    def zscore(self, row: int, column: int, x: float, t: float, min_std: float = 1e-9) -> Optional[float]:
+        """Deviation of x from the baseline in standard deviations; None while learning"""
+        if self.learning(row, column):
+            return None
+        std = max(math.sqrt(self.variance[row, column]), min_std)
+        return (x - self.mean[row, column]) / std
+
+    def baseline(self, entity: str) -> Dict[str, Any]:
+        """Current baselines of an entity (empty if unknown)"""
+        row = self._rows.get(entity)
+        if row is None:
+            return {}
+        return {
+            name: {"mean": round(float(self.mean[row, column]), 4),
+                   "std": round(math.sqrt(self.variance[row, column]), 4),
+                   "samples": int(self.samples[row, column])}
+            for name, column in self.metrics.items() if self.samples[row, column]
+        }
+
+    @property
+    def nbytes(self) -> int:
+        return sum(a.nbytes for a in (self.mean, self.variance, self.weight, self.updated, self.samples,
+                                      self.last_seen))
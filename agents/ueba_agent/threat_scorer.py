@@ -0,0 +1,125 @@
+"""
+Threat Scorer
+Decaying 0-100 threat score per entity
+
+Each alert adds points by severity. Scores halve every
+`score_decay_hours` without new anomalies; the decay is computed when a
+score is read or added to, from the stored value and its timestamp, so no
+timer ever walks the table. Scores live in two preallocated arrays; at
+capacity the entity with the lowest current score is replaced. Bands
+(low/medium/high/critical) come from ueba_rules.yaml `threat_scoring`.
+
+Each row also remembers which rules contributed and when, so callers can
+tell one rule firing over and over from several different anomalies.
+"""
+
+from typing import Any, Dict, List, Optional, Set
+
+import numpy as np
+
+DEFAULT_BANDS = {"low": [0, 30], "medium": [31, 60], "high": [61, 85], "critical": [86, 100]}
+DEFAULT_POINTS = {"low": 10, "medium": 25, "high": 50, "critical": 90}
+MAX_SCORE = 100.0
+
+
+class ThreatScorer:
+    """Lazily decayed threat scores in fixed-size arrays"""
+
+    def __init__(self, capacity: int = 10000, half_life_hours: float = 24,
+                 bands: Optional[Dict[str, List[float]]] = None,
+                 severity_points: Optional[Dict[str, float]] = None):
+        """
+        Args:
+            capacity: Entities kept
+            half_life_hours: Time for a score to halve without new alerts
+            bands: level -> [low, high] score range
+            severity_points: Points an alert of each severity adds
+        """
+        self.capacity = capacity
+        self.half_life = half_life_hours * 3600
+        self.bands = sorted(((low, level) for level, (low, _) in (bands or DEFAULT_BANDS).items()),
+                            reverse=True)
+        self.severity_points = severity_points or DEFAULT_POINTS
+        self.scores = np.zeros(capacity)
+        self.updated = np.zeros(capacity)
+        self._rows: Dict[str, int] = {}
+        self._entities: List[Optional[str]] = [None] * capacity
+        # row -> source -> last time it added points
+        self._sources: List[Dict[str, float]] = [{} for _ in range(capacity)]
+
+    def _decayed(self, rows, t: float):
+        return self.scores[rows] * np.exp2(-np.maximum(t - self.updated[rows], 0) / self.half_life)
+
+    def _row(self, entity: str, t: float) -> int:
+        row = self._rows.get(entity)
+        if row is None:
+            if len(self._rows) < self.capacity:
+                row = len(self._rows)
+            else:
+                row = int(self._decayed(slice(None), t).argmin())
+                del self._rows[self._entities[row]]
+            self._rows[entity] = row
+            self._entities[row] = entity
+            self.scores[row] = 0.0
+            self.updated[row] = t
+            self._sources[row] = {}
+        return row
+
+    def add(self, entity: str, severity: str, t: float, source: Optional[str] = None) -> float:
+        """Add an alert's points (from rule `source`) and return the new score"""
+        row = self._row(entity, t)
+        if source is not None:
+            sources = self._sources[row]
+            sources[source] = max(t, sources.get(source, t))
+        score = min(float(self._decayed(row, t)) + self.severity_points.get(severity, 0), MAX_SCORE)
+        self.scores[row] = score
+        self.updated[row] = max(t, self.updated[row])
+        return score
+
+    def score(self, entity: str, t: float) -> float:
+        row = self._rows.get(entity)
+        return 0.0 if row is None else float(self._decayed(row, t))
+
+    def sources(self, entity: str, t: float) -> Set[str]:
+        """Rules that added points within the last half-life"""
+        row = self._rows.get(entity)
+        if row is None:
+            return set()
+        return {source for source, at in self._sources[row].items() if t - at < self.half_life}
+
+    def level(self, score: float) -> str:
+        for low, level in self.bands:
+            if score >= low:
+                return level
+        return self.bands[-1][1]
+
+    def top(self, t: float, n: int = 10) -> List[Dict[str, Any]]:
+        """Highest current scores"""
+        if not self._rows:
+            return []
+        rows = np.fromiter(self._rows.values(), dtype=np.intp, count=len(self._rows))
+        scores = self._decayed(rows, t)
+        order = np.argsort(-scores, kind="stable")[:n]
+        return [
+            {"entity": self._entities[rows[i]], "score": round(float(scores[i]), 1),
+             "level": self.level(float(scores[i]))}
+            for i in order.tolist() if scores[i] > 0
+        ]
+
+    def reset(self, entity: str):
+        """Clear an entity's score (e.g. after admin review)"""
+        row = self._rows.get(entity)
+        if row is not None:
+            self.scores[row] = 0.0
+            self._sources[row] = {}
+
+    @property
+    def nbytes(self) -> int:
+        return self.scores.nbytes + self.updated.nbytes
+
+
+def scorer_from_config(config: Dict[str, Any], capacity: int = 10000) -> ThreatScorer:
+    """ThreatScorer for ueba_rules.yaml `threat_scoring`"""
+    bands = {level: value for level, value in config.items() if isinstance(value, list)}
+    return ThreatScorer(capacity=capacity, half_life_hours=config.get("score_decay_hours", 24),
+                        bands=bands or None, severity_points=config.get("severity_points"))
@@ -4,10 +4,13 @@ FastAPI server connecting AI agents to frontend
 """
 
 import os
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, Header, HTTPException, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
+from starlette.concurrency import run_in_threadpool
 from pydantic import BaseModel
-from typing import Optional
+from typing import Any, Dict, List, Optional, Union
+from datetime import datetime
 from dotenv import load_dotenv
 import uvicorn
 
@@ -17,8 +20,18 @@ from agents.data_analysis_agent.agent import DataAnalysisAgent
 from agents.diagnosis_agent.agent import DiagnosisAgent
 from agents.customer_engagement_agent.agent import CustomerEngagementAgent
 from agents.scheduling_agent.agent import SchedulingAgent
-from agents.feedback_agent.agent import FeedbackAgent
+from agents.scheduling_agent.availability_checker import SlotUnavailableError, UnknownServiceCenterError
+from agents.scheduling_agent.service_locator import get_service_center_index
+from agents.feedback_agent.nps_calculator import get_feedback_aggregator
+from agents.feedback_agent.sentiment_analyzer import get_sentiment_analyzer
+from agents.feedback_agent.survey_manager import get_survey_manager
+from agents.manufacturing_insights_agent.failure_aggregator import get_failure_aggregator, get_failure_reports
+from agents.manufacturing_insights_agent.pattern_detector import get_pattern_detector
+from agents.ueba_agent.agent import get_ueba_agent
 from utils.mock_data import get_vehicle, get_all_vehicles
+from utils.config import load_config
+from utils.precompute_store import PrecomputeStore
+from utils.rate_limiter import build_rate_limiter
 
 app = FastAPI(
     title="AI Predictive Maintenance API",
@@ -26,7 +39,38 @@ app = FastAPI(
     version="1.0.0"
 )
 
-# CORS middleware
+@app.middleware("http")
+async def monitor_api_calls(request: Request, call_next):
+    """Evaluate every API call against the UEBA rules; blocked clients get 403"""
+    client = request.client.host if request.client else "unknown"
+    ueba = get_ueba_agent()
+    ueba.observe({"type": "api_call", "agent": client, "endpoint": request.url.path})
+    if ueba.is_blocked(client):
+        return JSONResponse(status_code=403, content={"detail": "Client blocked by security policy"})
+    return await call_next(request)
+
+rate_limiter = build_rate_limiter()
+
+# Middleware registered later runs first: CORS, then the rate limit, then
+# UEBA monitoring. Refusals (429/403) still carry CORS headers, and calls
+# refused by the rate limit are not counted by the UEBA rules.
+@app.middleware("http")
+async def limit_request_rate(request: Request, call_next):
+    """Token buckets per client and per LLM endpoint; over the limit gets 429"""
+    if rate_limiter is None:
+        return await call_next(request)
+    client = request.client.host if request.client else "unknown"
+    throttled = get_ueba_agent().is_throttled(client)
+    if rate_limiter.backend.local:
+        wait = rate_limiter.check(client, request.url.path, throttled)
+    else:
+        wait = await run_in_threadpool(rate_limiter.check, client, request.url.path, throttled)
+    if wait > 0:
+        return JSONResponse(status_code=429, content={"detail": "Rate limit exceeded"},
+                            headers={"Retry-After": rate_limiter.retry_after(wait)})
+    return await call_next(request)
+
+# CORS middleware (outermost)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["http://localhost:3000", "http://localhost:3001", "*"],
@@ -35,6 +79,10 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Results precomputed off-peak by scripts/precompute_fleet.py
+precompute_store = PrecomputeStore()
+feedback_config = load_config("agents_config").get("agents", {}).get("feedback_agent", {})
+
 # Request models
 class VehicleAnalysisRequest(BaseModel):
     vehicle_id: str
@@ -51,6 +99,30 @@ class AppointmentRequest(BaseModel):
     name: str
     phone: str
     preferred_time: Optional[str] = "morning"
+    center_id: Optional[str] = None
+    slot: Optional[datetime] = None
+    latitude: Optional[float] = None
+    longitude: Optional[float] = None
+
+class FlaggedVehicle(BaseModel):
+    vehicle_id: str
+    latitude: float
+    longitude: float
+    urgency: Union[float, str] = "medium"
+
+class BatchScheduleRequest(BaseModel):
+    vehicles: List[FlaggedVehicle]
+
+class SurveyResponse(BaseModel):
+    response_id: Optional[str] = None
+    center_id: Optional[str] = None
+    technician_id: Optional[str] = None
+    submitted_at: Optional[datetime] = None
+    answers: Dict[str, Any]
+    comment: Optional[str] = None
+
+class SurveyResponseBatch(BaseModel):
+    responses: List[SurveyResponse]
 
 
 # API Routes
@@ -117,6 +189,14 @@ async def analyze_vehicle(request: VehicleAnalysisRequest):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+def record_failure(vehicle_id, vehicle_info, diagnosis):
+    """Feed a diagnosis to the fleet failure counts and sketches (first report per vehicle and fault)"""
+    record = dict(vehicle_info, vehicle_id=vehicle_id, diagnosis=diagnosis)
+    if not get_failure_reports().first(record):
+        return
+    get_pattern_detector().add(record)
+    get_failure_aggregator().add(record)
+
 @app.post("/api/diagnose")
 async def diagnose_vehicle(request: DiagnosisRequest):
     """Generate diagnosis from analysis"""
@@ -129,9 +209,12 @@ async def diagnose_vehicle(request: DiagnosisRequest):
         vehicle_info = {
             "model": vehicle["model"],
             "year": vehicle["year"],
-            "type": vehicle["type"]
+            "type": vehicle["type"],
+            "dtc_codes": vehicle.get("dtc_codes", []),
+            "sensor_data": vehicle.get("sensor_data", {})
         }
         diagnosis = agent.diagnose(request.analysis, vehicle_info)
+        record_failure(request.vehicle_id, vehicle_info, diagnosis)
         return {
             "success": True,
             "diagnosis": diagnosis
@@ -153,34 +236,169 @@ async def generate_call_script(request: CallScriptRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/api/schedule")
-async def schedule_appointment(request: AppointmentRequest):
+def schedule_appointment(request: AppointmentRequest):
     """Schedule maintenance appointment"""
     try:
         agent = SchedulingAgent()
-        booking = agent.schedule_appointment({
+        customer_info = {
             "name": request.name,
             "phone": request.phone,
-            "preferred_time": request.preferred_time
-        })
+            "preferred_time": request.preferred_time,
+            "center_id": request.center_id,
+            "slot": request.slot,
+            "location": (request.latitude, request.longitude)
+            if request.latitude is not None and request.longitude is not None else None
+        }
+        appointment = agent.book_slot(customer_info)
         return {
             "success": True,
-            "booking": booking
+            "booking": agent.confirmation_message(customer_info, appointment),
+            "appointment": {
+                **appointment,
+                "start": appointment["start"].isoformat(),
+                "end": appointment["end"].isoformat()
+            }
         }
+    except UnknownServiceCenterError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except SlotUnavailableError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/api/schedule/batch")
+def schedule_batch(request: BatchScheduleRequest):
+    """Book slots for a batch of flagged vehicles, most urgent first"""
+    try:
+        agent = SchedulingAgent()
+        plan = agent.schedule_batch([
+            {"vehicle_id": v.vehicle_id, "lat": v.latitude, "lon": v.longitude, "urgency": v.urgency}
+            for v in request.vehicles
+        ])
+        for assignment in plan["assignments"]:
+            assignment["start"] = assignment["start"].isoformat()
+        return {"success": True, **plan}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/api/service-centers")
+def find_service_centers(lat: float, lon: float, radius_km: Optional[float] = None,
+                         k: Optional[int] = None):
+    """Service centers near a location: within radius_km, or the k nearest"""
+    index = get_service_center_index()
+    centers = index.nearest(lat, lon, k=k, max_km=radius_km) if k else index.within(lat, lon, radius_km)
+    return {
+        "success": True,
+        "count": len(centers),
+        "service_centers": centers
+    }
+
 @app.get("/api/feedback")
-async def get_feedback_survey():
-    """Get customer feedback survey"""
+def get_feedback_survey(language: str = "en", if_none_match: Optional[str] = Header(None)):
+    """Get customer feedback survey (generated once per template version and language)"""
     try:
-        agent = FeedbackAgent()
-        survey = agent.generate_survey()
-        return {
-            "success": True,
-            "survey": survey
-        }
+        survey = get_survey_manager().get(language)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    headers = {"ETag": survey["etag"], "Cache-Control": "public, max-age=300"}
+    if if_none_match and (if_none_match.strip() == "*"
+                          or survey["etag"] in (tag.strip() for tag in if_none_match.split(","))):
+        return Response(status_code=304, headers=headers)
+    return Response(content=survey["body"], media_type="application/json", headers=headers)
+
+@app.post("/api/feedback/responses")
+def ingest_feedback(request: SurveyResponseBatch):
+    """Ingest completed surveys into the running NPS and rating aggregates"""
+    responses = [r.model_dump() for r in request.responses]
+    if feedback_config.get("sentiment_analysis_enabled", True):
+        # Local labels only; the LLM is kept off the ingestion path, so
+        # comments the lexicon is unsure about are left unlabelled
+        commented = [r for r in responses if r["comment"]]
+        if commented:
+            labels = get_sentiment_analyzer().local_labels([r["comment"] for r in commented])
+            for response, label in zip(commented, labels):
+                response["sentiment"] = label
+    report = get_feedback_aggregator().add_many(responses)
+    return {"success": True, **report}
+
+@app.get("/api/feedback/summary")
+def feedback_summary(center_id: Optional[str] = None, technician_id: Optional[str] = None,
+                     since: Optional[datetime] = None, until: Optional[datetime] = None,
+                     series: bool = False):
+    """NPS and mean ratings, fleet-wide or for one center or technician"""
+    aggregator = get_feedback_aggregator()
+    if technician_id:
+        dimension, key = "technician", technician_id
+    elif center_id:
+        dimension, key = "center", center_id
+    else:
+        dimension, key = "all", None
+    result = {"success": True, "summary": aggregator.summary(dimension, key, since, until)}
+    if series:
+        result["series"] = aggregator.series(dimension, key)
+    return result
+
+@app.get("/api/manufacturing/cohorts")
+def failure_cohorts(by: str = "model,year,component", model: Optional[str] = None,
+                    year: Optional[int] = None, component: Optional[str] = None,
+                    dtc: Optional[str] = None, top: Optional[int] = 20):
+    """Fleet failure counts grouped by any of model, year, component and dtc"""
+    where = {k: v for k, v in (("model", model), ("year", year), ("component", component),
+                               ("dtc", dtc)) if v is not None}
+    try:
+        cohorts = get_failure_aggregator().group_by([d for d in by.split(",") if d], where, top)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {
+        "success": True,
+        "count": len(cohorts),
+        "cohorts": cohorts
+    }
+
+@app.get("/api/manufacturing/insights")
+def manufacturing_insights(limit: int = 20):
+    """Latest root-cause and CAPA candidates for cohorts over the analysis threshold"""
+    insights = get_failure_aggregator().recent_insights(limit)
+    return {
+        "success": True,
+        "count": len(insights),
+        "insights": insights
+    }
+
+@app.get("/api/manufacturing/patterns")
+def failure_patterns(model: Optional[str] = None, year: Optional[int] = None,
+                     since: Optional[datetime] = None, until: Optional[datetime] = None,
+                     dtc: Optional[str] = None, top: int = 10):
+    """Approximate DTC counts, distinct vehicles and top components of a cohort (with error bounds)"""
+    dtcs = [code.strip() for code in (dtc or "").split(",") if code.strip()]
+    return {
+        "success": True,
+        "pattern": get_pattern_detector().summary(model, year, since, until, dtcs, top)
+    }
+
+@app.get("/api/security/alerts")
+def security_alerts(limit: int = 50):
+    """Latest UEBA alerts, highest threat scores and currently blocked clients"""
+    ueba = get_ueba_agent()
+    return {
+        "success": True,
+        "alerts": ueba.recent_alerts(limit),
+        "threats": ueba.top_threats(),
+        "blocked": sorted(a for a in list(ueba.blocked) if ueba.is_blocked(a))
+    }
+
+@app.get("/api/security/entities/{entity}")
+def security_entity(entity: str):
+    """Threat score and behavioral baselines of one agent or API client"""
+    ueba = get_ueba_agent()
+    return {
+        "success": True,
+        "threat": ueba.threat(entity),
+        "baselines": ueba.engine.baselines.baseline(entity),
+        "blocked": ueba.is_blocked(entity)
+    }
 
 @app.post("/api/complete-workflow/{vehicle_id}")
 async def complete_workflow(vehicle_id: str):
@@ -189,6 +407,36 @@ async def complete_workflow(vehicle_id: str):
     if not vehicle:
         raise HTTPException(status_code=404, detail="Vehicle not found")
     
+    vehicle_summary = {
+        "model": vehicle["model"],
+        "year": vehicle["year"],
+        "owner": vehicle["owner"],
+        "type": vehicle["type"]
+    }
+    vehicle_info = {
+        "model": vehicle["model"],
+        "year": vehicle["year"],
+        "type": vehicle["type"],
+        "dtc_codes": vehicle.get("dtc_codes", []),
+        "sensor_data": vehicle.get("sensor_data", {})
+    }
+    
+    # Serve the overnight result while the vehicle's inputs are unchanged
+    precomputed = precompute_store.get(vehicle_id, vehicle)
+    if precomputed:
+        # The sweep runs in its own process; count its diagnosis here (once per vehicle and fault)
+        record_failure(vehicle_id, vehicle_info, precomputed["diagnosis"])
+        return {
+            "success": True,
+            "vehicle_id": vehicle_id,
+            "vehicle_info": vehicle_summary,
+            "analysis": precomputed["analysis"],
+            "diagnosis": precomputed["diagnosis"],
+            "call_script": precomputed["call_script"],
+            "source": "precomputed",
+            "generated_at": precomputed["generated_at"]
+        }
+    
     try:
         # Step 1: Analysis
         print(f"Analyzing vehicle {vehicle_id}...")
@@ -198,30 +446,28 @@ async def complete_workflow(vehicle_id: str):
         # Step 2: Diagnosis
         print(f"Generating diagnosis...")
         diagnosis_agent = DiagnosisAgent()
-        vehicle_info = {
-            "model": vehicle["model"],
-            "year": vehicle["year"],
-            "type": vehicle["type"]
-        }
         diagnosis = diagnosis_agent.diagnose(analysis, vehicle_info)
+        record_failure(vehicle_id, vehicle_info, diagnosis)
         
         # Step 3: Call Script
         print(f"Generating call script...")
         engagement_agent = CustomerEngagementAgent()
         call_script = engagement_agent.generate_call_script(vehicle["owner"], diagnosis)
         
+        precompute_store.put(vehicle_id, vehicle, {
+            "analysis": analysis,
+            "diagnosis": diagnosis,
+            "call_script": call_script
+        })
+        
         return {
             "success": True,
             "vehicle_id": vehicle_id,
-            "vehicle_info": {
-                "model": vehicle["model"],
-                "year": vehicle["year"],
-                "owner": vehicle["owner"],
-                "type": vehicle["type"]
-            },
+            "vehicle_info": vehicle_summary,
             "analysis": analysis,
             "diagnosis": diagnosis,
-            "call_script": call_script
+            "call_script": call_script,
+            "source": "live"
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
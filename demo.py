@@ -18,6 +18,7 @@ from agents.data_analysis_agent.agent import DataAnalysisAgent
 from agents.diagnosis_agent.agent import DiagnosisAgent
 from agents.customer_engagement_agent.agent import CustomerEngagementAgent
 from utils.mock_data import get_vehicle, get_all_vehicles
+from utils.streaming import print_stream
 
 
 def print_header():
@@ -49,17 +50,19 @@ def run_demo():
     try:
         print(Fore.BLUE + "\n[STAGE 1] Data Analysis")
         agent1 = DataAnalysisAgent()
-        analysis = agent1.analyze(vehicle_data)
-        print(analysis[:400])
+        # The diagnosis needs the full analysis, so keep reading past the preview
+        analysis = print_stream(agent1.analyze_stream(vehicle_data), 400, consume_rest=True)
         
         print(Fore.BLUE + "\n[STAGE 2] Diagnosis")
         agent2 = DiagnosisAgent()
-        diagnosis = agent2.diagnose(analysis, {
+        # Last stage: stop generating once the preview is shown
+        print_stream(agent2.diagnose_stream(analysis, {
             "model": vehicle_data["model"],
             "year": vehicle_data["year"],
-            "type": vehicle_data["type"]
-        })
-        print(diagnosis[:400])
+            "type": vehicle_data["type"],
+            "dtc_codes": vehicle_data.get("dtc_codes", []),
+            "sensor_data": vehicle_data.get("sensor_data", {})
+        }), 400)
         
         print(Fore.GREEN + "\n✅ DEMO COMPLETE!")
         
@@ -18,9 +18,11 @@ except ImportError:
         BRIGHT = RESET_ALL = ""
 
 from agents.customer_engagement_agent.agent import CustomerEngagementAgent
+from agents.customer_engagement_agent.intent_classifier import get_intent_classifier
 from agents.data_analysis_agent.agent import DataAnalysisAgent
 from agents.diagnosis_agent.agent import DiagnosisAgent
 from utils.mock_data import get_vehicle
+from utils.streaming import print_stream
 
 
 def print_header():
@@ -68,10 +70,6 @@ def simulate_call_exchange(agent, customer_name, diagnosis):
     print(Fore.MAGENTA + "━" * 70)
     print()
     
-    # Generate full conversation script
-    print(Fore.BLUE + "🔄 Generating personalized conversation...\n")
-    full_script = agent.generate_call_script(customer_name, diagnosis)
-    
     # Parse and present conversation interactively
     print(Fore.CYAN + Style.BRIGHT + "🤖 AI Agent: ", end="")
     print(Fore.WHITE + "I understand this might be concerning, but I want to assure you " \
@@ -79,7 +77,7 @@ def simulate_call_exchange(agent, customer_name, diagnosis):
     print()
     
     # Interactive objection handling
-    print(Fore.YELLOW + "\n📌 Common Customer Responses:")
+    print(Fore.YELLOW + "\n📌 Common Customer Responses (pick a number or answer in your own words):")
     print("  1. I'm too busy right now")
     print("  2. How much will this cost?")
     print("  3. Can't this wait a few weeks?")
@@ -123,7 +121,20 @@ def simulate_call_exchange(agent, customer_name, diagnosis):
              "appointment details and a pre-service checklist."
     }
     
-    agent_response = responses.get(choice, responses["5"])
+    if choice not in responses:
+        # Free-text answer: map the detected intent onto the prepared responses
+        intent = get_intent_classifier().decide(choice)["intent"]
+        if intent in ("unclear", "unknown"):
+            print(Fore.CYAN + Style.BRIGHT + "🤖 AI Agent: ", end="")
+            print(Fore.WHITE + "Sorry, I want to make sure I understood you. Would you like to "
+                  "schedule the service, or do you have a question about the cost or urgency first?")
+            print()
+            print(Fore.YELLOW + f"👤 {customer_name} (You): ", end="")
+            choice = input()
+            print()
+            intent = get_intent_classifier().decide(choice)["intent"]
+        choice = {"accept": "5", "cost_question": "2", "urgency_question": "4"}.get(intent, "1")
+    agent_response = responses[choice]
     
     print(Fore.CYAN + Style.BRIGHT + "🤖 AI Agent: ", end="")
     print(Fore.WHITE + agent_response)
@@ -135,7 +146,7 @@ def simulate_call_exchange(agent, customer_name, diagnosis):
         final_choice = input().lower()
         print()
         
-        if final_choice in ["yes", "y"]:
+        if final_choice == "y" or get_intent_classifier().decide(final_choice)["intent"] == "accept":
             print(Fore.CYAN + Style.BRIGHT + "🤖 AI Agent: ", end="")
             print(Fore.WHITE + "Perfect! I have slots available tomorrow at 10 AM or 2 PM. " \
                   "Which time works better for you?")
@@ -147,7 +158,8 @@ def simulate_call_exchange(agent, customer_name, diagnosis):
             
             print(Fore.GREEN + Style.BRIGHT + "✅ APPOINTMENT CONFIRMED!")
             print(Fore.WHITE + f"📅 Date: Tomorrow")
-            print(Fore.WHITE + f"⏰ Time: {time_choice}")
+            slot = get_intent_classifier().classify(time_choice)["slot"]
+            print(Fore.WHITE + f"⏰ Time: {'2:00 PM' if slot == 'afternoon' else '10:00 AM'}")
             print(Fore.WHITE + f"📍 Location: ABC Motors Service Center")
             print(Fore.WHITE + f"📱 SMS confirmation sent to your phone")
             print(Fore.WHITE + f"💰 Estimated cost: ₹5,000-10,000")
@@ -163,10 +175,10 @@ def simulate_call_exchange(agent, customer_name, diagnosis):
     print(Fore.GREEN + Style.BRIGHT + "📞 Call Ended - Duration: 5 minutes")
     print(Fore.MAGENTA + "━" * 70 + "\n")
     
-    # Show full AI-generated script
+    # Show AI-generated script, streamed; generation stops once the preview is full
     print(Fore.BLUE + "\n📝 AI-Generated Full Call Script (for training purposes):")
     print(Fore.WHITE + "=" * 70)
-    print(full_script[:800])
+    print_stream(agent.generate_call_script_stream(customer_name, diagnosis), 800)
     print("=" * 70 + "\n")
 
 
@@ -0,0 +1,139 @@
+"""
+Overnight precomputation of fleet analysis, diagnosis and call scripts
+
+Walks the fleet during the off-peak window from agents_config.yaml
+(`precompute`), regenerates results only for vehicles whose inputs
+changed, and stores them for the API to serve instantly.
+
+Usage:
+    python scripts/precompute_fleet.py            # wait for each off-peak window
+    python scripts/precompute_fleet.py --now      # single run right away
+"""
+import argparse
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from utils.config import load_config
+from utils.mock_data import get_all_vehicles
+from utils.precompute_store import PrecomputeStore
+
+
+def generate_results(vehicle: dict) -> dict:
+    """Run the same three stages as /api/complete-workflow"""
+    from agents.data_analysis_agent.agent import DataAnalysisAgent
+    from agents.diagnosis_agent.agent import DiagnosisAgent
+    from agents.customer_engagement_agent.agent import CustomerEngagementAgent
+
+    analysis = DataAnalysisAgent().analyze(vehicle)
+    diagnosis = DiagnosisAgent().diagnose(analysis, {
+        "model": vehicle["model"],
+        "year": vehicle["year"],
+        "type": vehicle["type"],
+        "dtc_codes": vehicle.get("dtc_codes", []),
+        "sensor_data": vehicle.get("sensor_data", {})
+    })
+    call_script = CustomerEngagementAgent().generate_call_script(vehicle["owner"], diagnosis)
+    return {"analysis": analysis, "diagnosis": diagnosis, "call_script": call_script}
+
+
+def run_precompute(store: PrecomputeStore, vehicles: dict, deadline: datetime = None,
+                   generate=generate_results) -> dict:
+    """
+    Precompute results for every vehicle whose inputs changed
+
+    Args:
+        store: Destination store
+        vehicles: vehicle_id -> vehicle record
+        deadline: Stop generating new results after this time
+        generate: Function producing results for one vehicle
+
+    Returns:
+        Run report with throughput and reuse counts
+    """
+    started = time.perf_counter()
+    report = {"vehicles": len(vehicles), "generated": 0, "reused": 0,
+              "failed": 0, "deferred": 0}
+
+    for vehicle_id, vehicle in vehicles.items():
+        if store.get(vehicle_id, vehicle):
+            report["reused"] += 1
+            continue
+        if deadline and datetime.now() >= deadline:
+            report["deferred"] += 1
+            continue
+        try:
+            store.put(vehicle_id, vehicle, generate(vehicle))
+            report["generated"] += 1
+        except Exception as e:
+            report["failed"] += 1
+            print(f"❌ {vehicle_id}: {e}")
+
+    elapsed = time.perf_counter() - started
+    report["duration_seconds"] = round(elapsed, 2)
+    report["generated_per_minute"] = round(report["generated"] / elapsed * 60, 2) if elapsed else 0.0
+    report["vehicles_per_second"] = round(len(vehicles) / elapsed, 2) if elapsed else 0.0
+    return report
+
+
+def next_window(now: datetime, start: str, end: str):
+    """Start and end of the current or next off-peak window"""
+    start_time = datetime.strptime(start, "%H:%M").time()
+    end_time = datetime.strptime(end, "%H:%M").time()
+    window_start = datetime.combine(now.date(), start_time)
+    window_end = datetime.combine(now.date(), end_time)
+    if window_end <= window_start:
+        window_end += timedelta(days=1)
+    if now >= window_end:
+        window_start += timedelta(days=1)
+        window_end += timedelta(days=1)
+    elif now < window_start and now < window_end - timedelta(days=1):
+        # Inside a window that started yesterday and wraps past midnight
+        window_start -= timedelta(days=1)
+        window_end -= timedelta(days=1)
+    return window_start, window_end
+
+
+def print_report(report: dict):
+    print("\n" + "="*70)
+    print("📦 PRECOMPUTE RUN")
+    print("="*70)
+    for key, value in report.items():
+        print(f"  {key}: {value}")
+    print("="*70 + "\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Precompute fleet results off-peak")
+    parser.add_argument("--now", action="store_true", help="run once immediately and exit")
+    args = parser.parse_args()
+
+    config = load_config("agents_config").get("precompute", {})
+    start = config.get("off_peak_start", "01:00")
+    end = config.get("off_peak_end", "05:00")
+    store = PrecomputeStore()
+
+    if args.now:
+        print_report(run_precompute(store, get_all_vehicles()))
+        return
+
+    while True:
+        window_start, window_end = next_window(datetime.now(), start, end)
+        wait = (window_start - datetime.now()).total_seconds()
+        if wait > 0:
+            print(f"⏳ Next off-peak run at {window_start:%Y-%m-%d %H:%M}")
+            time.sleep(wait)
+        print_report(run_precompute(store, get_all_vehicles(), deadline=window_end))
+        # Sleep past the end of this window before planning the next one
+        time.sleep(max(0.0, (window_end - datetime.now()).total_seconds()) + 1)
+
+
+if __name__ == "__main__":
+    main()
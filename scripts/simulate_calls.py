@@ -0,0 +1,282 @@
+"""
+Headless concurrent call simulator
+
+Drives scripted customers through the same steps as a live service call
+(diagnosis lookup, templated call script, intent classification and slot
+booking), with text in place of audio, on asyncio. Use it to find how
+many simultaneous outbound calls one node can handle.
+
+Slots are booked through the scheduling agent's BookingManager: the bay
+is held when the customer picks a slot and confirmed after the
+confirmation turn, so concurrent calls race on the real hold/confirm path.
+
+Usage:
+    python scripts/simulate_calls.py --calls 2000 --concurrency 200
+    python scripts/simulate_calls.py --calls 500 --concurrency 50 --think-ms 300 --bays 2
+"""
+import argparse
+import asyncio
+import itertools
+import random
+import statistics
+import sys
+import time
+from collections import Counter
+from datetime import date, datetime, time as clock_time, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from agents.customer_engagement_agent.intent_classifier import get_intent_classifier
+from agents.customer_engagement_agent.script_templates import DEFAULT_SLOTS, build_call_lines, greeting_line
+from agents.diagnosis_agent.rule_engine import DiagnosisRuleEngine, format_diagnosis
+from agents.scheduling_agent.availability_checker import ServiceCalendar, SlotUnavailableError
+from agents.scheduling_agent.booking_manager import BookingManager, HoldExpiredError
+from utils.mock_data import get_all_vehicles
+from utils.precompute_store import PrecomputeStore
+
+# Customer replies per turn: greeting, scheduling question, (clarifying
+# question if the answer was unclear,) follow-up
+PERSONAS = {
+    "eager_morning": ["Yes, go ahead", "Yes please, tomorrow morning", "No, that's all"],
+    "eager_afternoon": ["Sure", "2 pm works for me", "Nothing else, thanks"],
+    "busy_then_agrees": ["Okay", "I'm quite busy this week", "Yes, that's okay"],
+    "busy_declines": ["Who is this?", "Not now, maybe later", "No thanks"],
+    "unclear_then_books": ["Hello?", "Hmm, what do you mean", "Just schedule it"],
+    "unclear_declines": ["Hmm", "I know the car is old", "Not interested"],
+    "hesitant_then_books": ["Yes?", "I'm not sure about 10 am", "2 pm then", "No, that's all"],
+}
+
+FALLBACK_DIAGNOSIS = "1. Primary Issue: General inspection due\n3. Time to Failure: 30 days\n" \
+                     "4. Estimated Repair Cost: ₹2,000-4,000"
+
+
+SIM_CENTER = "SIM-CENTER"
+
+
+class SlotBook:
+    """The offered slots (tomorrow at 10 AM and 2 PM) of one simulated center, booked via BookingManager"""
+
+    def __init__(self, bays: int = 4, hold_ttl_seconds: float = 120.0):
+        today = date.today()
+        tomorrow = today + timedelta(days=1)
+        self.manager = BookingManager(ServiceCalendar({SIM_CENTER: bays}, start_date=today),
+                                      hold_ttl_seconds)
+        self.starts = {DEFAULT_SLOTS[0]: datetime.combine(tomorrow, clock_time(10)),
+                       DEFAULT_SLOTS[1]: datetime.combine(tomorrow, clock_time(14))}
+
+    def hold(self, slot: str, call_id: int):
+        """Hold id for a free bay in the slot, None if it is full"""
+        try:
+            return self.manager.hold(SIM_CENTER, self.starts[slot], {"call_id": call_id})["hold_id"]
+        except SlotUnavailableError:
+            return None
+
+    def confirm(self, hold_id: str) -> bool:
+        """False if the hold expired before the call got to confirm it"""
+        try:
+            self.manager.confirm(hold_id)
+            return True
+        except HoldExpiredError:
+            return False
+
+    def double_bookings(self) -> int:
+        """Confirmed bookings sharing a bay and start time (must stay 0)"""
+        bays = Counter((b["start"], b["bay"]) for b in self.manager.confirmed_bookings())
+        return sum(n - 1 for n in bays.values())
+
+
+class DiagnosisLookup:
+    """Precomputed diagnosis if fresh, else the rule engine, else a generic report"""
+
+    def __init__(self, store: PrecomputeStore = None):
+        self.store = store
+        self.rule_engine = DiagnosisRuleEngine()
+        self._cache = {}
+
+    def get(self, vehicle_id: str, vehicle: dict) -> str:
+        if vehicle_id in self._cache:
+            return self._cache[vehicle_id]
+        diagnosis = None
+        entry = self.store.get(vehicle_id, vehicle) if self.store else None
+        if entry:
+            diagnosis = entry["diagnosis"]
+        else:
+            result = self.rule_engine.evaluate(vehicle.get("sensor_data", {}), vehicle.get("type"),
+                                               vehicle.get("dtc_codes", []))
+            diagnosis = format_diagnosis(result) if result else FALLBACK_DIAGNOSIS
+        self._cache[vehicle_id] = diagnosis
+        return diagnosis
+
+
+async def simulate_call(call_id: int, vehicle_id: str, vehicle: dict, persona: str,
+                        lookup: DiagnosisLookup, book: SlotBook, stats: dict, think_seconds: float):
+    """One scripted call; mirrors the branches of voice_call_agent.voice_conversation"""
+    classifier = get_intent_classifier()
+    replies = iter(PERSONAS[persona])
+    spoken = []
+
+    # Time the customer finished the current reply
+    replied_at = 0.0
+
+    async def customer_turn():
+        nonlocal replied_at
+        think = random.uniform(0.5, 1.5) * think_seconds
+        replied_at = time.perf_counter() + think
+        # Always yield, so waiting on other calls' work shows up as latency
+        await asyncio.sleep(think)
+        return next(replies, "")
+
+    def agent_turn(*lines):
+        # Latency from the customer's reply to the agent's next line being ready
+        spoken.extend(lines)
+        stats["turn_latency"].append(time.perf_counter() - replied_at)
+
+    spoken.append(greeting_line(vehicle["owner"]))
+    await customer_turn()
+
+    diagnosis = lookup.get(vehicle_id, vehicle)
+    lines = build_call_lines(vehicle["owner"], diagnosis)
+    if "scheduling_question" not in lines:
+        # Nothing to repair: courtesy call, no booking
+        agent_turn(lines["intro"], lines["issues"], lines["advice"], lines["closing"])
+        stats["outcomes"]["all_clear"] = stats["outcomes"].get("all_clear", 0) + 1
+        stats["lines_spoken"] += len(spoken)
+        return
+    agent_turn(lines["intro"], lines["issues"], lines["safety"], lines["cost"],
+               lines["scheduling_question"])
+
+    intent = classifier.decide(await customer_turn())
+    if intent["intent"] == "unclear":
+        # A mixed answer gets one clarifying question, as on a live call
+        agent_turn("clarifying_question")
+        intent = classifier.decide(await customer_turn())
+    outcome = "not_booked"
+    if intent["intent"] == "accept":
+        hold_id = hold_slot(call_id, intent["slot"], book, stats)
+        agent_turn("confirmation" if hold_id else "waitlist")
+        final = classifier.decide(await customer_turn())
+        # Confirmed once the customer has heard the confirmation and replied
+        outcome = confirm_slot(hold_id, book, stats)
+        agent_turn("closing" if final["intent"] == "decline" else "closing_questions")
+    elif intent["intent"] == "defer":
+        agent_turn("concern")
+        follow_up = classifier.decide(await customer_turn())
+        outcome = "follow_up" if follow_up["intent"] == "accept" else "not_booked"
+        agent_turn("follow_up" if outcome == "follow_up" else "last_try")
+    else:
+        agent_turn("clarification")
+        final = classifier.decide(await customer_turn())
+        if final["intent"] == "accept":
+            outcome = confirm_slot(hold_slot(call_id, final["slot"], book, stats), book, stats)
+        agent_turn("booking" if outcome == "booked" else "last_try")
+
+    stats["outcomes"][outcome] = stats["outcomes"].get(outcome, 0) + 1
+    stats["lines_spoken"] += len(spoken)
+
+
+def hold_slot(call_id: int, slot_name, book: SlotBook, stats: dict):
+    """Hold the requested slot, falling back to the other one if it is full; None if both are"""
+    preferred = DEFAULT_SLOTS[1] if slot_name == "afternoon" else DEFAULT_SLOTS[0]
+    hold_id = book.hold(preferred, call_id)
+    if hold_id:
+        return hold_id
+    stats["conflicts"] += 1
+    for slot in DEFAULT_SLOTS:
+        if slot != preferred:
+            hold_id = book.hold(slot, call_id)
+            if hold_id:
+                return hold_id
+    return None
+
+
+def confirm_slot(hold_id, book: SlotBook, stats: dict) -> str:
+    """Outcome of confirming a hold (None: no bay was free)"""
+    if hold_id is None:
+        return "waitlisted"
+    if book.confirm(hold_id):
+        return "booked"
+    stats["conflicts"] += 1
+    return "hold_expired"
+
+
+def _percentile(sorted_values, q):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(q / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+async def run_simulation(calls: int = 1000, concurrency: int = 100, bays: int = 4,
+                         think_ms: float = 0.0, store: PrecomputeStore = None, seed: int = 7) -> dict:
+    """
+    Run scripted calls with at most `concurrency` in flight
+
+    Returns:
+        Report with throughput, per-turn latency percentiles, booking
+        outcomes and conflicts
+    """
+    random.seed(seed)
+    vehicles = list(get_all_vehicles().items())
+    personas = list(PERSONAS)
+    lookup = DiagnosisLookup(store)
+    book = SlotBook(bays=bays)
+    stats = {"turn_latency": [], "conflicts": 0, "outcomes": {}, "lines_spoken": 0}
+    semaphore = asyncio.Semaphore(concurrency)
+    assignments = zip(range(calls), itertools.cycle(vehicles), itertools.cycle(personas))
+
+    async def bounded(call_id, vehicle_item, persona):
+        async with semaphore:
+            await simulate_call(call_id, vehicle_item[0], vehicle_item[1], persona,
+                                lookup, book, stats, think_ms / 1000)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(bounded(*a) for a in assignments))
+    elapsed = time.perf_counter() - started
+
+    latency = sorted(stats["turn_latency"])
+    return {
+        "calls": calls,
+        "concurrency": concurrency,
+        "duration_seconds": round(elapsed, 3),
+        "calls_per_second": round(calls / elapsed, 1) if elapsed else 0.0,
+        "turns": len(latency),
+        "turn_latency_ms": {
+            "p50": round(_percentile(latency, 50) * 1000, 3),
+            "p95": round(_percentile(latency, 95) * 1000, 3),
+            "p99": round(_percentile(latency, 99) * 1000, 3),
+            "mean": round(statistics.fmean(latency) * 1000, 3) if latency else 0.0,
+        },
+        "lines_per_call": round(stats["lines_spoken"] / calls, 1) if calls else 0.0,
+        "outcomes": stats["outcomes"],
+        "booking_conflicts": stats["conflicts"],
+        "double_bookings": book.double_bookings(),
+    }
+
+
+def print_report(report: dict):
+    print("\n" + "="*70)
+    print("📞 CALL SIMULATION")
+    print("="*70)
+    for key, value in report.items():
+        print(f"  {key}: {value}")
+    print("="*70 + "\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulate concurrent scripted service calls")
+    parser.add_argument("--calls", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--bays", type=int, default=4, help="service bays of the simulated center")
+    parser.add_argument("--think-ms", type=float, default=0.0, help="mean customer think time per turn")
+    parser.add_argument("--use-precomputed", action="store_true",
+                        help="serve diagnoses from the precompute store when fresh")
+    args = parser.parse_args()
+
+    store = PrecomputeStore() if args.use_precomputed else None
+    print_report(asyncio.run(run_simulation(args.calls, args.concurrency, args.bays,
+                                            args.think_ms, store)))
+
+
+if __name__ == "__main__":
+    main()
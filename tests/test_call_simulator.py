@@ -0,0 +1,46 @@
+"""Tests for the headless call simulator"""
+
+import asyncio
+import sys
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from agents.customer_engagement_agent.script_templates import DEFAULT_SLOTS
+from scripts.simulate_calls import PERSONAS, SlotBook, run_simulation
+
+
+class TestCallSimulator:
+    def test_outcomes_follow_personas(self):
+        # Every persona meets each of the three vehicles twice
+        calls = len(PERSONAS) * 3 * 2
+        report = asyncio.run(run_simulation(calls=calls, concurrency=8, bays=100))
+        # The healthy VEH003 gets a one-turn all-clear call; the hesitant
+        # persona's mixed answer costs one clarifying turn
+        assert report["turns"] == calls // 3 + len(PERSONAS) * 4 * 3 + 4
+        assert report["outcomes"] == {"booked": 16, "follow_up": 4, "not_booked": 8, "all_clear": 14}
+        assert report["booking_conflicts"] == 0
+
+    def test_full_slots_are_conflicts_not_double_bookings(self):
+        report = asyncio.run(run_simulation(calls=120, concurrency=60, bays=2))
+        assert report["outcomes"]["booked"] == 4
+        assert report["booking_conflicts"] > 0
+        assert report["double_bookings"] == 0
+        assert set(report["turn_latency_ms"]) == {"p50", "p95", "p99", "mean"}
+
+    def test_slot_book_holds_then_confirms(self):
+        book = SlotBook(bays=1)
+        slot = DEFAULT_SLOTS[0]
+        first = book.hold(slot, 1)
+        assert first and book.hold(slot, 2) is None
+        assert book.confirm(first)
+        assert book.manager.get(first)["status"] == "confirmed"
+        assert book.double_bookings() == 0
+
+    def test_expired_hold_frees_the_bay(self):
+        book = SlotBook(bays=1, hold_ttl_seconds=0)
+        slot = DEFAULT_SLOTS[1]
+        stale = book.hold(slot, 1)
+        assert not book.confirm(stale)
+        assert book.hold(slot, 2) is not None
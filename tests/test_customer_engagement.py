@@ -0,0 +1,289 @@
+"""Tests for Customer Engagement Agent helpers"""
+
+import sys
+from concurrent.futures import Future
+from pathlib import Path
+
+import pytest
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from agents.customer_engagement_agent.intent_classifier import IntentClassifier, get_intent_classifier
+from agents.customer_engagement_agent.script_templates import (
+    INTRO_LINE, build_call_lines, classify_issues, format_script, greeting_line, parse_diagnosis, render_lines
+)
+from agents.customer_engagement_agent.stt_engine import (
+    MicrophoneBackend, NoSpeechError, ReplayBackend, STTBackend, TurnLatencyLog, UnrecognizedSpeechError
+)
+from agents.customer_engagement_agent.tts_engine import DeadAirMeter, SpeechWorker, TTSCache
+from agents.diagnosis_agent.rule_engine import DiagnosisRuleEngine, format_diagnosis
+from utils.mock_data import get_vehicle
+from voice_call_agent import VoiceCallAgent, voice_conversation
+
+BRAKE_DIAGNOSIS = """
+1. Primary Issue: Brake pads (brake wear 82)
+2. Failure Probability: 85%
+3. Time to Failure: 7-10 days
+4. Estimated Repair Cost: ₹3,000-6,000
+5. Safety Risk: HIGH
+6. Urgency: Immediate
+"""
+
+
+class TestScriptTemplates:
+    def test_parse_diagnosis_fields(self):
+        fields = parse_diagnosis("**Estimated Repair Cost:** ₹8,000\n**Time to Failure:** 2 weeks")
+        assert fields["cost"] == "₹8,000"
+        assert fields["time_to_failure"] == "2 weeks"
+        assert fields["primary_issue"] is None
+
+    def test_classify_issues(self):
+        assert classify_issues(BRAKE_DIAGNOSIS) == ("brakes",)
+        assert classify_issues("Worn brakes and low oil pressure") == ("brakes", "engine_oil")
+        assert classify_issues("Ignition coil failure") == ("general",)
+        assert classify_issues("EV battery pack overheating; battery replacement soon") == ("ev_battery",)
+
+    def test_healthy_report_gets_an_all_clear_call(self):
+        healthy = format_diagnosis(DiagnosisRuleEngine().evaluate(get_vehicle("VEH003")["sensor_data"], "ICE"))
+        assert classify_issues(healthy) == ("no_issue",)
+        assert classify_issues("No issues detected. All readings are within normal range.") == ("no_issue",)
+        assert classify_issues("Brake pads worn; no other issues found") == ("brakes",)
+        script = format_script(build_call_lines("Mr. Verma", healthy))
+        assert "nothing that needs attention" in script
+        for placeholder in ("needs attention within", "cost approximately", "No repair needed",
+                            "schedule a service appointment"):
+            assert placeholder not in script
+
+    def test_lines_use_diagnosis_facts(self):
+        lines = build_call_lines("Mr. Sharma", BRAKE_DIAGNOSIS, slots=["Monday at 9 AM"])
+        assert lines["greeting"].startswith("Hello Mr. Sharma!")
+        assert "brake pads" in lines["issues"]
+        assert "7-10 days" in lines["safety"]
+        assert "₹3,000-6,000" in lines["cost"]
+        assert "Monday at 9 AM" in lines["scheduling_question"]
+
+    def test_greeting_needs_no_diagnosis(self):
+        assert build_call_lines("Mr. Sharma", BRAKE_DIAGNOSIS)["greeting"] == greeting_line("Mr. Sharma")
+
+    def test_rendering_is_cached(self):
+        render_lines.cache_clear()
+        build_call_lines("Ms. Patel", BRAKE_DIAGNOSIS)
+        build_call_lines("Ms. Patel", BRAKE_DIAGNOSIS)
+        assert render_lines.cache_info().hits == 1
+
+    def test_script_format(self):
+        script = format_script(build_call_lines("Mr. Kumar", BRAKE_DIAGNOSIS), "Hope the family is well.")
+        speakers = [line.split(":")[0] for line in script.splitlines()]
+        assert speakers.count("AI") == 6
+        assert set(speakers) == {"AI", "CUSTOMER"}
+        assert "Hope the family is well." in script
+
+
+class FakeSynthesizer:
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, text, path):
+        self.calls.append(text)
+        path.write_bytes(text.encode("utf-8"))
+
+
+class TestTTSEngine:
+    def test_audio_is_rendered_once_per_text_and_voice(self, tmp_path):
+        synth = FakeSynthesizer()
+        cache = TTSCache(cache_dir=tmp_path, synthesize=synth)
+        first = cache.render("Hello Mr. Sharma!")
+        assert cache.render("Hello Mr. Sharma!") == first
+        assert synth.calls == ["Hello Mr. Sharma!"]
+
+        faster = TTSCache(rate=180, cache_dir=tmp_path, synthesize=synth)
+        assert faster.path_for("Hello Mr. Sharma!") != first
+
+    def test_worker_renders_ahead(self, tmp_path):
+        synth = FakeSynthesizer()
+        worker = SpeechWorker(TTSCache(cache_dir=tmp_path, synthesize=synth))
+        worker.prefetch(["line one", "line two", "line one"])
+        assert worker.get("line two").read_text() == "line two"
+        assert sorted(synth.calls) == ["line one", "line two"]
+        worker.shutdown()
+
+    def test_failed_synthesis_falls_back(self, tmp_path):
+        def broken(text, path):
+            raise RuntimeError("no audio driver")
+        worker = SpeechWorker(TTSCache(cache_dir=tmp_path, synthesize=broken))
+        assert worker.get("hello") is None
+        worker.shutdown()
+
+    def test_dead_air_meter(self):
+        meter = DeadAirMeter()
+        meter.speech_started()
+        meter.turn_ended()
+        meter.speech_started()
+        summary = meter.summary()
+        assert summary["turns"] == 1
+        assert summary["max_ms"] >= 0
+
+
+class TestIntentClassifier:
+    def test_intent_and_slot(self):
+        reply = get_intent_classifier().classify("Yes, tomorrow afternoon works for me")
+        assert reply["intent"] == "accept"
+        assert reply["slot"] == "afternoon"
+        assert reply["confidence"] == 1.0
+
+    def test_whole_words_only(self):
+        classifier = get_intent_classifier()
+        assert classifier.classify("I know, we met in 2024")["intent"] == "unknown"
+        assert classifier.classify("call me back in 2 days")["slot"] is None
+        assert classifier.classify("10 AM please")["slot"] == "morning"
+
+    def test_longest_phrase_wins(self):
+        classifier = get_intent_classifier()
+        assert classifier.classify("I'm not sure, quite busy")["intent"] == "defer"
+        assert classifier.classify("I don't think so")["intent"] == "decline"
+
+    @pytest.mark.parametrize("reply", ["No, not tomorrow", "No, I am busy tomorrow", "I am not sure about 10 am",
+                                       "ten more minutes please", "It is 2 pm now, call me later",
+                                       "I don't want to book an appointment"])
+    def test_refusals_and_hedges_are_not_accepted(self, reply):
+        assert get_intent_classifier().classify(reply)["intent"] != "accept"
+
+    def test_negation_stays_in_its_clause(self):
+        classifier = get_intent_classifier()
+        assert classifier.classify("No, not tomorrow")["intent"] == "decline"
+        reply = classifier.classify("Can't do 10 am, but 2 pm works")
+        assert (reply["intent"], reply["slot"]) == ("accept", "afternoon")
+
+    @pytest.mark.parametrize("reply", ["Tomorrow doesn't work for me", "tomorrow is not good",
+                                       "10 am won't work", "the afternoon is bad for me"])
+    def test_negation_before_or_after_the_phrase(self, reply):
+        classifier = get_intent_classifier()
+        assert classifier.classify(reply)["intent"] != "accept"
+        assert classifier.decide(reply)["intent"] != "accept"
+
+    def test_ruled_out_slot(self):
+        classifier = get_intent_classifier()
+        reply = classifier.classify("10 am won't work")
+        assert (reply["intent"], reply["slot"], reply["ruled_out"]) == ("defer", None, ["morning"])
+        reply = classifier.decide("yes but not in the morning")
+        assert (reply["intent"], reply["slot"]) == ("accept", "afternoon")
+
+    def test_mixed_replies_are_unclear(self):
+        classifier = get_intent_classifier()
+        assert classifier.decide("I am not sure about 10 am")["intent"] == "unclear"
+        assert classifier.decide("No, I am busy tomorrow")["slot"] is None
+        assert classifier.decide("Yes, 10 am please")["intent"] == "accept"
+        assert classifier.decide("hmm")["intent"] == "unknown"
+
+    def test_long_transcript(self):
+        transcript = "the car felt a bit odd on the way to the office " * 500 + "ok, 2 pm then"
+        reply = get_intent_classifier().classify(transcript)
+        assert reply["intent"] == "accept"
+        assert reply["slot"] == "afternoon"
+
+    def test_custom_table(self):
+        classifier = IntentClassifier(intents={"greet": ("hello", "good morning")}, slots={})
+        assert classifier.classify("Good morning!")["matches"] == ["greet"]
+
+
+class TestSTTEngine:
+    def test_replay_backend(self, tmp_path):
+        script = tmp_path / "turns.txt"
+        script.write_text("Yes, that's fine\n\nTomorrow at 2 pm\n", encoding="utf-8")
+        backend = ReplayBackend.from_file(script)
+        assert backend.recognize(backend.capture()) == "Yes, that's fine"
+        with pytest.raises(NoSpeechError):
+            backend.capture()
+        assert backend.recognize(backend.capture()) == "Tomorrow at 2 pm"
+        with pytest.raises(NoSpeechError):
+            backend.capture()
+
+    def test_unintelligible_turn(self):
+        backend = ReplayBackend([None])
+        with pytest.raises(UnrecognizedSpeechError):
+            backend.recognize(backend.capture())
+
+    def test_backends_implement_the_interface(self):
+        with pytest.raises(TypeError):
+            STTBackend()
+
+        class CaptureOnly(STTBackend):
+            def capture(self, timeout=10, phrase_time_limit=15):
+                return b""
+
+        with pytest.raises(TypeError):
+            CaptureOnly()
+
+    def test_missing_engine_package_is_reported(self, monkeypatch):
+        monkeypatch.setattr("importlib.util.find_spec", lambda name: None)
+        with pytest.raises(ImportError, match="pip install .*pocketsphinx"):
+            MicrophoneBackend("sphinx")
+        with pytest.raises(ValueError):
+            MicrophoneBackend("whisper")
+
+    def test_turn_latency_stages(self):
+        log = TurnLatencyLog()
+        log.record_listen(1.2, 0.3, "replay")
+        log.record_reply()
+        log.record_listen(0.8, 0.1, "replay")
+        summary = log.summary()
+        assert summary["capture_ms"] == {"p50": 1000.0, "max": 1200.0}
+        assert summary["recognition_ms"]["max"] == 300.0
+        assert len(log.turns) == 2
+        assert "decision_ms" in log.turns[0] and "decision_ms" not in log.turns[1]
+
+
+class TestVoiceCall:
+    def call(self, replies, diagnosis=BRAKE_DIAGNOSIS):
+        spoken = []
+        agent = VoiceCallAgent(stt_backend=ReplayBackend(replies), speaker=spoken.append, prerender=False)
+        voice_conversation(agent, "Mr. Sharma", diagnosis)
+        return spoken, agent
+
+    def test_accepted_slot_is_booked(self):
+        spoken, agent = self.call(["Yes, go ahead", "Tomorrow at 2 pm", "No, that's all"])
+        assert spoken[0].startswith("Hello Mr. Sharma!")
+        assert any("scheduled you for tomorrow at 2 PM" in line for line in spoken)
+        assert spoken[-1].startswith("Perfect!")
+        assert agent.dead_air.summary()["turns"] == len(spoken) - 1
+
+    def test_unclear_answer_gets_a_clarifying_question(self):
+        spoken, _ = self.call(["Hello?", "I am not sure about 10 am", "call me later", ""])
+        assert any(line.startswith("Sorry, I want to make sure") for line in spoken)
+        assert any("need time to think" in line for line in spoken)
+        assert not any("scheduled you" in line for line in spoken)
+
+    def test_intro_is_rendered_while_the_diagnosis_runs(self):
+        events = []
+        diagnosis = Future()
+        agent = VoiceCallAgent(stt_backend=ReplayBackend(["Hello", ""]), speaker=lambda text: None,
+                               prerender=False)
+        agent.prefetch = lambda *texts: events.append(("prefetch", texts))
+        listen = agent.listen
+
+        def answer(timeout=10):
+            if not diagnosis.done():
+                events.append(("listen", None))
+                diagnosis.set_result(BRAKE_DIAGNOSIS)
+            return listen(timeout)
+
+        agent.listen = answer
+        voice_conversation(agent, "Mr. Sharma", diagnosis)
+        assert events[:2] == [("prefetch", (INTRO_LINE,)), ("listen", None)]
+
+    def test_deferral_names_the_diagnosed_issue(self):
+        oil = "1. Primary Issue: Low engine oil pressure\n4. Estimated Repair Cost: ₹2,000-4,000"
+        spoken, _ = self.call(["Hello", "I'm busy, maybe later", "yes"], oil)
+        concern = next(line for line in spoken if "need time to think" in line)
+        assert "engine oil pressure" in concern and "brake" not in concern
+        assert "watch for the oil warning light" in spoken[-1]
+
+    def test_silence_does_not_book(self):
+        spoken, _ = self.call([""] * 4)
+        assert not any("scheduled you" in line or "book you" in line for line in spoken)
+
+    def test_healthy_vehicle_gets_an_all_clear_call(self):
+        healthy = format_diagnosis(DiagnosisRuleEngine().evaluate(get_vehicle("VEH003")["sensor_data"], "ICE"))
+        spoken, _ = self.call(["Hello"], healthy)
+        assert len(spoken) == 3 and "nothing that needs attention" in spoken[1]
@@ -0,0 +1,85 @@
+"""Tests for Data Analysis Agent feature engineering"""
+
+import sys
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+import numpy as np
+import pytest
+
+from agents.data_analysis_agent.feature_extractor import RollingFeatureExtractor
+
+
+def make_frame(n=400, n_features=3, missing_rate=0.15, seed=7):
+    rng = np.random.default_rng(seed)
+    values = rng.normal(50.0, 10.0, size=(n, n_features))
+    values[rng.random(values.shape) < missing_rate] = np.nan
+    values[40:60, 0] = np.nan  # gap longer than max_gap
+    values[:3, 1] = np.nan     # leading gap
+    values[-4:, 2] = np.nan    # trailing gap
+    timestamps = 1_700_000_000.0 + np.cumsum(rng.integers(30, 90, size=n)).astype(float)
+    return values, timestamps
+
+
+def run_stream(extractor, values, timestamps):
+    stream = extractor.stream()
+    rows = []
+    for sample, ts in zip(values, timestamps):
+        rows.extend(stream.update(list(sample), ts))
+    rows.extend(stream.flush())
+    return np.vstack(rows)
+
+
+class TestRollingFeatureExtractor:
+    @pytest.mark.parametrize("handle_missing", ["interpolate", "ffill"])
+    def test_batch_and_stream_identical(self, handle_missing):
+        extractor = RollingFeatureExtractor(
+            features=["a", "b", "c"], window=25, handle_missing=handle_missing
+        )
+        values, timestamps = make_frame()
+        batch = extractor.transform(values, timestamps)
+        streamed = run_stream(extractor, values, timestamps)
+        assert batch.shape == (len(values), len(extractor.feature_names))
+        assert np.array_equal(batch, streamed, equal_nan=True)
+
+    def test_matches_naive_rolling_statistics(self):
+        extractor = RollingFeatureExtractor(features=["a"], window=5, time_features=False)
+        values = np.arange(12, dtype=float).reshape(-1, 1) ** 1.5
+        features = extractor.transform(values)
+        names = extractor.feature_names
+        for t in range(len(values)):
+            window = values[max(0, t - 4):t + 1, 0]
+            assert features[t, names.index("a_mean")] == pytest.approx(window.mean())
+            assert features[t, names.index("a_std")] == pytest.approx(window.std())
+            assert features[t, names.index("a_min")] == window.min()
+            assert features[t, names.index("a_max")] == window.max()
+
+    def test_interpolates_short_gaps_in_time(self):
+        extractor = RollingFeatureExtractor(features=["a"], window=3, time_features=False)
+        values = np.array([[10.0], [np.nan], [np.nan], [40.0]])
+        features = extractor.transform(values)
+        assert features[:, 0].tolist() == [10.0, 20.0, 30.0, 40.0]
+
+    def test_stream_holds_sample_until_gap_resolved(self):
+        extractor = RollingFeatureExtractor(features=["a"], window=3, time_features=False)
+        stream = extractor.stream()
+        assert len(stream.update([1.0])) == 1
+        assert stream.update([None]) == []
+        rows = stream.update([3.0])
+        assert [row[0] for row in rows] == [2.0, 3.0]
+
+    def test_transform_records_uses_configured_features(self):
+        extractor = RollingFeatureExtractor(window=4)
+        records = [
+            {"timestamp": f"2025-11-20T10:{minute:02d}:00", "engine_temperature": 90 + minute,
+             "battery_voltage": 13.8, "oil_pressure": 45, "coolant_temperature": 85,
+             "rpm": 2000, "speed": 60, "vibration_level": 0.2}
+            for minute in range(6)
+        ]
+        features = extractor.transform_records(records)
+        assert features.shape == (6, len(extractor.feature_names))
+        assert "fuel_pressure_mean" in extractor.feature_names
+        assert np.isnan(features[:, extractor.feature_names.index("fuel_pressure")]).all()
+        assert features[-1, extractor.feature_names.index("seconds_since_last")] == 60.0
@@ -0,0 +1,174 @@
+"""Tests for Diagnosis Agent helpers"""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from agents.diagnosis_agent.dtc_analyzer import DTCIndex, extract_codes, get_dtc_index
+from agents.diagnosis_agent.rule_engine import DiagnosisRuleEngine, format_diagnosis
+from agents.diagnosis_agent.similarity_cache import DiagnosisSimilarityCache, get_similarity_cache, report_confidence
+from utils.mock_data import get_vehicle
+
+
+class TestDTCIndex:
+    def test_exact_lookup(self):
+        entry = get_dtc_index().lookup("p0217")
+        assert entry["description"] == "Engine coolant over temperature condition"
+        assert entry["category"] == "engine"
+
+    def test_family_query(self):
+        codes = [e["code"] for e in get_dtc_index().family("P02xx")]
+        assert codes == sorted(codes)
+        assert {"P0217", "P0218", "P0230"} <= set(codes)
+        assert all(code.startswith("P02") for code in codes)
+        assert all(e["code"].startswith("C") for e in get_dtc_index().family("C"))
+
+    def test_classification_falls_back_to_family(self):
+        index = get_dtc_index()
+        assert index.classify("P0562") == "electrical"
+        assert index.classify("P0218") == "transmission"
+        assert index.classify("C0999") == "brakes"
+        assert index.classify("P0799") == "transmission"
+        assert index.classify("P0499") == "emissions"
+
+    def test_reference_block_for_codes_in_text(self):
+        codes = extract_codes("Codes P0217, p0218 and P0217 again; VIN00012 ignored")
+        assert codes == ["P0217", "P0218"]
+        reference = get_dtc_index().format_reference(codes + ["P1234"])
+        assert reference.startswith("DTC Reference:")
+        assert "P1234: Unknown code (engine" in reference
+
+    def test_index_from_definitions(self):
+        index = DTCIndex({"U0100": {"description": "Lost communication with ECM/PCM"}})
+        assert len(index) == 1
+        assert "u0100" in index
+        assert index.lookup("U0100")["category"] == "electrical"
+
+
+class TestDiagnosisRuleEngine:
+    def setup_method(self):
+        self.engine = DiagnosisRuleEngine()
+
+    def test_worn_brakes(self):
+        sensors = {"engine_temp": 86, "oil_pressure": 48, "battery_voltage": 13.8, "brake_wear": 82}
+        result = self.engine.evaluate(sensors, "ICE")
+        assert result["signature"] == "worn_brakes"
+        assert result["urgency"] == "Immediate"
+        assert result["safety_risk"] == "HIGH"
+        assert result["cost_range"] == (3000, 6000)
+
+    def test_report_matches_llm_output_shape(self):
+        sensors = {"battery_soh": 90, "battery_temp": 63, "motor_temp": 70, "brake_wear": 30}
+        report = format_diagnosis(self.engine.evaluate(sensors, "EV", ["P0A7E"]))
+        lines = report.splitlines()
+        assert [line.split(":")[0] for line in lines] == [
+            "1. Primary Issue", "2. Failure Probability", "3. Time to Failure",
+            "4. Estimated Repair Cost", "5. Safety Risk", "6. Urgency"
+        ]
+        assert "₹25,000-50,000" in report
+
+    def test_multi_fault_goes_to_llm(self):
+        assert self.engine.evaluate(get_vehicle("VEH001")["sensor_data"], "ICE") is None
+        assert self.engine.evaluate(get_vehicle("VEH002")["sensor_data"], "EV") is None
+
+    def test_unexplained_readings_or_codes_go_to_llm(self):
+        sensors = {"engine_temp": 108, "oil_pressure": 48, "battery_voltage": 13.8, "brake_wear": 20}
+        assert self.engine.evaluate(sensors, "ICE") is None
+        sensors["engine_temp"] = 86
+        assert self.engine.evaluate(sensors, "ICE", ["P0217"]) is None
+        assert self.engine.evaluate({}, "ICE") is None
+
+    @pytest.mark.parametrize("sensor, value", [
+        ("battery_voltage", 15.9), ("oil_pressure", 95), ("coolant_level", 10), ("tire_pressure", 20),
+    ])
+    def test_out_of_range_readings_are_never_healthy(self, sensor, value):
+        sensors = dict(get_vehicle("VEH003")["sensor_data"], **{sensor: value})
+        assert self.engine.evaluate(sensors, "ICE") is None
+
+    def test_reading_on_the_wrong_side_of_a_signature_goes_to_llm(self):
+        cold = {"battery_soh": 95, "battery_temp": -5, "motor_temp": 40, "brake_wear": 20}
+        assert self.engine.evaluate(cold, "EV") is None
+        # Worn brakes explain brake wear, not a cold pack next to them
+        assert self.engine.evaluate(dict(cold, brake_wear=60), "EV") is None
+        assert self.engine.evaluate(dict(cold, battery_temp=30, brake_wear=60), "EV")["signature"] == "worn_brakes"
+
+    def test_unknown_sensors_go_to_llm(self):
+        sensors = dict(get_vehicle("VEH003")["sensor_data"], transmission_temp=140)
+        assert self.engine.evaluate(sensors, "ICE") is None
+
+    def test_healthy_vehicle(self):
+        result = self.engine.evaluate(get_vehicle("VEH003")["sensor_data"], "ICE")
+        assert result["signature"] == "healthy"
+        assert "No repair needed" in format_diagnosis(result)
+
+
+class TestDiagnosisSimilarityCache:
+    def setup_method(self):
+        self.cache = DiagnosisSimilarityCache(max_distance=0.1, min_confidence=0.75)
+        self.vehicle = {"type": "ICE", "model": "Maruti Swift"}
+        self.sensors = dict(get_vehicle("VEH001")["sensor_data"])
+
+    def test_reuses_diagnosis_for_similar_profile(self):
+        self.cache.add(self.vehicle, self.sensors, "Brakes and oil pump", confidence=0.9)
+        similar = dict(self.sensors, brake_wear=79, oil_pressure=34.5)
+        hit = self.cache.lookup(self.vehicle, similar)
+        assert hit["diagnosis"] == "Brakes and oil pump"
+        assert 0.75 <= hit["confidence"] <= 0.9
+
+    def test_misses_for_different_profile_model_or_codes(self):
+        self.cache.add(self.vehicle, self.sensors, "Brakes and oil pump", dtc_codes=["P0524"])
+        assert self.cache.lookup(self.vehicle, dict(self.sensors, brake_wear=30), ["P0524"]) is None
+        assert self.cache.lookup({"type": "ICE", "model": "Honda City"}, self.sensors, ["P0524"]) is None
+        assert self.cache.lookup(self.vehicle, self.sensors) is None
+        assert self.cache.lookup(self.vehicle, self.sensors, ["p0524"]) is not None
+
+    def test_secondary_sensors_must_match(self):
+        self.cache.add(self.vehicle, self.sensors, "Brakes and oil pump", confidence=0.95)
+        assert self.cache.lookup(self.vehicle, dict(self.sensors, tire_pressure=22)) is None
+        assert self.cache.lookup(self.vehicle, dict(self.sensors, coolant_level=30)) is None
+        without_tires = {k: v for k, v in self.sensors.items() if k != "tire_pressure"}
+        assert self.cache.lookup(self.vehicle, without_tires) is None
+        assert self.cache.lookup(self.vehicle, dict(self.sensors, tire_pressure=32.2)) is not None
+
+    def test_low_confidence_entries_are_not_reused(self):
+        self.cache.add(self.vehicle, self.sensors, "Unsure", confidence=0.5)
+        assert self.cache.lookup(self.vehicle, self.sensors) is None
+
+    def test_unknown_confidence_comes_from_distance(self):
+        self.cache.add(self.vehicle, self.sensors, "Brakes")
+        assert self.cache.lookup(self.vehicle, self.sensors)["confidence"] == 1.0
+        assert self.cache.lookup(self.vehicle, dict(self.sensors, brake_wear=77))["confidence"] == 0.918
+        # 0.75 needs the profile within a quarter of max_distance
+        assert self.cache.lookup(self.vehicle, dict(self.sensors, brake_wear=73)) is None
+
+    def test_report_confidence(self):
+        assert report_confidence("1. Primary Issue: Brakes\n7. Confidence: 85%") == 0.85
+        assert report_confidence("2. Failure Probability: 70%") is None
+
+    def test_reused_report_is_adapted_to_the_vehicle(self):
+        report = (f"1. Primary Issue: Brake pads on this 2020 model "
+                  f"(brake wear {self.sensors['brake_wear']}, oil pressure {self.sensors['oil_pressure']} PSI)\n"
+                  f"4. Estimated Repair Cost: ₹3,000-6,000")
+        self.cache.add(dict(self.vehicle, year=2020), self.sensors, report, confidence=0.95)
+        similar = dict(self.sensors, brake_wear=self.sensors["brake_wear"] - 1)
+        hit = self.cache.lookup(dict(self.vehicle, year=2021), similar)
+        assert f"brake wear {similar['brake_wear']}," in hit["diagnosis"]
+        assert "2021 model" in hit["diagnosis"]
+        assert f"oil pressure {self.sensors['oil_pressure']} PSI" in hit["diagnosis"]
+        assert "₹3,000-6,000" in hit["diagnosis"]
+
+    def test_shared_cache(self):
+        assert get_similarity_cache() is get_similarity_cache()
+
+    def test_stats(self):
+        self.cache.add(self.vehicle, self.sensors, "Brakes")
+        self.cache.lookup(self.vehicle, self.sensors)
+        self.cache.lookup(self.vehicle, dict(self.sensors, brake_wear=10))
+        stats = self.cache.get_stats()
+        assert stats["lookups"] == 2
+        assert stats["hit_rate"] == 0.5
+        assert stats["lookup_latency_us_p95"] > 0
@@ -0,0 +1,235 @@
+"""Tests for feedback surveys and aggregates"""
+
+import json
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+import pytest
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from agents.feedback_agent.nps_calculator import FeedbackAggregator, nps
+from agents.feedback_agent.sentiment_analyzer import SentimentAnalyzer, llm_sentiment
+from agents.feedback_agent.survey_manager import SURVEY_TEMPLATE, SurveyManager, template_version
+
+
+class FakeGenerator:
+    def __init__(self, fail=False, delay=0.0):
+        self.calls = []
+        self.fail = fail
+        self.delay = delay
+        self._lock = threading.Lock()
+
+    def __call__(self, template, language):
+        with self._lock:
+            self.calls.append(language)
+        time.sleep(self.delay)
+        if self.fail:
+            raise RuntimeError("LLM unavailable")
+        return f"[{language}] " + " / ".join(q["text"] for q in template["questions"])
+
+
+class TestSurveyManager:
+    def test_generated_once_per_language_and_persisted(self, tmp_path):
+        generate = FakeGenerator()
+        manager = SurveyManager(generate, store_dir=tmp_path)
+        first = manager.get("en")
+        assert manager.get("en") is first
+        assert manager.get("hi")["survey"].startswith("[hi]")
+        assert generate.calls == ["en", "hi"]
+        assert first["etag"].startswith(f'"{template_version(SURVEY_TEMPLATE)}-en-')
+        body = json.loads(first["body"])
+        assert body["success"] and [q["id"] for q in body["questions"]][-1] == "recommend"
+
+        # A restarted process serves the stored surveys without generating
+        restarted = FakeGenerator()
+        assert SurveyManager(restarted, store_dir=tmp_path).get("en")["survey"] == first["survey"]
+        assert restarted.calls == []
+
+    def test_template_change_regenerates(self, tmp_path):
+        SurveyManager(FakeGenerator(), store_dir=tmp_path).get("en")
+        template = dict(SURVEY_TEMPLATE, questions=SURVEY_TEMPLATE["questions"][:3])
+        generate = FakeGenerator()
+        changed = SurveyManager(generate, template=template, store_dir=tmp_path).get("en")
+        assert generate.calls == ["en"]
+        assert changed["version"] != template_version(SURVEY_TEMPLATE)
+        assert "recommend" not in changed["survey"]
+
+    def test_concurrent_first_requests_generate_once(self):
+        generate = FakeGenerator(delay=0.05)
+        manager = SurveyManager(generate)
+        with ThreadPoolExecutor(max_workers=16) as pool:
+            etags = set(pool.map(lambda _: manager.get("en")["etag"], range(32)))
+        assert len(etags) == 1
+        assert generate.calls == ["en"]
+
+    def test_llm_failure_serves_template_without_storing(self, tmp_path):
+        survey = SurveyManager(FakeGenerator(fail=True), store_dir=tmp_path).get("en")
+        assert survey["source"] == "template"
+        assert "1. How would you rate the quality of the service? (1-5)" in survey["survey"]
+        assert list(tmp_path.iterdir()) == []
+        # Once the LLM is back (after a restart) the new text gets a new ETag
+        generated = SurveyManager(FakeGenerator(), store_dir=tmp_path).get("en")
+        assert generated["source"] == "llm" and generated["etag"] != survey["etag"]
+
+    def test_only_configured_languages(self):
+        generate = FakeGenerator()
+        manager = SurveyManager(generate, languages=["en", "hi"])
+        assert manager.get("hi")["language"] == "hi"
+        with pytest.raises(ValueError):
+            manager.get("zz")
+        assert generate.calls == ["hi"]
+
+    @pytest.mark.parametrize("language", ["../etc/passwd", "", "english", "EN"])
+    def test_invalid_language(self, language):
+        with pytest.raises(ValueError):
+            SurveyManager(FakeGenerator()).get(language)
+
+
+T0 = datetime(2025, 11, 24, 10, 0)
+
+
+def response(recommend, quality=4, center="ABC-MAIN", technician="T1", at=T0, response_id=None):
+    return {"response_id": response_id, "center_id": center, "technician_id": technician,
+            "submitted_at": at, "answers": {"recommend": recommend, "service_quality": quality}}
+
+
+class TestFeedbackAggregator:
+    def test_nps_buckets(self):
+        assert nps(0, 0, 0) is None
+        assert nps(6, 2, 2) == 40.0
+        aggregator = FeedbackAggregator()
+        for score in (10, 9, 8, 7, 6, 0):
+            aggregator.add(response(score))
+        summary = aggregator.summary()
+        assert (summary["promoters"], summary["passives"], summary["detractors"]) == (2, 2, 2)
+        assert summary["nps"] == 0.0
+        assert summary["mean_ratings"] == {"service_quality": 4.0}
+
+    def test_per_center_and_technician(self):
+        aggregator = FeedbackAggregator()
+        aggregator.add_many([response(10, 5, "A", "T1"), response(9, 4, "A", "T2"),
+                             response(2, 1, "B", "T2")])
+        assert aggregator.summary("center", "A")["nps"] == 100.0
+        assert aggregator.summary("technician", "T2")["mean_ratings"]["service_quality"] == 2.5
+        assert aggregator.summary()["responses"] == 3
+        assert [row["key"] for row in aggregator.leaderboard("center")] == ["A", "B"]
+
+    def test_tumbling_windows_and_retention(self):
+        aggregator = FeedbackAggregator(window_hours=24, retention_windows=2)
+        aggregator.add(response(10, at=T0))
+        aggregator.add(response(0, at=T0 + timedelta(hours=5)))
+        aggregator.add(response(10, at=T0 + timedelta(days=1)))
+        series = aggregator.series()
+        assert [w["responses"] for w in series] == [2, 1]
+        assert aggregator.summary(since=T0 + timedelta(days=1))["nps"] == 100.0
+        assert aggregator.summary(until=T0.replace(hour=0) + timedelta(days=1))["nps"] == 0.0
+
+        aggregator.add(response(10, at=T0 + timedelta(days=2)))
+        assert len(aggregator.series()) == 2  # oldest window dropped
+        aggregator.add(response(0, at=T0))  # late: counts all-time only
+        assert len(aggregator.series()) == 2
+        assert aggregator.summary()["responses"] == 5
+
+    def test_duplicates_and_invalid_answers(self):
+        aggregator = FeedbackAggregator()
+        report = aggregator.add_many([
+            response(10, response_id="r1"),
+            response(10, response_id="r1"),
+            response(11, response_id="r2"),
+            response("yes", response_id="r3"),
+            response(8, quality=0, response_id="r4"),
+        ])
+        assert report["accepted"] == 1 and report["duplicates"] == 1
+        assert [r["index"] for r in report["rejected"]] == [2, 3, 4]
+        assert aggregator.summary()["responses"] == 1
+
+    def test_fractional_nps_is_rejected(self):
+        aggregator = FeedbackAggregator()
+        with pytest.raises(ValueError):
+            aggregator.add(response(7.9))
+        assert aggregator.add(response(9.0))
+
+    def test_aware_and_naive_timestamps_mix(self):
+        aggregator = FeedbackAggregator()
+        aggregator.add(response(10, at=T0, response_id="r1"))
+        ist = timezone(timedelta(hours=5, minutes=30))
+        aware = T0.replace(tzinfo=timezone.utc).astimezone(ist) + timedelta(days=1)
+        assert aggregator.add(response(0, at=aware, response_id="r2"))
+        assert aggregator.add(response(10, at=aware.isoformat(), response_id="r3"))
+        assert aggregator.summary(since=aware)["responses"] == 2
+        assert aggregator.summary(since=T0 + timedelta(days=1))["responses"] == 2
+        assert aggregator.series()[0]["window_start"].endswith("+00:00")
+
+    def test_failed_response_can_be_redelivered(self):
+        aggregator = FeedbackAggregator()
+        with pytest.raises(ValueError):
+            aggregator.add(response(10, at="not a date", response_id="r1"))
+        assert aggregator.add(response(10, response_id="r1"))
+        assert not aggregator.add(response(10, response_id="r1"))
+
+
+class FakeLLM:
+    def __init__(self, reply):
+        self.reply = reply
+        self.prompts = []
+
+    def invoke(self, prompt):
+        self.prompts.append(prompt)
+        return type("Message", (), {"content": self.reply})()
+
+
+class TestSentimentAnalyzer:
+    def test_lexicon_negation_and_intensifiers(self):
+        analyzer = SentimentAnalyzer()
+        results = analyzer.analyze(["Great service, very friendly staff", "The technician was not helpful",
+                                    "not bad at all", "They overcharged me and were rude"])
+        assert [r["label"] for r in results] == ["positive", "negative", "positive", "negative"]
+        scored = analyzer.score(["friendly", "very friendly", "not friendly"])
+        assert scored["polarity"][1] > scored["polarity"][0] > 0 > scored["polarity"][2]
+
+    def test_negation_does_not_cross_comments(self):
+        scored = SentimentAnalyzer().score(["it was not", "good"])
+        assert scored["polarity"][1] > 0
+
+    def test_negation_stops_at_the_clause(self):
+        results = SentimentAnalyzer().analyze(["it was not good, terrible", "not great but the staff were friendly",
+                                               "I can't recommend them enough", "didn't like it",
+                                               "no complaints at all"])
+        assert [r["label"] for r in results] == ["negative", "neutral", "positive", "negative", "positive"]
+        assert all(r["confidence"] > 0 for r in results)
+
+    def test_local_labels_leave_uncertain_comments_unlabelled(self):
+        labels = SentimentAnalyzer().local_labels(["Excellent, quick and professional",
+                                                   "Good work but waited hours and the car was dirty", ""])
+        assert labels == ["positive", None, None]
+        assert SentimentAnalyzer().local_labels([]) == []
+
+    def test_only_low_confidence_comments_go_to_the_llm(self):
+        llm = FakeLLM("1: negative\n2: positive")
+        comments = ["Excellent, quick and professional", "The coffee machine was new",
+                    "Good work but waited hours and the car was dirty", ""]
+        results = SentimentAnalyzer().analyze(comments, llm_classify=lambda cs: llm_sentiment(llm, cs))
+        assert len(llm.prompts) == 1
+        assert "Excellent" not in llm.prompts[0] and "coffee" in llm.prompts[0]
+        assert results[0]["source"] == "lexicon"
+        assert {r["source"] for r in results[1:3]} == {"llm"}
+        assert results[3] == {"label": "neutral", "polarity": 0.0, "confidence": 0.0, "source": "lexicon"}
+
+    def test_llm_failure_keeps_local_labels(self):
+        def broken(comments):
+            raise RuntimeError("timeout")
+        results = SentimentAnalyzer().analyze(["meh"], llm_classify=broken)
+        assert results[0]["source"] == "lexicon"
+
+    def test_sentiment_counts_in_aggregates(self):
+        aggregator = FeedbackAggregator()
+        aggregator.add_many([dict(response(10), sentiment="positive"), dict(response(3), sentiment="negative"),
+                             dict(response(9), sentiment="positive"), response(8)])
+        assert aggregator.summary()["sentiment"] == {"positive": 2, "negative": 1}
+        assert aggregator.summary("technician", "T1")["sentiment"]["positive"] == 2
@@ -0,0 +1,302 @@
+"""Tests for fleet failure aggregation, root-cause candidates and failure sketches"""
+
+import math
+import random
+import sys
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+import pytest
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from agents.manufacturing_insights_agent.failure_aggregator import (
+    NO_DTC, FailureAggregator, FailureReports, component_name, format_insights
+)
+from agents.manufacturing_insights_agent.pattern_detector import (
+    CountMinSketch, HyperLogLog, PatternDetector, SpaceSaving
+)
+
+
+def failure(model="Honda City", year=2021, component="brakes", dtc_codes=("C0035",), **extra):
+    return dict(model=model, year=year, component=component, dtc_codes=list(dtc_codes), **extra)
+
+
+class TestGroupBy:
+    def test_component_names_are_normalized(self):
+        assert component_name("Brake wear") == "brakes"
+        assert component_name("Oil pressure low") == "engine_oil"
+        assert component_name("  Door  Seal leak ") == "door seal leak"
+        assert component_name(None) == "unknown"
+
+    def test_counts_and_shares(self):
+        aggregator = FailureAggregator(threshold=1000)
+        aggregator.add(failure(count=3))
+        aggregator.add(failure(model="Maruti Swift", year=2020))
+        rows = aggregator.group_by(["model"])
+        assert rows == [
+            {"model": "Honda City", "failures": 3, "share": 0.75},
+            {"model": "Maruti Swift", "failures": 1, "share": 0.25},
+        ]
+        assert aggregator.count() == 4
+        assert aggregator.count(model="Maruti Swift", year=2020) == 1
+        assert aggregator.group_by(["year"], {"model": "Tata Nexon EV"}) == []
+
+    def test_multiple_dtcs_count_once_per_failure(self):
+        aggregator = FailureAggregator(threshold=1000)
+        aggregator.add(failure(dtc_codes=["C0035", "p0524"]))
+        aggregator.add(failure(dtc_codes=[]))
+        assert aggregator.count() == 2
+        dtcs = {row["dtc"]: row["failures"] for row in aggregator.group_by(["dtc"])}
+        assert dtcs == {"C0035": 1, "P0524": 1, NO_DTC: 1}
+        assert aggregator.count(dtc="P0524") == 1
+
+    def test_unknown_dimension(self):
+        with pytest.raises(ValueError):
+            FailureAggregator().group_by(["color"])
+
+    def test_matches_a_full_rescan(self):
+        random.seed(3)
+        records = [failure(model=random.choice("ABCD"), year=random.randint(2018, 2022),
+                           component=random.choice(["brakes", "cooling", "engine_oil"]),
+                           dtc_codes=random.choice([[], ["P0217"], ["P0524", "C0035"]]))
+                   for _ in range(2000)]
+        aggregator = FailureAggregator(threshold=10 ** 6)
+        assert aggregator.add_many(records)["accepted"] == 2000
+
+        expected = Counter((r["model"], r["year"]) for r in records if r["component"] == "cooling")
+        rows = aggregator.group_by(["model", "year"], {"component": "cooling"})
+        assert {(r["model"], r["year"]): r["failures"] for r in rows} == expected
+        assert [r["failures"] for r in rows] == sorted(expected.values(), reverse=True)
+        assert len(aggregator.group_by(["model", "year"], {"component": "cooling"}, top=3)) == 3
+
+    def test_diagnosis_reports_are_parsed(self):
+        aggregator = FailureAggregator(threshold=1000)
+        aggregator.add({"model": "Maruti Swift", "year": "2020",
+                        "diagnosis": "Primary Issue: Brake pads worn to 78%\nCode P0524 also active"})
+        assert aggregator.group_by(["year", "component", "dtc"]) == [
+            {"year": 2020, "component": "brakes", "dtc": "P0524", "failures": 1, "share": 1.0}
+        ]
+
+    def test_invalid_records_are_rejected(self):
+        aggregator = FailureAggregator()
+        report = aggregator.add_many([failure(), failure(count=0), failure(frequency="many")])
+        assert report["accepted"] == 1
+        assert [r["index"] for r in report["rejected"]] == [1, 2]
+        assert aggregator.count() == 1
+
+    def test_reports_with_nothing_to_repair_are_skipped(self):
+        aggregator = FailureAggregator(threshold=1)
+        healthy = {"model": "Honda City", "year": 2021,
+                   "diagnosis": "Primary Issue: No component at risk (all readings within normal range)"}
+        assert aggregator.add(healthy) == []
+        report = aggregator.add_many([healthy, failure()])
+        assert (report["accepted"], report["skipped"], report["rejected"]) == (1, 1, [])
+        assert aggregator.group_by(["component"]) == [{"component": "brakes", "failures": 1, "share": 1.0}]
+
+    def test_first_report_per_vehicle_and_component(self):
+        reports = FailureReports(max_reports=2)
+        assert reports.first(failure(vehicle_id="VEH001"))
+        assert not reports.first(failure(vehicle_id="VEH001", dtc_codes=["P0524"]))
+        assert reports.first(failure(vehicle_id="VEH001", component="Oil pressure low"))
+        assert reports.first(failure(vehicle_id="VEH002"))
+        # Without a vehicle every record is new; healthy reports never are
+        assert reports.first(failure()) and reports.first(failure())
+        assert not reports.first(failure(vehicle_id="VEH009", component="No issues found"))
+        # The oldest pair was forgotten
+        assert reports.first(failure(vehicle_id="VEH001"))
+
+
+class TestInsights:
+    def test_analysis_at_threshold_and_each_doubling(self):
+        aggregator = FailureAggregator(threshold=10)
+        triggered = [len(aggregator.add(failure())) for _ in range(40)]
+        assert [i + 1 for i, n in enumerate(triggered) if n] == [10, 20, 40]
+        assert aggregator.add(failure(model="Maruti Swift", count=12))[0]["failures"] == 12
+        assert aggregator.recent_insights(1)[0]["cohort"]["model"] == "Maruti Swift"
+
+    def test_dominant_dtc_gives_confident_cause_and_capa(self):
+        aggregator = FailureAggregator(threshold=10, confidence_threshold=0.8)
+        aggregator.add(failure(dtc_codes=["C0035"], count=8))
+        [insight] = aggregator.add(failure(dtc_codes=["P0524"], count=2))
+        assert insight["cohort"] == {"model": "Honda City", "year": 2021, "component": "brakes"}
+        [cause] = insight["root_causes"]
+        assert (cause["type"], cause["dtc"], cause["confidence"], cause["confident"]) == ("dtc", "C0035", 0.8, True)
+        assert [a["type"] for a in insight["capa"]] == ["corrective", "preventive"]
+        assert "C0035" in insight["capa"][0]["action"]
+
+    def test_spread_out_dtcs_are_not_confident(self):
+        aggregator = FailureAggregator(threshold=10)
+        for code in ["P0217", "P0524", "C0035", "P0A7E", "P0562"]:
+            aggregator.add(failure(dtc_codes=[code], count=2))
+        insight = aggregator.recent_insights()[0]
+        assert insight["root_causes"][0]["confidence"] == 0.2
+        assert not insight["confident"] and insight["capa"] == []
+
+    def test_model_year_concentration(self):
+        aggregator = FailureAggregator(threshold=10, confidence_threshold=0.8)
+        aggregator.add(failure(year=2020, dtc_codes=[], count=1))
+        [insight] = aggregator.add(failure(year=2021, dtc_codes=[], count=10))
+        [cause] = insight["root_causes"]
+        assert cause["type"] == "model_year" and cause["year"] == 2021
+        assert cause["confidence"] == round(10 / 11, 3)
+        assert "production" in insight["capa"][1]["action"]
+
+    def test_capa_generation_can_be_disabled(self):
+        aggregator = FailureAggregator(threshold=10, capa_enabled=False)
+        [insight] = aggregator.add(failure(count=10))
+        assert insight["confident"] and insight["capa"] == []
+
+    def test_report(self):
+        aggregator = FailureAggregator(threshold=10)
+        report = format_insights(aggregator.add(failure(count=15)))
+        assert report.startswith("2021 Honda City - brakes: 15 failures")
+        assert "Corrective action" in report
+        assert format_insights([]) == "No cohort has reached the analysis threshold."
+
+
+def zipf_stream(size, items, seed):
+    rng = random.Random(seed)
+    weights = [1 / (i + 1) for i in range(items)]
+    return rng.choices([f"item_{i}" for i in range(items)], weights, k=size)
+
+
+class TestSketches:
+    def test_count_min_bounds(self):
+        stream = zipf_stream(20000, 1000, seed=1)
+        sketch = CountMinSketch.from_error(0.01, 0.01)
+        for item in stream:
+            sketch.add(item)
+        exact = Counter(stream)
+        errors = [sketch.estimate(item) - count for item, count in exact.items()]
+        assert min(errors) >= 0
+        assert sum(e > sketch.max_error for e in errors) <= 0.01 * len(errors)
+        assert sketch.estimate("never seen") <= sketch.max_error
+
+    def test_count_min_merge_equals_single_sketch(self):
+        stream = zipf_stream(5000, 300, seed=2)
+        whole, left, right = CountMinSketch(), CountMinSketch(), CountMinSketch()
+        for i, item in enumerate(stream):
+            whole.add(item)
+            (left if i % 2 else right).add(item)
+        left.merge(right)
+        assert (left.table == whole.table).all() and left.total == whole.total
+        with pytest.raises(ValueError):
+            left.merge(CountMinSketch(width=100))
+
+    def test_hyperloglog_accuracy_and_merge(self):
+        left, right = HyperLogLog(12), HyperLogLog(12)
+        assert left.count() == 0
+        for i in range(30000):
+            left.add(f"VEH{i}")
+        for i in range(20000, 60000):
+            right.add(f"VEH{i}")
+        for _ in range(3):
+            right.add("VEH20000")
+        assert abs(left.count() - 30000) <= 4 * left.relative_error * 30000
+        left.merge(right)
+        assert abs(left.count() - 60000) <= 4 * left.relative_error * 60000
+        small = HyperLogLog(12)
+        for i in range(100):
+            small.add(i)
+        assert abs(small.count() - 100) <= 3
+
+    def test_space_saving_finds_heavy_hitters(self):
+        stream = zipf_stream(20000, 500, seed=3)
+        sketch = SpaceSaving(k=20)
+        for item in stream:
+            sketch.add(item)
+        exact = Counter(stream)
+        top = {e["item"]: e for e in sketch.top()}
+        for item, count in exact.items():
+            if count > len(stream) / sketch.k:
+                assert item in top
+        for item, entry in top.items():
+            assert entry["count"] - entry["error"] <= exact[item] <= entry["count"]
+            assert entry["count"] - exact[item] <= sketch.max_error
+        assert sketch.top(1)[0]["item"] == "item_0"
+
+    def test_space_saving_merge_keeps_bounds(self):
+        stream = zipf_stream(20000, 500, seed=4)
+        left, right = SpaceSaving(k=20), SpaceSaving(k=20)
+        for i, item in enumerate(stream):
+            (left if i < 12000 else right).add(item)
+        left.merge(right)
+        exact = Counter(stream)
+        assert left.total == len(stream) and len(left.counters) == 20
+        for entry in left.top():
+            assert entry["count"] - entry["error"] <= exact[entry["item"]] <= entry["count"]
+        assert [e["item"] for e in left.top(3)] == ["item_0", "item_1", "item_2"]
+
+
+class TestPatternDetector:
+    def record(self, when, vehicle="VEH001", **extra):
+        return dict(failure(vehicle_id=vehicle, diagnosed_at=when), **extra)
+
+    def test_cohort_and_fleet_queries(self):
+        detector = PatternDetector()
+        now = datetime(2026, 3, 1, 12)
+        for i in range(30):
+            detector.add(self.record(now, vehicle=f"VEH{i % 10}", dtc_codes=["C0035"]))
+        detector.add(self.record(now, model="Maruti Swift", year=2020, component="Oil pressure low",
+                                 dtc_codes=[]))
+        summary = detector.summary("Honda City", 2021, dtcs=["c0035", "P0217"])
+        assert summary["failures"] == 30 and summary["distinct_vehicles"] == 10
+        assert summary["top_components"] == [{"component": "brakes", "failures": 30, "error": 0}]
+        assert summary["dtc_counts"]["C0035"] >= 30
+        assert summary["dtc_counts"]["P0217"] <= summary["error_bounds"]["dtc_count_overestimate"]
+        fleet = detector.summary(top=1)
+        assert fleet["failures"] == 31 and fleet["top_components"][0]["component"] == "brakes"
+        assert detector.summary("Maruti Swift")["top_components"][0]["component"] == "engine_oil"
+        assert detector.summary("Tata Nexon EV")["failures"] == 0
+        assert detector.summary(year=2020)["failures"] == 1
+        assert detector.summary(year=2021)["failures"] == 30
+        detector.add(self.record(now, component="No component at risk"))
+        assert detector.summary()["failures"] == 31
+
+    def test_windows_and_retention(self):
+        detector = PatternDetector(window_hours=24, retention_windows=3)
+        start = datetime(2026, 3, 1)
+        for day in range(5):
+            for _ in range(day + 1):
+                detector.add(self.record(start + timedelta(days=day, hours=1)))
+        assert detector.summary()["failures"] == 15
+        assert detector.summary(since=start + timedelta(days=3))["failures"] == 9
+        # Only the last three days are kept per window
+        assert detector.summary(since=start)["failures"] == 12
+        assert detector.summary(until=start + timedelta(days=3))["failures"] == 3
+
+    def test_aware_times_use_the_local_windows(self):
+        detector = PatternDetector(window_hours=24, retention_windows=3)
+        start = datetime(2026, 3, 1)
+        detector.add(self.record(start + timedelta(hours=12)))
+        detector.add(self.record((start + timedelta(days=1, hours=12)).astimezone().astimezone(timezone.utc)))
+        detector.add(self.record((start + timedelta(days=2, hours=12)).astimezone().isoformat()))
+        since = (start + timedelta(days=1)).astimezone().astimezone(timezone.utc)
+        assert detector.summary(since=since)["failures"] == 2
+        assert detector.summary(until=since)["failures"] == 1
+
+    def test_shards_merge(self):
+        when = datetime(2026, 3, 1)
+        shards = [PatternDetector(), PatternDetector()]
+        for i in range(200):
+            shards[i % 2].add(self.record(when, vehicle=f"VEH{i}"))
+        shards[0].merge(shards[1])
+        summary = shards[0].summary("Honda City", 2021)
+        assert summary["failures"] == 200
+        assert abs(summary["distinct_vehicles"] - 200) <= 4
+
+    def test_memory_is_bounded_by_cohorts_and_windows(self):
+        detector = PatternDetector(retention_windows=2)
+        when = datetime(2026, 3, 1)
+        detector.add(self.record(when))
+        size = detector.nbytes
+        for i in range(2000):
+            detector.add(self.record(when, vehicle=f"VEH{i}", dtc_codes=[f"P{i:04d}"],
+                                     component=f"part {i}"))
+        assert detector.nbytes == size
+        sketch = detector.sketch()
+        assert len(sketch.components.counters) == sketch.components.k
+        assert math.isclose(sketch.vehicles.relative_error, 1.04 / 64)
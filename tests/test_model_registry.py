@@ -0,0 +1,77 @@
+"""Tests for the memory-mapped model registry"""
+
+import sys
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+import numpy as np
+import pytest
+
+from utils.model_registry import CURRENT_FILE, ModelRegistry, version_key
+
+
+@pytest.fixture
+def registry(tmp_path):
+    return ModelRegistry(root=tmp_path, max_models=2, refresh_interval_seconds=0)
+
+
+class TestModelRegistry:
+    def test_weights_are_memory_mapped(self, registry):
+        registry.save("failure_prediction", "v1", {"kernel": np.arange(1000.0)},
+                      metadata={"model_type": "lstm"})
+        model = registry.get("failure_prediction")
+        assert isinstance(model.weights["kernel"], np.memmap)
+        assert model.weights["kernel"][10] == 10.0
+        assert model.metadata["model_type"] == "lstm"
+        assert registry.get("failure_prediction") is model
+
+    def test_hot_swap_without_restart(self, registry, tmp_path):
+        registry.save("anomaly_detection", "v1", {"w": np.zeros(4)})
+        assert registry.get("anomaly_detection").version == "v1"
+
+        # Another process publishes and activates a new version
+        other = ModelRegistry(root=tmp_path)
+        other.save("anomaly_detection", "v2", {"w": np.ones(4)})
+
+        model = registry.get("anomaly_detection")
+        assert model.version == "v2"
+        assert model.weights["w"].sum() == 4.0
+        assert [s["version"] for s in registry.get_stats()] == ["v2"]
+
+    def test_lru_eviction(self, registry):
+        for name in ("a", "b", "c"):
+            registry.save(name, "v1", {"w": np.zeros(2)})
+            registry.get(name)
+        assert sorted(s["name"] for s in registry.get_stats()) == ["b", "c"]
+
+    def test_stats_report_load_time_and_memory(self, registry):
+        registry.save("dtc_classifier", "v1", {"w": np.ones(4096)})
+        model = registry.get("dtc_classifier")
+        float(model.weights["w"].sum())  # touch the pages
+        stats = registry.get_stats()[0]
+        assert stats["load_time_ms"] >= 0
+        assert stats["mapped_bytes"] == 4096 * 8
+        assert stats["resident_bytes"] > 0
+
+    def test_resident_bytes_only_count_own_version(self, registry):
+        registry.save("dtc_classifier", "v1", {"w": np.ones(16)})
+        registry.save("dtc_classifier", "v10", {"w": np.ones(1 << 18)})
+        small = registry.get("dtc_classifier", "v1")
+        large = registry.get("dtc_classifier", "v10")
+        float(small.weights["w"].sum() + large.weights["w"].sum())
+        assert large.resident_bytes() >= 1 << 20
+        assert 0 < small.resident_bytes() < 1 << 20
+
+    def test_versions_sort_numerically(self, registry):
+        for version in ("v2", "v10", "v1"):
+            registry.save("failure_prediction", version, {"w": np.zeros(1)}, activate=False)
+        assert registry.list_versions("failure_prediction") == ["v1", "v2", "v10"]
+        assert not (registry.model_dir("failure_prediction") / CURRENT_FILE).exists()
+        assert registry.active_version("failure_prediction") == "v10"
+        assert sorted(["1.10", "1.9", "1.9.1"], key=version_key) == ["1.9", "1.9.1", "1.10"]
+
+    def test_missing_version(self, registry):
+        with pytest.raises(FileNotFoundError):
+            registry.get("failure_prediction")
@@ -0,0 +1,56 @@
+"""Tests for overnight precomputation"""
+
+import sys
+from datetime import datetime
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from scripts.precompute_fleet import next_window, run_precompute
+from utils.mock_data import get_all_vehicles
+from utils.precompute_store import PrecomputeStore
+
+
+def fake_generate(vehicle):
+    return {"analysis": f"analysis {vehicle['vehicle_id']}",
+            "diagnosis": "diagnosis", "call_script": "script"}
+
+
+class TestPrecompute:
+    def test_only_changed_vehicles_are_regenerated(self, tmp_path):
+        store = PrecomputeStore(tmp_path / "results.json")
+        vehicles = {vid: dict(v) for vid, v in get_all_vehicles().items()}
+
+        first = run_precompute(store, vehicles, generate=fake_generate)
+        assert first["generated"] == len(vehicles)
+        assert first["reused"] == 0
+
+        vehicles["VEH001"]["sensor_data"] = dict(vehicles["VEH001"]["sensor_data"], brake_wear=85)
+        second = run_precompute(store, vehicles, generate=fake_generate)
+        assert second["generated"] == 1
+        assert second["reused"] == len(vehicles) - 1
+        assert "vehicles_per_second" in second
+
+    def test_stale_entries_are_not_served(self, tmp_path):
+        store = PrecomputeStore(tmp_path / "results.json")
+        vehicle = dict(get_all_vehicles()["VEH003"])
+        store.put("VEH003", vehicle, fake_generate(vehicle))
+
+        # A second process sees the file written by the job
+        reader = PrecomputeStore(tmp_path / "results.json")
+        assert reader.get("VEH003", vehicle)["analysis"] == "analysis VEH003"
+        assert reader.get("VEH003", dict(vehicle, dtc_codes=["P0562"])) is None
+
+    def test_deadline_defers_remaining_work(self, tmp_path):
+        store = PrecomputeStore(tmp_path / "results.json")
+        report = run_precompute(store, get_all_vehicles(), deadline=datetime(2000, 1, 1),
+                                generate=fake_generate)
+        assert report["deferred"] == len(get_all_vehicles())
+
+    def test_off_peak_window_wraps_midnight(self):
+        start, end = next_window(datetime(2025, 11, 21, 1, 0), "23:00", "02:00")
+        assert start == datetime(2025, 11, 20, 23, 0)
+        assert end == datetime(2025, 11, 21, 2, 0)
+        start, _ = next_window(datetime(2025, 11, 21, 6, 0), "01:00", "05:00")
+        assert start == datetime(2025, 11, 22, 1, 0)
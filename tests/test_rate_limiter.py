@@ -0,0 +1,121 @@
+"""Tests for API rate limiting"""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from utils.rate_limiter import MemoryBackend, RateLimitBackend, RateLimiter, build_rate_limiter, create_rate_limit_backend, parse_rate
+
+T0 = 1_700_000_000.0
+
+
+class TestParseRate:
+    def test_units(self):
+        rate = parse_rate("10/minute")
+        assert (rate.count, rate.period) == (10, 60)
+        assert parse_rate("5 / Seconds").per_second == 5
+        assert parse_rate("1000/day").period == 86400
+
+    @pytest.mark.parametrize("rate", ["10", "ten/minute", "10/fortnight", "0/minute", None])
+    def test_invalid(self, rate):
+        with pytest.raises(ValueError):
+            parse_rate(rate)
+
+
+class TestMemoryBackend:
+    def test_burst_then_refill(self):
+        backend = MemoryBackend()
+        rate = parse_rate("10/minute")
+        assert all(backend.acquire("k", rate, now=T0) == 0 for _ in range(10))
+        assert backend.acquire("k", rate, now=T0) == pytest.approx(6.0)
+        assert backend.acquire("k", rate, now=T0 + 3) == pytest.approx(3.0)
+        assert backend.acquire("k", rate, now=T0 + 6) == 0
+        # A long pause refills to the burst size, not beyond
+        assert sum(backend.acquire("k", rate, now=T0 + 3600) == 0 for _ in range(15)) == 10
+
+    def test_returned_tokens_are_capped(self):
+        backend = MemoryBackend()
+        rate = parse_rate("2/second")
+        backend.acquire("k", rate, now=T0)
+        backend.acquire("k", rate, -5.0, now=T0)
+        assert [backend.acquire("k", rate, now=T0) for _ in range(3)] == [0, 0, 0.5]
+
+    def test_pruning_keeps_active_buckets(self):
+        backend = MemoryBackend(max_keys=10)
+        rate = parse_rate("1/hour")
+        backend.acquire("busy", rate, now=T0)
+        fast = parse_rate("100/second")
+        for i in range(20):
+            backend.acquire(f"idle{i}", fast, now=T0 + i)
+        assert len(backend) <= 10
+        assert backend.acquire("busy", rate, now=T0 + 30) > 0
+
+    def test_backend_interface_is_abstract(self):
+        with pytest.raises(TypeError):
+            RateLimitBackend()
+
+    def test_unknown_backend(self):
+        with pytest.raises(ValueError):
+            create_rate_limit_backend({"backend": "memcached"})
+
+
+class TestRateLimiter:
+    def limiter(self):
+        return RateLimiter(
+            per_client="5/minute",
+            endpoints={"/api/analyze": {"per_client": "2/minute", "total": "3/minute"},
+                       "/api/complete-workflow/": {"per_client": "1/minute"}},
+            throttle="1/minute",
+        )
+
+    def test_endpoint_matching(self):
+        limiter = self.limiter()
+        assert limiter.endpoint("/api/analyze") == "/api/analyze"
+        assert limiter.endpoint("/api/analyze/extra") is None
+        assert limiter.endpoint("/api/complete-workflow/VEH001") == "/api/complete-workflow/"
+        assert limiter.endpoint("/api/vehicles") is None
+
+    def test_per_client_endpoint_limit(self):
+        limiter = self.limiter()
+        assert [limiter.check("a", "/api/analyze", now=T0) for _ in range(2)] == [0, 0]
+        assert limiter.check("a", "/api/analyze", now=T0) == pytest.approx(30)
+        # Other endpoints still have room in the client's overall bucket
+        assert limiter.check("a", "/api/vehicles", now=T0) == 0
+
+    def test_one_client_cannot_starve_others(self):
+        limiter = self.limiter()
+        for _ in range(10):
+            limiter.check("greedy", "/api/analyze", now=T0)
+        # greedy holds 2 of the endpoint's 3 tokens; its refused calls took none
+        assert limiter.check("b", "/api/analyze", now=T0) == 0
+        assert limiter.check("c", "/api/analyze", now=T0) == pytest.approx(20)
+
+    def test_refused_requests_take_no_tokens(self):
+        limiter = self.limiter()
+        for _ in range(5):
+            assert limiter.check("a", "/api/vehicles", now=T0) == 0
+        assert limiter.check("a", "/api/analyze", now=T0) > 0
+        assert limiter.check("b", "/api/analyze", now=T0 + 1) == 0
+        assert limiter.check("b", "/api/analyze", now=T0 + 1) == 0
+        assert limiter.check("c", "/api/analyze", now=T0 + 1) == 0
+
+    def test_throttled_clients(self):
+        limiter = self.limiter()
+        assert limiter.check("bot", "/api/vehicles", throttled=True, now=T0) == 0
+        assert limiter.check("bot", "/api/vehicles", throttled=True, now=T0 + 1) == pytest.approx(59)
+        assert limiter.check("bot", "/api/vehicles", now=T0 + 1) == 0
+
+    def test_retry_after_header(self):
+        assert RateLimiter.retry_after(0.2) == "1"
+        assert RateLimiter.retry_after(29.01) == "30"
+
+    def test_configured_limiter(self):
+        limiter = build_rate_limiter()
+        assert isinstance(limiter.backend, MemoryBackend)
+        assert limiter.throttle.count == 10 and limiter.throttle.period == 60
+        assert limiter.endpoint("/api/complete-workflow/VEH003") == "/api/complete-workflow/"
+        assert {"/api/analyze", "/api/diagnose", "/api/call-script"} <= set(limiter.endpoints)
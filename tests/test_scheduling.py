@@ -0,0 +1,286 @@
+"""Tests for the scheduling calendar, reservations, center locator and batch optimizer"""
+
+import random
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, time, timedelta, timezone
+from pathlib import Path
+
+import pytest
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from agents.scheduling_agent.availability_checker import (
+    ServiceCalendar, SlotUnavailableError, UnknownServiceCenterError, requested_slot
+)
+from agents.scheduling_agent.booking_manager import BookingManager, HoldExpiredError
+from agents.scheduling_agent.optimizer import BatchScheduler, free_capacity
+from agents.scheduling_agent.service_locator import (
+    ServiceCenterIndex, distance_km, get_service_center_index
+)
+
+DAY = date(2025, 11, 24)
+
+
+def at(hour, day=0):
+    return datetime.combine(DAY + timedelta(days=day), time(hour))
+
+
+@pytest.fixture
+def calendar():
+    return ServiceCalendar({"SC1": 2, "SC2": 1}, opening_hour=9, closing_hour=18,
+                           slot_minutes=60, horizon_days=7, start_date=DAY)
+
+
+class TestServiceCalendar:
+    def test_next_free_honours_time_and_period(self, calendar):
+        assert calendar.next_free("SC1", n=2, after=at(8)) == [at(9), at(10)]
+        assert calendar.next_free("SC1", n=1, after=datetime.combine(DAY, time(10, 30))) == [at(11)]
+        assert calendar.next_free("SC1", n=1, after=at(8), period="afternoon") == [at(12)]
+        assert calendar.next_free("SC1", n=1, after=at(18)) == [at(9, day=1)]
+
+    def test_slot_is_free_until_every_bay_is_taken(self, calendar):
+        assert calendar.reserve("SC1", at(9)) == 0
+        assert calendar.next_free("SC1", n=1, after=at(8)) == [at(9)]
+        assert calendar.reserve("SC1", at(9)) == 1
+        assert calendar.next_free("SC1", n=1, after=at(8)) == [at(10)]
+        with pytest.raises(SlotUnavailableError):
+            calendar.reserve("SC1", at(9))
+
+    def test_release(self, calendar):
+        bay = calendar.reserve("SC2", at(9))
+        assert calendar.free_bay("SC2", at(9)) is None
+        calendar.release("SC2", at(9), bay)
+        assert calendar.free_bay("SC2", at(9)) == 0
+
+    def test_booking_window(self, calendar):
+        with pytest.raises(SlotUnavailableError):
+            calendar.reserve("SC1", at(9, day=7))
+        with pytest.raises(SlotUnavailableError):
+            calendar.reserve("SC1", datetime.combine(DAY, time(9, 30)))
+        assert calendar.next_free("SC1", n=100, after=at(8, day=6))[-1] == at(17, day=6)
+        assert len(calendar.next_free("SC1", n=100, after=at(8, day=6))) == 9
+
+    def test_advance_drops_past_days(self, calendar):
+        calendar.reserve("SC2", at(9, day=1))
+        calendar.advance(DAY + timedelta(days=1))
+        assert calendar.free_bay("SC2", at(9, day=1)) is None
+        assert calendar.next_free("SC2", n=1, after=at(8, day=1)) == [at(10, day=1)]
+        assert calendar.utilization("SC2") == pytest.approx(1 / 63)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def bookings(calendar, clock):
+    return BookingManager(calendar, hold_ttl_seconds=60, clock=clock)
+
+
+class TestBookingManager:
+    def test_hold_blocks_slot_until_it_expires(self, bookings, clock):
+        held = bookings.hold("SC2", at(9), {"name": "A"})
+        assert held["status"] == "held"
+        assert bookings.next_free("SC2", n=1, after=at(8)) == [at(10)]
+        with pytest.raises(SlotUnavailableError):
+            bookings.hold("SC2", at(9), {"name": "B"})
+
+        clock.now = 61
+        assert bookings.next_free("SC2", n=1, after=at(8)) == [at(9)]
+        with pytest.raises(HoldExpiredError):
+            bookings.confirm(held["hold_id"])
+        assert bookings.get(held["hold_id"])["status"] == "expired"
+
+    def test_confirm_is_idempotent_and_survives_ttl(self, bookings, clock):
+        held = bookings.hold("SC2", at(9), {"name": "A"})
+        clock.now = 30
+        confirmed = bookings.confirm(held["hold_id"])
+        assert confirmed["status"] == "confirmed"
+        assert bookings.confirm(held["hold_id"])["version"] == confirmed["version"]
+
+        clock.now = 1000
+        assert bookings.next_free("SC2", n=1, after=at(8)) == [at(10)]
+        assert bookings.get_stats() == {"confirmed": 1}
+
+    def test_release_frees_the_bay(self, bookings):
+        booking = bookings.reserve("SC1", at(9), {"name": "A"}, bay=1)
+        assert bookings.release(booking["hold_id"])
+        assert not bookings.release(booking["hold_id"])
+        assert bookings.reserve("SC1", at(9), {"name": "B"}, bay=1)["bay"] == 1
+        with pytest.raises(HoldExpiredError):
+            bookings.confirm(booking["hold_id"])
+
+    def test_past_records_are_purged(self, bookings, calendar):
+        past = bookings.reserve("SC1", at(9), {"name": "A"})
+        released = bookings.reserve("SC1", at(10), {"name": "B"})
+        bookings.release(released["hold_id"])
+        held = bookings.hold("SC1", at(11), {"name": "C"})
+        upcoming = bookings.reserve("SC1", at(9, day=1), {"name": "D"})
+
+        calendar.advance(DAY + timedelta(days=1))
+        assert bookings.purge_past() == 3
+        assert [bookings.get(r["hold_id"]) for r in (past, released, held)] == [None] * 3
+        assert bookings.get(upcoming["hold_id"])["status"] == "confirmed"
+        assert bookings.get_stats() == {"confirmed": 1}
+        assert bookings.purge_past() == 0
+
+    def test_aware_slot_is_booked_in_local_time(self, bookings):
+        aware = at(9).astimezone().astimezone(timezone.utc)
+        booking = bookings.reserve("SC1", aware, {"name": "A"})
+        assert booking["start"] == at(9) and booking["start"].tzinfo is None
+        # Later naive bookings and purges still work
+        assert bookings.reserve("SC1", at(10), {"name": "B"})["start"] == at(10)
+        assert bookings.purge_past() == 0
+
+    def test_requested_slot(self):
+        now = at(12)
+        assert requested_slot(at(14), now) == at(14)
+        assert requested_slot(at(14).astimezone().astimezone(timezone.utc), now) == at(14)
+        with pytest.raises(SlotUnavailableError):
+            requested_slot(at(10), now)
+
+    def test_unknown_center(self, bookings, calendar):
+        with pytest.raises(UnknownServiceCenterError, match="SC9"):
+            bookings.hold("SC9", at(9), {"name": "A"})
+        with pytest.raises(UnknownServiceCenterError):
+            bookings.next_free("SC9")
+        with pytest.raises(UnknownServiceCenterError):
+            calendar.reserve("SC9", at(9))
+
+    def test_concurrent_reservations_never_double_book(self, calendar, clock):
+        bookings = BookingManager(calendar, clock=clock)
+        slots = [at(9), at(10)]
+        capacity = len(slots) * 2  # SC1 has two bays
+
+        def attempt(i):
+            try:
+                return bookings.reserve("SC1", slots[i % len(slots)], {"name": f"C{i}"})
+            except SlotUnavailableError:
+                return None
+
+        with ThreadPoolExecutor(max_workers=32) as pool:
+            results = [r for r in pool.map(attempt, range(400)) if r]
+
+        confirmed = bookings.confirmed_bookings()
+        keys = {(b["center_id"], b["start"], b["bay"]) for b in confirmed}
+        assert len(results) == len(confirmed) == len(keys) == capacity
+        assert calendar.next_free("SC1", n=1, after=at(8)) == [at(11)]
+
+
+def brute_force(centers, lat, lon):
+    return sorted((distance_km(lat, lon, c["lat"], c["lon"]), c["center_id"]) for c in centers)
+
+
+@pytest.fixture(scope="module")
+def network():
+    rng = random.Random(3)
+    centers = [{"center_id": f"SC{i}", "lat": rng.uniform(-89, 89), "lon": rng.uniform(-180, 180)}
+               for i in range(2000)]
+    # Dense cluster, plus centers either side of the antimeridian and near a pole
+    centers += [{"center_id": f"IN{i}", "lat": rng.gauss(19, 0.3), "lon": rng.gauss(73, 0.3)}
+                for i in range(300)]
+    centers += [{"center_id": "E179", "lat": 10, "lon": 179.9}, {"center_id": "W179", "lat": 10, "lon": -179.9},
+                {"center_id": "POLE", "lat": 89.9, "lon": 45}]
+    return centers, ServiceCenterIndex(centers, cell_km=50)
+
+
+QUERIES = [(19.0, 73.0), (10.0, 179.95), (10.0, -179.95), (89.5, -120.0), (-45.0, 12.0), (0.0, 0.0)]
+
+
+class TestServiceCenterIndex:
+    @pytest.mark.parametrize("radius", [5, 50, 400])
+    def test_within_matches_brute_force(self, network, radius):
+        centers, index = network
+        for lat, lon in QUERIES:
+            expected = [cid for d, cid in brute_force(centers, lat, lon) if d <= radius]
+            found = index.within(lat, lon, radius)
+            assert [c["center_id"] for c in found] == expected
+            assert all(c["distance_km"] <= radius + 0.01 for c in found)
+
+    def test_antimeridian_and_pole(self, network):
+        _, index = network
+        assert {"E179", "W179"} <= {c["center_id"] for c in index.within(10.0, 180.0, 20)}
+        assert "POLE" in {c["center_id"] for c in index.within(89.5, -120.0, 100)}
+
+    @pytest.mark.parametrize("k", [1, 3, 10])
+    def test_nearest_matches_brute_force(self, network, k):
+        centers, index = network
+        for lat, lon in QUERIES:
+            expected = [cid for _, cid in brute_force(centers, lat, lon)[:k]]
+            assert [c["center_id"] for c in index.nearest(lat, lon, k=k)] == expected
+        assert index.nearest(0.0, 0.0, k=3, max_km=1) == []
+
+    def test_batch_matches_single_queries(self, network):
+        _, index = network
+        points = QUERIES + [(19.0 + i / 100, 73.0 - i / 100) for i in range(50)]
+        assert index.within_batch(points, 30) == [index.within(lat, lon, 30) for lat, lon in points]
+        assert index.nearest_batch(points, k=4) == [index.nearest(lat, lon, k=4) for lat, lon in points]
+
+    def test_configured_network(self):
+        index = get_service_center_index()
+        assert index.radius_km == 50
+        nearby = index.within(19.07, 72.88)
+        assert nearby[0]["center_id"] == "ABC-MAIN"
+        assert {c["center_id"] for c in nearby} == {"ABC-MAIN", "ABC-THN", "ABC-NVM"}
+        assert index.nearest(12.9, 77.6, k=1)[0]["center_id"] == "ABC-BLR"
+
+
+TWO_CENTERS = [{"center_id": "NEAR", "lat": 19.0, "lon": 73.0}, {"center_id": "FAR", "lat": 19.5, "lon": 73.0}]
+
+
+def flagged(vehicle_id, urgency, lat=19.0, lon=73.0):
+    return {"vehicle_id": vehicle_id, "lat": lat, "lon": lon, "urgency": urgency}
+
+
+class TestBatchScheduler:
+    @pytest.fixture
+    def scheduler(self):
+        calendar = ServiceCalendar({"NEAR": 1, "FAR": 1}, opening_hour=9, closing_hour=12,
+                                   horizon_days=2, start_date=DAY)
+        return BatchScheduler(calendar, ServiceCenterIndex(TWO_CENTERS), travel_weight=0.05)
+
+    def test_most_urgent_get_the_earliest_slots(self, scheduler):
+        vehicles = [flagged("LOW", "low"), flagged("MED", "medium"), flagged("CRIT", "critical")]
+        plan = scheduler.assign(vehicles, now=at(8))
+        starts = {a["vehicle_id"]: (a["center_id"], a["start"]) for a in plan["assignments"]}
+        assert starts["CRIT"] == ("NEAR", at(9))
+        # Medium takes the far bay at 9 rather than waiting an hour (5/h > 0.05/km * 55 km)
+        assert starts["MED"] == ("FAR", at(9))
+        assert starts["LOW"] == ("NEAR", at(10))
+        assert plan["report"]["assigned"] == 3 and plan["unassigned"] == []
+        assert plan["report"]["mean_delay_hours"]["critical"] == 1.0
+
+    def test_capacity_and_booked_slots_are_respected(self, scheduler):
+        scheduler.calendar.reserve("NEAR", at(9))
+        vehicles = [flagged(f"V{i}", "high") for i in range(20)]
+        plan = scheduler.assign(vehicles, now=at(9, day=0) - timedelta(minutes=1))
+        taken = [(a["center_id"], a["start"]) for a in plan["assignments"]]
+        assert len(taken) == len(set(taken)) == 11  # 12 bay-slots, one already booked
+        assert ("NEAR", at(9)) not in taken
+        assert len(plan["unassigned"]) == 9
+        assert free_capacity(scheduler.calendar, ["NEAR"])[0, 0] == 0  # calendar untouched otherwise
+        assert free_capacity(scheduler.calendar, ["NEAR"])[0, 1] == 1
+
+    def test_past_slots_are_skipped(self, scheduler):
+        plan = scheduler.assign([flagged("V1", "critical")], now=at(10, day=0) + timedelta(minutes=30))
+        assert plan["assignments"][0]["start"] == at(11)
+
+    def test_stranded_vehicles_search_wider(self):
+        calendar = ServiceCalendar({"NEAR": 1, "FAR": 1}, opening_hour=9, closing_hour=10,
+                                   horizon_days=1, start_date=DAY)
+        scheduler = BatchScheduler(calendar, ServiceCenterIndex(TWO_CENTERS), k=1, repair_k=2)
+        plan = scheduler.assign([flagged("A", "high"), flagged("B", "low")], now=at(8))
+        assert {a["vehicle_id"]: a["center_id"] for a in plan["assignments"]} == {"A": "NEAR", "B": "FAR"}
+        assert plan["assignments"][1]["distance_km"] == pytest.approx(55.6, abs=0.1)
+        assert plan["report"]["gap_pct"] >= 0
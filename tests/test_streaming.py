@@ -0,0 +1,58 @@
+"""Tests for token streaming helpers"""
+
+import io
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from utils.streaming import print_stream, stream_text
+
+
+class FakeStream:
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.produced = 0
+        self.closed = False
+
+    def __iter__(self):
+        try:
+            for chunk in self.chunks:
+                self.produced += 1
+                yield chunk
+        finally:
+            self.closed = True
+
+
+class TestStreaming:
+    def test_preview_stops_generation(self):
+        stream = FakeStream(["Primary ", "Issue: ", "brake ", "pads ", "worn"] * 50)
+        out = io.StringIO()
+        shown = print_stream(iter(stream), 20, out=out)
+        assert shown == "Primary Issue: brake"
+        assert out.getvalue() == "Primary Issue: brake...\n"
+        assert stream.closed
+        assert stream.produced == 3
+
+    def test_consume_rest_returns_full_text(self):
+        chunks = ["abc", "def", "ghi"]
+        out = io.StringIO()
+        assert print_stream(iter(chunks), 4, consume_rest=True, out=out) == "abcdefghi"
+        assert out.getvalue() == "abcd...\n"
+
+    def test_short_text_is_printed_whole(self):
+        out = io.StringIO()
+        assert print_stream(["all of it"], 400, out=out) == "all of it"
+        assert out.getvalue() == "all of it\n"
+
+    def test_stream_text_skips_empty_chunks(self):
+        class FakeLLM:
+            def stream(self, messages):
+                self.messages = messages
+                return iter(SimpleNamespace(content=c) for c in ["", "Hi", "", " there"])
+
+        llm = FakeLLM()
+        assert list(stream_text(llm, None, "hello")) == ["Hi", " there"]
+        assert llm.messages == [("human", "hello")]
@@ -0,0 +1,372 @@
+"""Tests for the UEBA rule engine and agent"""
+
+import asyncio
+import sys
+from datetime import datetime
+from pathlib import Path
+
+import pytest
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from agents.orchestrator import AgentOrchestrator, TaskType
+from agents.ueba_agent.agent import UEBAAgent
+from agents.ueba_agent.anomaly_detector import (
+    CompiledRule, RuleEngine, SlidingWindowCounter, engine_from_config
+)
+from agents.ueba_agent.behavior_monitor import BaselineStore
+from agents.ueba_agent.threat_scorer import ThreatScorer, scorer_from_config
+from utils.config import load_config
+
+T0 = datetime(2026, 3, 2, 12, 0).timestamp()  # local noon
+
+
+def engine(**overrides):
+    return engine_from_config(dict(load_config("ueba_rules"), **overrides))
+
+
+def fired(alerts):
+    return [a["rule"] for a in alerts]
+
+
+class TestSlidingWindow:
+    def test_counts_expire(self):
+        counter = SlidingWindowCounter(window_seconds=10, buckets=10)
+        for i in range(10):
+            counter.add(T0 + i)
+        assert counter.total == 10
+        assert counter.add(T0 + 12.5) == 8  # events 0-2 expired, this one added
+        assert counter.advance(T0 + 100) == 8
+        assert counter.total == 0
+
+    def test_late_events_outside_window_are_dropped(self):
+        counter = SlidingWindowCounter(window_seconds=10, buckets=10)
+        counter.add(T0 + 50)
+        assert counter.add(T0 + 30) == 1
+        assert counter.add(T0 + 45) == 2
+
+
+class TestCompile:
+    def test_invalid_rules(self):
+        with pytest.raises(ValueError):
+            CompiledRule(0, {"name": "x", "kind": "magic"})
+        with pytest.raises(ValueError):
+            CompiledRule(0, {"name": "x", "kind": "violation"})
+
+    def test_events_only_reach_their_rules(self):
+        rules = engine()._dispatch
+        assert [r.name for r in rules["prediction"]] == [
+            "prediction_drift", "off_hours_activity", "rapid_sequential_actions"
+        ]
+        assert "api_call_spike" in [r.name for r in rules["api_call"]]
+        assert [r.name for r in engine()._wildcard] == ["off_hours_activity", "rapid_sequential_actions"]
+
+    def test_all_configured_rules_compile(self):
+        names = [r["name"] for r in load_config("ueba_rules")["anomaly_rules"]]
+        assert [r.name for r in engine().rules] == names
+
+
+class TestRules:
+    def test_rapid_sequential_actions(self):
+        rules = engine()
+        alerts = [a for i in range(11) for a in rules.observe({"type": "task", "agent": "bot",
+                                                               "timestamp": T0 + i * 0.05})]
+        assert fired(alerts) == ["rapid_sequential_actions"]
+        assert alerts[0]["action"] == "throttle" and alerts[0]["measure"] == 11
+        # Cooldown: still fast, but no repeated alert within the window
+        assert rules.observe({"type": "task", "agent": "bot", "timestamp": T0 + 0.6}) == []
+        # Ten per second is allowed
+        assert not [a for i in range(10) for a in rules.observe({"type": "task", "agent": "calm",
+                                                                 "timestamp": T0 + i * 0.1})]
+
+    def test_failed_authentication(self):
+        rules = engine()
+        results = [fired(rules.observe({"type": "auth_failure", "agent": "10.0.0.9",
+                                        "timestamp": T0 + i * 30})) for i in range(4)]
+        assert results == [[], [], [], ["failed_authentication"]]
+        spaced = [fired(rules.observe({"type": "auth_failure", "agent": "10.0.0.8",
+                                       "timestamp": T0 + i * 200})) for i in range(6)]
+        assert not any(spaced)
+
+    def test_spike_against_baseline(self):
+        rules = engine()
+        alerts = []
+        # A steady 5 calls per 6-second bucket for ten minutes builds the baseline
+        for i in range(500):
+            alerts += rules.observe({"type": "api_call", "agent": "client", "timestamp": T0 + i * 1.2})
+        assert alerts == []
+        burst = T0 + 601
+        for i in range(30):
+            alerts += rules.observe({"type": "api_call", "agent": "client", "timestamp": burst + i * 0.2})
+        spike = [a for a in alerts if a["rule"] == "api_call_spike"]
+        assert len(spike) == 1 and spike[0]["measure"] > 5.0
+
+    def test_prediction_drift(self):
+        rules = engine()
+        for i in range(50):
+            assert rules.observe({"type": "prediction", "agent": "model", "value": 0.5 + 0.01 * (i % 3),
+                                  "timestamp": T0 + i}) == []
+        alerts = rules.observe({"type": "prediction", "agent": "model", "value": 0.9, "timestamp": T0 + 60})
+        assert fired(alerts) == ["prediction_drift"]
+
+    def test_baselines_are_silent_until_enough_samples(self):
+        rules = engine(behavior_monitoring={"baseline_min_samples": 30})
+        for i in range(20):
+            rules.observe({"type": "prediction", "agent": "model", "value": 0.5 + 0.01 * (i % 3),
+                           "timestamp": T0 + i})
+        assert rules.observe({"type": "prediction", "agent": "model", "value": 0.9, "timestamp": T0 + 20}) == []
+        assert rules.baselines.baseline("model")["prediction_drift"]["samples"] == 21
+        for i in range(10):
+            rules.observe({"type": "prediction", "agent": "model", "value": 0.5 + 0.01 * (i % 3),
+                           "timestamp": T0 + 30 + i})
+        # Counted in samples, not wall-clock time: no week-long silence after a restart
+        assert fired(rules.observe({"type": "prediction", "agent": "model", "value": 0.9,
+                                    "timestamp": T0 + 60})) == ["prediction_drift"]
+
+    def test_violations_fire_immediately(self):
+        rules = engine()
+        assert rules.observe({"type": "data_access", "agent": "diagnosis", "authorized": True,
+                              "timestamp": T0}) == []
+        [alert] = rules.observe({"type": "data_access", "agent": "diagnosis", "authorized": False,
+                                 "timestamp": T0 + 1})
+        assert (alert["rule"], alert["severity"], alert["action"]) == ("unauthorized_data_access", "critical", "block")
+
+    def test_off_hours(self):
+        rules = engine()
+        night = datetime(2026, 3, 2, 3, 0).timestamp()
+        results = [fired(rules.observe({"type": "task", "agent": "night owl", "timestamp": night + i * 60}))
+                   for i in range(3)]
+        assert results == [[], [], ["off_hours_activity"]]
+        assert not any(fired(rules.observe({"type": "task", "agent": "day", "timestamp": T0 + i * 60}))
+                       for i in range(5))
+
+    def test_trusted_and_forgotten_agents(self):
+        rules = RuleEngine(load_config("ueba_rules")["anomaly_rules"], trusted=["127.0.0.1"])
+        assert rules.observe({"type": "data_access", "agent": "127.0.0.1", "authorized": False}) == []
+        rules.observe({"type": "task", "agent": "a", "timestamp": T0})
+        rules.forget("a")
+        assert "a" not in rules._states
+
+    def test_state_is_bounded(self):
+        rules = RuleEngine(load_config("ueba_rules")["anomaly_rules"], max_entities=100)
+        for i in range(1000):
+            rules.observe({"type": "api_call", "agent": f"client{i}", "timestamp": T0})
+        assert len(rules._states) == 100
+
+
+class TestBaselineStore:
+    def test_matches_plain_statistics_without_decay(self):
+        store = BaselineStore(["m"], capacity=4, time_constant_seconds=1e12, min_samples=1)
+        row = store.row("a", T0)
+        values = [3.0, 5.0, 4.0, 8.0, 10.0]
+        for x in values:
+            store.update(row, 0, x, T0)
+        assert store.mean[row, 0] == pytest.approx(6.0)
+        assert store.variance[row, 0] == pytest.approx(6.8)  # population variance
+        assert store.zscore(row, 0, 6.0 + 6.8 ** 0.5, T0) == pytest.approx(1.0)
+
+    def test_old_observations_fade(self):
+        store = BaselineStore(["m"], capacity=4, time_constant_seconds=3600, min_samples=1)
+        row = store.row("a", T0)
+        for i in range(100):
+            store.update(row, 0, 10.0, T0 + i)
+        # A day later the old level weighs exp(-24) and one new value dominates
+        store.update(row, 0, 50.0, T0 + 86400)
+        assert store.mean[row, 0] == pytest.approx(50.0, abs=1e-6)
+
+    def test_min_samples(self):
+        store = BaselineStore(["m"], capacity=4, min_samples=3)
+        row = store.row("a", T0)
+        for i in range(2):
+            store.update(row, 0, 1.0, T0 + i)
+        assert store.zscore(row, 0, 2.0, T0 + 10) is None
+        store.update(row, 0, 1.0, T0 + 2)
+        assert store.zscore(row, 0, 2.0, T0 + 10) is not None
+        other = store.row("b", T0)
+        assert store.zscore(other, 0, 2.0, T0 + 10) is None
+
+    def test_fixed_capacity_recycles_least_recently_seen(self):
+        store = BaselineStore(["m", "n"], capacity=3, min_samples=1)
+        rows = [store.row(name, T0 + i) for i, name in enumerate("abc")]
+        store.update(rows[0], 0, 7.0, T0)
+        store.row("a", T0 + 10)
+        assert store.row("d", T0 + 11) == rows[1]  # "b" was the stalest
+        assert len(store) == 3 and store.baseline("b") == {}
+        assert store.baseline("a") == {"m": {"mean": 7.0, "std": 0.0, "samples": 1}}
+        store.forget("a")
+        assert store.row("e", T0 + 12) == rows[0] and store.baseline("e") == {}
+        assert store.nbytes < 1000
+
+
+class TestThreatScorer:
+    def test_scores_decay_lazily(self):
+        scorer = ThreatScorer(half_life_hours=24)
+        assert scorer.add("bot", "high", T0) == 50
+        assert scorer.score("bot", T0 + 86400) == pytest.approx(25)
+        assert scorer.add("bot", "high", T0 + 86400) == pytest.approx(75)
+        assert scorer.add("bot", "critical", T0 + 86400) == 100  # capped
+        assert scorer.score("unknown", T0) == 0
+
+    def test_levels_from_config(self):
+        scorer = scorer_from_config(load_config("ueba_rules")["threat_scoring"])
+        assert [scorer.level(s) for s in (0, 30, 30.5, 31, 60, 61, 85.9, 86, 100)] == [
+            "low", "low", "low", "medium", "medium", "high", "high", "critical", "critical"
+        ]
+        assert scorer.half_life == 24 * 3600
+
+    def test_top_and_bounded_capacity(self):
+        scorer = ThreatScorer(capacity=2)
+        scorer.add("a", "low", T0)
+        scorer.add("b", "high", T0)
+        scorer.add("c", "medium", T0)  # replaces "a", the lowest score
+        assert [(t["entity"], t["level"]) for t in scorer.top(T0)] == [("b", "medium"), ("c", "low")]
+
+    def test_sources_expire_with_the_half_life(self):
+        scorer = ThreatScorer(half_life_hours=1)
+        scorer.add("bot", "high", T0, "rapid_sequential_actions")
+        scorer.add("bot", "high", T0 + 1, "rapid_sequential_actions")
+        scorer.add("bot", "medium", T0 + 2, "api_call_spike")
+        assert scorer.sources("bot", T0 + 10) == {"rapid_sequential_actions", "api_call_spike"}
+        assert scorer.sources("bot", T0 + 3601.5) == {"api_call_spike"}
+        scorer.reset("bot")
+        assert scorer.sources("bot", T0 + 10) == set()
+
+
+class TestUEBAAgent:
+    def agent(self, **actions):
+        rules_config = load_config("ueba_rules")
+        rules_config = dict(rules_config, actions=dict(rules_config["actions"], **actions))
+        return UEBAAgent(engine=engine(), config={"anomaly_score_threshold": 0.75, "auto_block_enabled": True},
+                         rules_config=rules_config)
+
+    def test_block_until_review(self):
+        ueba = self.agent()
+        [alert] = ueba.observe({"type": "model_access", "agent": "intruder", "authorized": False,
+                                "timestamp": T0})
+        assert ueba.is_blocked("intruder", now=T0 + 86400)
+        assert ueba.recent_alerts()[0]["escalated"]
+        ueba.unblock("intruder")
+        assert not ueba.is_blocked("intruder")
+
+    def test_block_expires_with_auto_unblock(self):
+        ueba = self.agent(block={"enabled": True, "duration_minutes": 10, "auto_unblock": True})
+        ueba.observe({"type": "model_access", "agent": "intruder", "authorized": False, "timestamp": T0})
+        assert ueba.is_blocked("intruder", now=T0 + 60)
+        assert not ueba.is_blocked("intruder", now=T0 + 601)
+
+    def test_disabled_action_is_only_logged(self):
+        ueba = self.agent(block={"enabled": False})
+        ueba.observe({"type": "model_access", "agent": "intruder", "authorized": False, "timestamp": T0})
+        assert not ueba.is_blocked("intruder")
+        assert ueba.recent_alerts()[0]["applied"] == "log"
+
+    def test_throttle(self):
+        ueba = self.agent()
+        for i in range(11):
+            ueba.observe({"type": "api_call", "agent": "bot", "timestamp": T0 + i * 0.01})
+        assert ueba.is_throttled("bot", now=T0 + 1)
+        assert not ueba.is_throttled("bot", now=T0 + 120)
+        assert "bot" not in ueba.throttled
+
+    def test_throttle_duration_from_config(self):
+        ueba = self.agent(throttle={"enabled": True, "duration_minutes": 5})
+        for i in range(11):
+            ueba.observe({"type": "api_call", "agent": "bot", "timestamp": T0 + i * 0.01})
+        assert ueba.is_throttled("bot", now=T0 + 200)
+        assert not ueba.is_throttled("bot", now=T0 + 301)
+
+    def test_a_short_burst_is_throttled_not_blocked(self):
+        ueba = self.agent()
+        # A browser firing 12 parallel requests a second for three seconds
+        for i in range(36):
+            ueba.observe({"type": "api_call", "agent": "browser", "timestamp": T0 + i / 12})
+        alerts = ueba.recent_alerts()
+        assert [a["rule"] for a in alerts] == ["rapid_sequential_actions"] * 3
+        assert {a["applied"] for a in alerts} == {"throttle"}
+        assert alerts[0]["threat_level"] == "critical"
+        assert ueba.is_throttled("browser", now=T0 + 4)
+        assert not ueba.is_blocked("browser", now=T0 + 4)
+
+    def test_distinct_anomalies_add_up_to_a_timed_block(self):
+        ueba = self.agent()
+        for i in range(40):
+            ueba.observe({"type": "prediction", "agent": "bot", "value": 0.5 + 0.01 * (i % 3),
+                          "timestamp": T0 + i})
+        [drift] = ueba.observe({"type": "prediction", "agent": "bot", "value": 0.9, "timestamp": T0 + 40})
+        assert drift["rule"] == "prediction_drift"
+        assert ueba.threat("bot", now=T0 + 40)["level"] == "low"
+        for burst in (T0 + 50, T0 + 52):
+            for i in range(11):
+                ueba.observe({"type": "task", "agent": "bot", "timestamp": burst + i * 0.01})
+        alert = ueba.recent_alerts()[0]
+        assert (alert["applied"], alert["threat_level"], alert["escalated"]) == ("block", "critical", True)
+        assert ueba.is_blocked("bot", now=T0 + 60)
+        # Escalations from the score expire even though rule blocks wait for review
+        assert not ueba.is_blocked("bot", now=T0 + 53 + 3600)
+        assert ueba.top_threats(now=T0 + 60)[0]["entity"] == "bot"
+        ueba.unblock("bot")
+        assert ueba.threat("bot")["score"] == 0
+
+    def test_orchestrator_refuses_tasks_from_blocked_senders(self):
+        class Worker:
+            def __init__(self):
+                self.tasks = []
+
+            async def process_task(self, task):
+                self.tasks.append(task)
+                return "done"
+
+        ueba = self.agent()
+        orchestrator = AgentOrchestrator(monitor=ueba)
+        worker = Worker()
+        orchestrator.register_agent("diagnosis", worker)
+        task = {"task_id": "t1", "task_type": "diagnosis", "data": {"source": "data_analysis"}}
+        assert asyncio.run(orchestrator._route_task(task)) == "done"
+
+        ueba.observe({"type": "data_access", "agent": "data_analysis", "authorized": False})
+        assert asyncio.run(orchestrator._route_task(dict(task, task_id="t2"))) is None
+        assert [t["task_id"] for t in worker.tasks] == ["t1"]
+
+        # An unroutable task type is an error, not a security event
+        assert asyncio.run(orchestrator._route_task({"task_id": "t3", "task_type": "exfiltrate",
+                                                     "source": "scheduler", "data": {}})) is None
+        assert not ueba.is_blocked("scheduler") and ueba.threat("scheduler")["score"] == 0
+
+    def test_unusual_routes_are_blocked_through_the_orchestrator(self):
+        class Worker:
+            async def process_task(self, task):
+                return "done"
+
+        ueba = UEBAAgent(engine=engine(), rules_config=load_config("ueba_rules"),
+                         config={"allowed_routes": {"data_analysis": ["diagnosis"]}})
+        orchestrator = AgentOrchestrator(monitor=ueba)
+        for name in ("diagnosis", "scheduling"):
+            orchestrator.register_agent(name, Worker())
+        route = lambda task_type, source: asyncio.run(orchestrator._route_task(
+            {"task_id": f"{source}-{task_type}", "task_type": task_type, "source": source, "data": {}}))
+        assert route("diagnosis", "data_analysis") == "done"
+        # Registered agents are open to senders without a route list
+        assert route("scheduling", "diagnosis") == "done"
+        assert "unusual_message_routing" not in fired(ueba.recent_alerts())
+
+        assert route("scheduling", "data_analysis") is None
+        assert "unusual_message_routing" in fired(ueba.recent_alerts())
+        assert ueba.is_blocked("data_analysis")
+        # Tasks to an agent that is not registered are a violation too
+        assert route("feedback", "diagnosis") is None
+        assert ueba.is_blocked("diagnosis")
+
+    def test_submitted_tasks_are_attributed_to_their_sender(self):
+        async def submit_and_route(orchestrator):
+            await orchestrator.submit_task(TaskType.DIAGNOSIS, {"vehicle_id": "VEH001"}, source="data_analysis")
+            task = await orchestrator.task_queue.get()
+            await orchestrator._route_task(task)
+            return task
+
+        ueba = self.agent()
+        events = []
+        ueba.observe = lambda event: events.append(event) or []
+        task = asyncio.run(submit_and_route(AgentOrchestrator(monitor=ueba)))
+        assert task["source"] == "data_analysis"
+        assert [(e["agent"], e["destination"]) for e in events] == [("data_analysis", "diagnosis")]
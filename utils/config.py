@@ -0,0 +1,27 @@
+"""
+Configuration Loader
+Reads the YAML files in config/ once and shares them across agents
+"""
+
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict
+
+import yaml
+
+CONFIG_DIR = Path(__file__).resolve().parent.parent / "config"
+
+
+@lru_cache(maxsize=None)
+def load_config(name: str) -> Dict[str, Any]:
+    """
+    Load a configuration file from the config directory
+
+    Args:
+        name: File name without extension (e.g., 'ml_config')
+
+    Returns:
+        Parsed YAML content (cached - treat as read-only)
+    """
+    with open(CONFIG_DIR / f"{name}.yaml", encoding="utf-8") as f:
+        return yaml.safe_load(f) or {}
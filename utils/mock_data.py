@@ -19,7 +19,8 @@ VEHICLES = {
             "brake_wear": 78,
             "coolant_level": 65,
             "tire_pressure": 32
-        }
+        },
+        "dtc_codes": ["P0524"]
     },
     "VEH002": {
         "vehicle_id": "VEH002",
@@ -35,7 +36,8 @@ VEHICLES = {
             "brake_wear": 55,
             "range_remaining": 85,
             "charging_cycles": 450
-        }
+        },
+        "dtc_codes": ["P0A7E"]
     },
     "VEH003": {
         "vehicle_id": "VEH003",
@@ -51,7 +53,8 @@ VEHICLES = {
             "brake_wear": 45,
             "coolant_level": 85,
             "tire_pressure": 33
-        }
+        },
+        "dtc_codes": []
     }
 }
 
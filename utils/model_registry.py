@@ -0,0 +1,286 @@
+"""
+Model Registry
+Loads trained model weights from disk through memory-mapped arrays
+
+Layout on disk (derived from each `model_path` in ml_config.yaml):
+    ml-models/trained/failure_predictor/
+        CURRENT              <- name of the active version
+        v1/manifest.json     <- metadata + list of weight arrays
+        v1/<array>.npy
+        v2/...
+
+Arrays are opened with numpy `mmap_mode="r"`, so every worker process
+maps the same file pages from the OS page cache instead of holding its
+own copy. Loaded models stay in an in-process LRU cache
+(`serving.model_cache_enabled`), and activating a new version swaps the
+cached model on the next lookup without restarting the service.
+"""
+
+import json
+import logging
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from utils.config import load_config
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+MODEL_SECTIONS = ("failure_prediction", "anomaly_detection", "dtc_classifier")
+CURRENT_FILE = "CURRENT"
+MANIFEST_FILE = "manifest.json"
+
+
+def version_key(version: str) -> tuple:
+    """Sort key comparing the numbers in a version numerically ("v2" < "v10", "1.9" < "1.10")"""
+    return tuple((0, int(part), "") if part.isdigit() else (1, 0, part)
+                 for part in re.findall(r"\d+|\D+", version))
+
+
+class LoadedModel:
+    """Memory-mapped weights and metadata for one model version"""
+
+    def __init__(self, name: str, version: str, path: Path,
+                 weights: Dict[str, np.ndarray], metadata: Dict[str, Any],
+                 load_time_ms: float):
+        self.name = name
+        self.version = version
+        self.path = path
+        self.weights = weights
+        self.metadata = metadata
+        self.load_time_ms = load_time_ms
+        self.loaded_at = time.time()
+        self.hits = 0
+
+    @property
+    def mapped_bytes(self) -> int:
+        """Total size of the mapped weight arrays"""
+        return int(sum(array.nbytes for array in self.weights.values()))
+
+    def resident_bytes(self) -> int:
+        """
+        Bytes of this model's weight files currently resident in memory
+
+        Reads /proc/self/smaps on Linux; elsewhere falls back to the mapped size.
+        """
+        smaps = Path("/proc/self/smaps")
+        if not smaps.exists():
+            return self.mapped_bytes
+        directory = str(self.path.resolve())
+        # Files inside the version directory only ("v1" must not match "v10")
+        prefix = directory + os.sep
+        resident = 0
+        in_mapping = False
+        with open(smaps, encoding="utf-8", errors="replace") as f:
+            for line in f:
+                first = line.split(maxsplit=1)[0]
+                if "-" in first and not first.endswith(":"):
+                    fields = line.split(maxsplit=5)
+                    mapped = fields[5].strip() if len(fields) == 6 else ""
+                    in_mapping = mapped == directory or mapped.startswith(prefix)
+                elif in_mapping and first == "Rss:":
+                    resident += int(line.split()[1]) * 1024
+        return resident
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Load time and memory footprint of this model"""
+        return {
+            "name": self.name,
+            "version": self.version,
+            "load_time_ms": round(self.load_time_ms, 3),
+            "mapped_bytes": self.mapped_bytes,
+            "resident_bytes": self.resident_bytes(),
+            "hits": self.hits,
+            "loaded_at": self.loaded_at
+        }
+
+
+class ModelRegistry:
+    """
+    Registry of versioned models with a warm LRU cache
+
+    Usage:
+        registry = ModelRegistry()
+        model = registry.get("failure_prediction")
+        model.weights["lstm_kernel"]  # np.memmap, shared between workers
+    """
+
+    def __init__(self, root: Optional[Path] = None, max_models: int = 8,
+                 cache_enabled: Optional[bool] = None,
+                 refresh_interval_seconds: float = 1.0):
+        """
+        Initialize the registry
+
+        Args:
+            root: Base directory for relative model paths (project root)
+            max_models: Number of loaded models kept in the LRU cache
+            cache_enabled: Override `serving.model_cache_enabled`
+            refresh_interval_seconds: How often a cached model checks
+                whether a new version has been activated
+        """
+        config = load_config("ml_config")
+        self.root = Path(root) if root else PROJECT_ROOT
+        self.max_models = max_models
+        self.cache_enabled = config.get("serving", {}).get("model_cache_enabled", True) \
+            if cache_enabled is None else cache_enabled
+        self.refresh_interval = refresh_interval_seconds
+
+        self.model_dirs: Dict[str, Path] = {}
+        for section in MODEL_SECTIONS:
+            model_path = config.get(section, {}).get("model_path")
+            if model_path:
+                self.model_dirs[section] = self._resolve(Path(model_path).with_suffix(""))
+
+        self._cache: "OrderedDict[tuple, LoadedModel]" = OrderedDict()
+        self._active: Dict[str, tuple] = {}  # name -> (version, checked_at)
+        self._lock = threading.Lock()
+        self.logger = logging.getLogger("model_registry")
+
+    def _resolve(self, path: Path) -> Path:
+        return path if path.is_absolute() else self.root / path
+
+    def model_dir(self, name: str) -> Path:
+        """Directory holding all versions of a model"""
+        if name not in self.model_dirs:
+            self.model_dirs[name] = self.root / "ml-models" / "trained" / name
+        return self.model_dirs[name]
+
+    def list_versions(self, name: str) -> List[str]:
+        """Versions saved for a model, oldest first (numbers compared numerically)"""
+        base = self.model_dir(name)
+        if not base.exists():
+            return []
+        return sorted((p.name for p in base.iterdir() if (p / MANIFEST_FILE).exists()), key=version_key)
+
+    def active_version(self, name: str) -> str:
+        """Version currently selected by the CURRENT pointer"""
+        pointer = self.model_dir(name) / CURRENT_FILE
+        if pointer.exists():
+            return pointer.read_text(encoding="utf-8").strip()
+        versions = self.list_versions(name)
+        if not versions:
+            raise FileNotFoundError(f"No saved versions for model '{name}'")
+        return versions[-1]
+
+    def save(self, name: str, version: str, weights: Dict[str, np.ndarray],
+             metadata: Optional[Dict[str, Any]] = None, activate: bool = True) -> Path:
+        """
+        Save model weights in the memory-mappable layout
+
+        Args:
+            name: Model name (e.g., 'failure_prediction')
+            version: Version label (e.g., 'v2')
+            weights: Named weight arrays
+            metadata: JSON-serializable model metadata
+            activate: Make this the active version right away
+
+        Returns:
+            Directory of the saved version
+        """
+        version_dir = self.model_dir(name) / version
+        version_dir.mkdir(parents=True, exist_ok=True)
+        for array_name, array in weights.items():
+            np.save(version_dir / f"{array_name}.npy", np.ascontiguousarray(array))
+        manifest = {"arrays": sorted(weights), "metadata": metadata or {}}
+        with open(version_dir / MANIFEST_FILE, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2)
+        if activate:
+            self.activate(name, version)
+        return version_dir
+
+    def activate(self, name: str, version: str):
+        """
+        Hot-swap the active version of a model
+
+        The pointer file is replaced atomically, so other workers pick the
+        new version up on their next refresh without a restart.
+        """
+        base = self.model_dir(name)
+        if not (base / version / MANIFEST_FILE).exists():
+            raise FileNotFoundError(f"Model '{name}' has no version '{version}'")
+        tmp = base / f".{CURRENT_FILE}.{os.getpid()}.tmp"
+        tmp.write_text(version, encoding="utf-8")
+        os.replace(tmp, base / CURRENT_FILE)
+        with self._lock:
+            self._active[name] = (version, time.monotonic())
+        self.logger.info(f"Activated model {name} version {version}")
+
+    def get(self, name: str, version: Optional[str] = None) -> LoadedModel:
+        """
+        Get a loaded model, from the cache when possible
+
+        Args:
+            name: Model name
+            version: Specific version, or None for the active one
+
+        Returns:
+            LoadedModel with memory-mapped weights
+        """
+        use_active = version is None
+        if use_active:
+            version = self._current_version(name)
+        key = (name, version)
+
+        with self._lock:
+            model = self._cache.get(key)
+            if model is not None:
+                self._cache.move_to_end(key)
+                model.hits += 1
+                return model
+
+        model = self._load(name, version)
+        model.hits += 1
+        if self.cache_enabled:
+            with self._lock:
+                self._cache[key] = model
+                self._cache.move_to_end(key)
+                if use_active:
+                    # The previously active version was hot-swapped out
+                    for stale in [k for k in self._cache if k[0] == name and k != key]:
+                        del self._cache[stale]
+                while len(self._cache) > self.max_models:
+                    evicted, _ = self._cache.popitem(last=False)
+                    self.logger.info(f"Evicted model {evicted[0]} version {evicted[1]}")
+        return model
+
+    def _current_version(self, name: str) -> str:
+        now = time.monotonic()
+        with self._lock:
+            cached = self._active.get(name)
+        if cached and now - cached[1] < self.refresh_interval:
+            return cached[0]
+        version = self.active_version(name)
+        with self._lock:
+            self._active[name] = (version, now)
+        return version
+
+    def _load(self, name: str, version: str) -> LoadedModel:
+        version_dir = self.model_dir(name) / version
+        started = time.perf_counter()
+        with open(version_dir / MANIFEST_FILE, encoding="utf-8") as f:
+            manifest = json.load(f)
+        weights = {
+            array_name: np.load(version_dir / f"{array_name}.npy", mmap_mode="r")
+            for array_name in manifest.get("arrays", [])
+        }
+        load_time_ms = (time.perf_counter() - started) * 1000
+        self.logger.info(f"Loaded model {name} version {version} in {load_time_ms:.2f} ms")
+        return LoadedModel(name, version, version_dir, weights,
+                           manifest.get("metadata", {}), load_time_ms)
+
+    def evict(self, name: str, version: Optional[str] = None):
+        """Drop a model (or all its versions) from the cache"""
+        with self._lock:
+            for key in [k for k in self._cache if k[0] == name and version in (None, k[1])]:
+                del self._cache[key]
+
+    def get_stats(self) -> List[Dict[str, Any]]:
+        """Load time and resident memory for every cached model"""
+        with self._lock:
+            models = list(self._cache.values())
+        return [model.get_stats() for model in models]
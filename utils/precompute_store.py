@@ -0,0 +1,93 @@
+"""
+Precomputed Results Store
+Keeps analysis, diagnosis and call script per vehicle, keyed by input hash
+
+The overnight job (scripts/precompute_fleet.py) writes the store and the
+API reads it. An entry is only served while the hash of the vehicle's
+current inputs (sensor readings, DTCs, model, owner) still matches the
+hash it was generated from; otherwise the API falls back to live agents.
+"""
+
+import hashlib
+import json
+import os
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from utils.config import load_config
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+HASHED_FIELDS = ("type", "model", "year", "owner", "sensor_data", "dtc_codes")
+
+
+def input_hash(vehicle: Dict[str, Any]) -> str:
+    """Stable hash of the vehicle fields that affect generated results"""
+    payload = {field: vehicle.get(field) for field in HASHED_FIELDS}
+    encoded = json.dumps(payload, sort_keys=True, default=str).encode("utf-8")
+    return hashlib.sha256(encoded).hexdigest()
+
+
+class PrecomputeStore:
+    """JSON-file store shared between the batch job and the API process"""
+
+    def __init__(self, path: Optional[Path] = None):
+        if path is None:
+            config = load_config("agents_config").get("precompute", {})
+            path = Path(config.get("store_path", "data/precomputed/fleet_results.json"))
+            if not path.is_absolute():
+                path = PROJECT_ROOT / path
+        self.path = Path(path)
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self._mtime: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def _refresh(self):
+        """Reload the file if another process rewrote it"""
+        try:
+            mtime = self.path.stat().st_mtime
+        except FileNotFoundError:
+            return
+        if mtime != self._mtime:
+            with open(self.path, encoding="utf-8") as f:
+                self._entries = json.load(f)
+            self._mtime = mtime
+
+    def get(self, vehicle_id: str, vehicle: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        Fresh precomputed result for a vehicle
+
+        Args:
+            vehicle_id: Vehicle identifier
+            vehicle: Current vehicle record (used to check staleness)
+
+        Returns:
+            Stored entry, or None if missing or stale
+        """
+        with self._lock:
+            self._refresh()
+            entry = self._entries.get(vehicle_id)
+        if entry and entry.get("input_hash") == input_hash(vehicle):
+            return entry
+        return None
+
+    def put(self, vehicle_id: str, vehicle: Dict[str, Any], result: Dict[str, Any]):
+        """Store a result and persist the file atomically"""
+        entry = dict(result)
+        entry["input_hash"] = input_hash(vehicle)
+        entry["generated_at"] = datetime.now().isoformat()
+        with self._lock:
+            self._refresh()
+            self._entries[vehicle_id] = entry
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.path.with_suffix(f".{os.getpid()}.tmp")
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(self._entries, f, indent=2, ensure_ascii=False)
+            os.replace(tmp, self.path)
+            self._mtime = self.path.stat().st_mtime
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._refresh()
+            return len(self._entries)
@@ -0,0 +1,259 @@
+"""
+Rate Limiter
+Token buckets per client and per endpoint, with pluggable storage
+
+A bucket holds up to `count` tokens of a "count/period" rate and refills
+continuously; a request takes one token or is refused with the time until
+one is available (the Retry-After). The API checks, in order:
+
+- the client's bucket (all endpoints)
+- the client's bucket for an expensive endpoint, so one client cannot
+  use up an endpoint's share
+- the endpoint's total bucket, which caps LLM spend across all clients
+- the UEBA throttle bucket (ueba_rules.yaml `actions.throttle.rate_limit`)
+  while the client is throttled
+
+Backends:
+- MemoryBackend: one process; no locks, see below
+- RedisBackend: shared by every worker, updated atomically by a Lua script
+"""
+
+import heapq
+import math
+import time
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List, Optional, Tuple
+
+from utils.config import load_config
+
+PERIODS = {"second": 1, "minute": 60, "hour": 3600, "day": 86400}
+
+
+class Rate:
+    """`count` requests per `period` seconds; `count` is also the burst size"""
+
+    __slots__ = ("count", "period", "per_second")
+
+    def __init__(self, count: float, period: float):
+        self.count = count
+        self.period = period
+        self.per_second = count / period
+
+    def __repr__(self) -> str:
+        return f"Rate({self.count:g}/{self.period:g}s)"
+
+
+def parse_rate(rate: str) -> Rate:
+    """
+    Parse "10/minute", "5/second", "100/hour" or "1000/day"
+
+    Raises:
+        ValueError: Malformed rate
+    """
+    try:
+        count, unit = rate.split("/")
+        count = float(count)
+        seconds = PERIODS[unit.strip().lower().rstrip("s")]
+    except (AttributeError, KeyError, ValueError):
+        raise ValueError(f"Invalid rate {rate!r}, expected e.g. '10/minute'") from None
+    if count <= 0:
+        raise ValueError(f"Invalid rate {rate!r}, count must be positive")
+    return Rate(count, seconds)
+
+
+class RateLimitBackend(ABC):
+    """Interface for token bucket storage"""
+
+    name = "base"
+    # False when calls go over the network (run them off the event loop)
+    local = True
+
+    @abstractmethod
+    def acquire(self, key: str, rate: Rate, cost: float = 1.0, now: Optional[float] = None) -> float:
+        """
+        Take `cost` tokens from a bucket (a negative cost returns tokens)
+
+        Returns:
+            0 if the tokens were taken, else seconds until they are available
+        """
+        pass
+
+
+class MemoryBackend(RateLimitBackend):
+    """
+    Buckets in a dict of immutable (tokens, updated, full_at) tuples
+
+    Each update reads a tuple and stores a new one; both are atomic under
+    the GIL, so no lock is taken. Requests on the event loop never
+    interleave; requests racing in worker threads can at worst both spend
+    the same token. A bucket that has refilled is the same as no bucket,
+    so at `max_keys` the full ones are dropped first.
+    """
+
+    name = "memory"
+
+    def __init__(self, max_keys: int = 100000):
+        self.max_keys = max_keys
+        self._buckets: Dict[str, Tuple[float, float, float]] = {}
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+    def acquire(self, key: str, rate: Rate, cost: float = 1.0, now: Optional[float] = None) -> float:
+        now = time.time() if now is None else now
+        per_second = rate.per_second
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            tokens = rate.count
+        else:
+            tokens = min(rate.count, bucket[0] + max(now - bucket[1], 0) * per_second)
+        if tokens < cost:
+            return (min(cost, rate.count) - tokens) / per_second
+        tokens = min(tokens - cost, rate.count)
+        self._buckets[key] = (tokens, now, now + (rate.count - tokens) / per_second)
+        if len(self._buckets) > self.max_keys:
+            self._prune(now)
+        return 0.0
+
+    def _prune(self, now: float):
+        buckets = {key: bucket for key, bucket in list(self._buckets.items()) if bucket[2] > now}
+        if len(buckets) > self.max_keys // 2:
+            # Still crowded: keep the buckets furthest from refilled
+            buckets = dict(heapq.nlargest(self.max_keys // 2, buckets.items(), key=lambda item: item[1][2]))
+        self._buckets = buckets
+
+
+class RedisBackend(RateLimitBackend):
+    """Buckets in Redis hashes, shared by every API worker"""
+
+    name = "redis"
+    local = False
+
+    # KEYS[1] bucket; ARGV capacity, tokens per second, cost, now
+    SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local per_second = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local now = tonumber(ARGV[4])
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local tokens = tonumber(bucket[1]) or capacity
+local updated = tonumber(bucket[2]) or now
+tokens = math.min(capacity, tokens + math.max(now - updated, 0) * per_second)
+if tokens < cost then
+  return tostring((math.min(cost, capacity) - tokens) / per_second)
+end
+tokens = math.min(tokens - cost, capacity)
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil((capacity - tokens) / per_second) + 1)
+return '0'
+"""
+
+    def __init__(self, url: str = "redis://localhost:6379/0", prefix: str = "ratelimit:"):
+        import redis
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+        self._script = self.client.register_script(self.SCRIPT)
+
+    def acquire(self, key: str, rate: Rate, cost: float = 1.0, now: Optional[float] = None) -> float:
+        now = time.time() if now is None else now
+        wait = self._script(keys=[self.prefix + key], args=[rate.count, rate.per_second, cost, now])
+        return float(wait)
+
+
+def create_rate_limit_backend(config: Optional[Dict[str, Any]] = None) -> RateLimitBackend:
+    """Backend named in agents_config.yaml `rate_limiting.backend` (default: memory)"""
+    if config is None:
+        config = load_config("agents_config").get("rate_limiting", {})
+    name = config.get("backend", "memory")
+    if name == "memory":
+        return MemoryBackend(config.get("max_keys", 100000))
+    if name == "redis":
+        return RedisBackend(config.get("redis_url", "redis://localhost:6379/0"))
+    raise ValueError(f"Unknown rate limit backend: {name}")
+
+
+class RateLimiter:
+    """Per-client and per-endpoint limits checked together"""
+
+    def __init__(self, backend: Optional[RateLimitBackend] = None, per_client: Optional[str] = None,
+                 endpoints: Optional[Dict[str, Dict[str, str]]] = None, throttle: Optional[str] = None):
+        """
+        Args:
+            backend: Bucket storage (default in-memory)
+            per_client: Rate for each client across all endpoints
+            endpoints: Path (or prefix ending in "/") -> {"per_client": rate,
+                "total": rate}
+            throttle: Rate for clients the UEBA agent throttles
+        """
+        self.backend = backend or MemoryBackend()
+        self.per_client = parse_rate(per_client) if per_client else None
+        self.endpoints = {
+            path: {scope: parse_rate(rate) for scope, rate in limits.items() if scope in ("per_client", "total")}
+            for path, limits in (endpoints or {}).items()
+        }
+        self._prefixes = sorted((path for path in self.endpoints if path.endswith("/")), key=len, reverse=True)
+        self.throttle = parse_rate(throttle) if throttle else None
+
+    def endpoint(self, path: str) -> Optional[str]:
+        """Configured endpoint a request path falls under"""
+        if path in self.endpoints:
+            return path
+        for prefix in self._prefixes:
+            if path.startswith(prefix):
+                return prefix
+        return None
+
+    def buckets(self, client: str, path: str, throttled: bool = False) -> List[Tuple[str, Rate]]:
+        buckets = []
+        if self.per_client:
+            buckets.append((f"client:{client}", self.per_client))
+        endpoint = self.endpoint(path)
+        if endpoint is not None:
+            limits = self.endpoints[endpoint]
+            if "per_client" in limits:
+                buckets.append((f"endpoint:{endpoint}:{client}", limits["per_client"]))
+            if "total" in limits:
+                buckets.append((f"endpoint:{endpoint}", limits["total"]))
+        if throttled and self.throttle:
+            buckets.append((f"throttle:{client}", self.throttle))
+        return buckets
+
+    def check(self, client: str, path: str, throttled: bool = False, now: Optional[float] = None) -> float:
+        """
+        Take a token from every bucket the request falls under
+
+        Returns:
+            0 if allowed, else the Retry-After in seconds. A refused request
+            takes nothing: tokens already taken from earlier buckets are
+            returned, so a client rejected by its own limit does not eat
+            into an endpoint's total.
+        """
+        now = time.time() if now is None else now
+        taken = []
+        for key, rate in self.buckets(client, path, throttled):
+            wait = self.backend.acquire(key, rate, 1.0, now)
+            if wait > 0:
+                for taken_key, taken_rate in taken:
+                    self.backend.acquire(taken_key, taken_rate, -1.0, now)
+                return wait
+            taken.append((key, rate))
+        return 0.0
+
+    @staticmethod
+    def retry_after(wait: float) -> str:
+        """Retry-After header value (whole seconds, at least 1)"""
+        return str(max(1, math.ceil(wait)))
+
+
+def build_rate_limiter() -> Optional[RateLimiter]:
+    """RateLimiter from agents_config.yaml `rate_limiting` and the UEBA throttle action; None if disabled"""
+    config = load_config("agents_config").get("rate_limiting", {})
+    if not config.get("enabled", True):
+        return None
+    throttle = load_config("ueba_rules").get("actions", {}).get("throttle", {})
+    return RateLimiter(
+        create_rate_limit_backend(config),
+        per_client=config.get("per_client"),
+        endpoints=config.get("endpoints"),
+        throttle=throttle.get("rate_limit") if throttle.get("enabled", True) else None,
+    )
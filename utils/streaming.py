@@ -0,0 +1,65 @@
+"""
+Token Streaming Helpers
+Stream LLM output token by token and preview it in the CLI demos
+
+Closing a stream generator (e.g. when a preview has shown enough) closes
+the underlying HTTP response, so the model stops generating and no
+further tokens are billed.
+"""
+
+import sys
+from typing import Iterable, Iterator, Optional
+
+
+def agent_system_prompt(agent) -> str:
+    """System prompt equivalent to a crewai Agent's persona"""
+    return f"You are a {agent.role}. Your goal: {agent.goal}. {agent.backstory}."
+
+
+def stream_text(llm, system: Optional[str], prompt: str) -> Iterator[str]:
+    """Yield text chunks from a LangChain chat model as they arrive"""
+    messages = [("system", system)] if system else []
+    for chunk in llm.stream(messages + [("human", prompt)]):
+        if chunk.content:
+            yield chunk.content
+
+
+def print_stream(chunks: Iterable[str], limit: int, consume_rest: bool = False,
+                 out=None) -> str:
+    """
+    Print streamed text as it arrives, up to `limit` characters
+
+    Args:
+        chunks: Text chunks (e.g. from an agent's *_stream method)
+        limit: Characters to display
+        consume_rest: Keep reading (without printing) after the limit, for
+            callers that need the full text; otherwise the stream is closed
+            as soon as the preview is complete
+        out: Output stream (defaults to stdout)
+
+    Returns:
+        The full text if consume_rest, else the displayed text
+    """
+    out = out or sys.stdout
+    parts = []
+    shown = 0
+    chunks = iter(chunks)
+    try:
+        for chunk in chunks:
+            if shown < limit:
+                visible = chunk[:limit - shown]
+                out.write(visible)
+                out.flush()
+                shown += len(visible)
+                parts.append(chunk if consume_rest else visible)
+            else:
+                parts.append(chunk)
+            if shown >= limit and not consume_rest:
+                break
+    finally:
+        if hasattr(chunks, "close"):
+            chunks.close()
+    if shown >= limit:
+        out.write("...")
+    out.write("\n")
+    return "".join(parts)
@@ -4,9 +4,8 @@ AI agent that speaks to you and listens to your voice responses
 """
 
 import os
-import speech_recognition as sr
-import pyttsx3
 import time
+from concurrent.futures import Future, ThreadPoolExecutor
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -20,132 +19,200 @@ except ImportError:
     class Style:
         BRIGHT = RESET_ALL = ""
 
-from agents.customer_engagement_agent.agent import CustomerEngagementAgent
-from agents.data_analysis_agent.agent import DataAnalysisAgent
-from agents.diagnosis_agent.agent import DiagnosisAgent
+from agents.customer_engagement_agent.intent_classifier import get_intent_classifier
+from agents.customer_engagement_agent.script_templates import (
+    INTRO_LINE, all_clear, build_call_lines, greeting_line, parse_diagnosis
+)
+from agents.customer_engagement_agent.stt_engine import (
+    NoSpeechError, RecognitionServiceError, TurnLatencyLog, UnrecognizedSpeechError, create_stt_backend
+)
+from agents.customer_engagement_agent.tts_engine import (
+    DeadAirMeter, Pyttsx3Speaker, SpeechWorker, TTSCache, audio_playback_available, play_audio
+)
 from utils.mock_data import get_vehicle
 
 
 class VoiceCallAgent:
     """Voice-enabled AI agent for customer calls"""
     
-    def __init__(self):
-        """Initialize voice components"""
-        # Text-to-Speech engine
-        self.tts_engine = pyttsx3.init()
-        self.tts_engine.setProperty('rate', 150)  # Speed of speech
-        self.tts_engine.setProperty('volume', 0.9)  # Volume (0-1)
+    def __init__(self, stt_backend=None, speaker=None, prerender=True):
+        """
+        Initialize voice components
+        
+        Args:
+            stt_backend: Speech-to-text backend (defaults to agents_config.yaml `stt_backend`)
+            speaker: Speaks text aloud when no pre-rendered audio can be played
+                (defaults to pyttsx3, started on first use)
+            prerender: Render lines to cached audio files ahead of time where
+                audio playback is available
+        """
+        # Text-to-Speech: rate 150, volume 0.9, a female voice (like Maya) where installed
+        self.speaker = speaker or Pyttsx3Speaker(rate=150, volume=0.9)
         
-        # Set voice to female (like Maya)
-        voices = self.tts_engine.getProperty('voices')
-        for voice in voices:
-            if "female" in voice.name.lower() or "zira" in voice.name.lower():
-                self.tts_engine.setProperty('voice', voice.id)
-                break
+        # Pre-rendered audio, synthesized ahead of time on a background thread
+        self.speech_worker = None
+        if prerender and audio_playback_available():
+            self.speech_worker = SpeechWorker(TTSCache(rate=150, volume=0.9))
+        self.dead_air = DeadAirMeter()
         
         # Speech recognition
-        self.recognizer = sr.Recognizer()
-        self.microphone = sr.Microphone()
+        self.stt = stt_backend or create_stt_backend()
+        self.latency = TurnLatencyLog()
         
         # Adjust for ambient noise
         print(Fore.YELLOW + "🎤 Calibrating microphone for ambient noise...")
-        with self.microphone as source:
-            self.recognizer.adjust_for_ambient_noise(source, duration=2)
-        print(Fore.GREEN + "✓ Microphone ready!")
+        self.stt.calibrate(duration=2)
+        print(Fore.GREEN + f"✓ Microphone ready! (speech recognition: {self.stt.name})")
+    
+    def prefetch(self, *texts):
+        """Render upcoming lines in the background while the current one plays"""
+        if self.speech_worker:
+            self.speech_worker.prefetch(texts)
     
     def speak(self, text):
         """Make the AI speak"""
+        audio = self.speech_worker.get(text) if self.speech_worker else None
         print(Fore.CYAN + Style.BRIGHT + f"\n🤖 Maya (AI): " + Fore.WHITE + text)
-        self.tts_engine.say(text)
-        self.tts_engine.runAndWait()
+        self.dead_air.speech_started()
+        self.latency.record_reply()
+        if not (audio and play_audio(audio)):
+            self.speaker(text)
+        self.dead_air.turn_ended()
     
     def listen(self, timeout=10):
         """Listen to user's voice and convert to text"""
         print(Fore.YELLOW + "\n👂 Listening... (speak now)")
         
         try:
-            with self.microphone as source:
-                # Listen for speech
-                audio = self.recognizer.listen(source, timeout=timeout, phrase_time_limit=15)
+            # Listen for speech
+            started = time.perf_counter()
+            audio = self.stt.capture(timeout=timeout, phrase_time_limit=15)
+            captured = time.perf_counter()
+            self.dead_air.turn_ended()
             
             # Convert speech to text
             print(Fore.BLUE + "🔄 Processing your speech...")
-            text = self.recognizer.recognize_google(audio)
+            text = self.stt.recognize(audio)
+            self.latency.record_listen(captured - started, time.perf_counter() - captured, self.stt.name)
             print(Fore.GREEN + f"👤 You said: " + Fore.WHITE + text)
             return text.lower()
             
-        except sr.WaitTimeoutError:
+        except NoSpeechError:
             print(Fore.RED + "⏱️ No speech detected. Please try again.")
             return ""
-        except sr.UnknownValueError:
+        except UnrecognizedSpeechError:
             print(Fore.RED + "❌ Sorry, I couldn't understand that. Please speak clearly.")
             return ""
-        except sr.RequestError as e:
+        except RecognitionServiceError as e:
             print(Fore.RED + f"❌ Speech recognition error: {e}")
             return ""
     
     def wait_for_response(self, prompt_text, timeout=10):
         """Ask a question and wait for voice response"""
         self.speak(prompt_text)
-        time.sleep(0.5)  # Small pause before listening
         return self.listen(timeout)
 
 
-def voice_conversation(agent, customer_name, diagnosis):
-    """Conduct voice-based conversation"""
+class CallSetupTrace:
+    """Timestamps of call setup stages, relative to the start of the demo"""
+    
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.marks = []
+    
+    def mark(self, label):
+        self.marks.append((label, time.perf_counter() - self.started))
+    
+    def elapsed(self, start_label, end_label):
+        """Seconds between two marks, or None if either is missing"""
+        times = dict(self.marks)
+        if start_label not in times or end_label not in times:
+            return None
+        return times[end_label] - times[start_label]
+    
+    def report(self):
+        print(Fore.MAGENTA + "\n⏱️ Call setup trace:")
+        for label, at in self.marks:
+            print(Fore.WHITE + f"  {at:8.3f}s  {label}")
+        answer_to_speech = self.elapsed("call answered", "first sentence spoken")
+        if answer_to_speech is not None:
+            print(Fore.WHITE + f"  Answer to first sentence: {answer_to_speech * 1000:.0f} ms")
+
+
+def voice_conversation(agent, customer_name, diagnosis, trace=None):
+    """
+    Conduct voice-based conversation
+    
+    Args:
+        agent: VoiceCallAgent
+        customer_name: Name used in the greeting
+        diagnosis: Diagnosis text, or a Future still producing it
+        trace: Optional CallSetupTrace
+    """
     
     print("\n" + "="*70)
     print(Fore.CYAN + Style.BRIGHT + "📞 INCOMING CALL FROM ABC MOTORS...")
     print("="*70 + "\n")
     
-    # Greeting
-    greeting = f"Hello {customer_name}! This is Maya from ABC Motors Service Center. " \
-               f"I hope I'm not catching you at a bad time?"
-    agent.speak(greeting)
-    time.sleep(1)
+    # The greeting needs no diagnosis, so the call opens while it is still running
+    agent.speak(greeting_line(customer_name))
+    if trace:
+        trace.mark("first sentence spoken")
+    
+    # The intro is the same for every repair call: render it while the customer answers
+    if isinstance(diagnosis, Future) or not all_clear(diagnosis):
+        agent.prefetch(INTRO_LINE)
     
     response1 = agent.listen(timeout=8)
     
+    if isinstance(diagnosis, Future):
+        diagnosis = diagnosis.result()
+        if trace:
+            trace.mark("diagnosis awaited")
+    lines = build_call_lines(customer_name, diagnosis)
+    cost = parse_diagnosis(diagnosis)["cost"] or "₹5,000-10,000"
+    
+    # Nothing to repair: a short courtesy call, no booking
+    if "scheduling_question" not in lines:
+        agent.speak(f"{lines['intro']} {lines['issues']}")
+        agent.speak(f"{lines['advice']} {lines['closing']}")
+        print("\n" + Fore.MAGENTA + "━" * 70)
+        print(Fore.GREEN + Style.BRIGHT + "📞 Call Ended (all clear)")
+        print(Fore.MAGENTA + "━" * 70 + "\n")
+        return
+    
+    # Render the scripted part of the call while the intro plays
+    agent.prefetch(lines["intro"], lines["issues"], lines["safety"],
+                   lines["cost"], lines["scheduling_question"])
+    
     # Introduction to issue
-    intro = "Great! I'm calling about your vehicle. Our monitoring system has detected " \
-            "some important maintenance alerts that I wanted to discuss with you."
-    agent.speak(intro)
-    time.sleep(1)
+    agent.speak(lines["intro"])
     
     # Explain the issues
-    issues = "Our analysis shows two critical issues. First, your brake pads are at " \
-             "78 percent wear, which is very high. Second, your oil pressure is low at " \
-             "35 PSI when it should be above 40. Both of these need immediate attention."
-    agent.speak(issues)
-    time.sleep(1)
+    agent.speak(lines["issues"])
     
     # Safety concern
-    safety = "I want to emphasize that these are safety-critical issues. The brake wear " \
-             "could affect your stopping distance, and low oil pressure can cause serious " \
-             "engine damage if not addressed within the next 7 to 10 days."
-    agent.speak(safety)
-    time.sleep(1)
+    agent.speak(lines["safety"])
     
     # Cost information
-    cost_info = "The good news is we caught this early. The repair would cost approximately " \
-                "5,000 to 10,000 rupees for both issues. However, if we wait, the cost could " \
-                "triple if the brake rotors get damaged or the engine develops problems."
-    agent.speak(cost_info)
-    time.sleep(1)
+    agent.speak(lines["cost"])
     
     # Ask about scheduling
-    scheduling_question = "Would you like to schedule a service appointment? We have slots " \
-                         "available tomorrow morning at 10 AM or afternoon at 2 PM. " \
-                         "Which would work better for you?"
+    scheduling_question = lines["scheduling_question"]
     response2 = agent.wait_for_response(scheduling_question, timeout=12)
     
-    # Process response
-    if any(word in response2 for word in ["yes", "sure", "okay", "ok", "schedule", "book", "tomorrow", "morning", "afternoon", "10", "2"]):
+    # Process response; a mixed answer ("not sure about 10 AM") gets one clarifying question
+    classifier = get_intent_classifier()
+    reply = classifier.decide(response2)
+    if reply["intent"] == "unclear":
+        response2 = agent.wait_for_response(
+            "Sorry, I want to make sure I got that right. Shall I book you for tomorrow "
+            "at 10 AM or 2 PM, or would you prefer I call you back later?", timeout=10)
+        reply = classifier.decide(response2)
+    if reply["intent"] == "accept":
         confirmation = "Excellent decision! I'm so glad we could catch this early. "
         
-        if "morning" in response2 or "10" in response2:
-            confirmation += "I've scheduled you for tomorrow at 10 AM. "
-        elif "afternoon" in response2 or "2" in response2:
+        if reply["slot"] == "afternoon":
             confirmation += "I've scheduled you for tomorrow at 2 PM. "
         else:
             confirmation += "I've scheduled you for tomorrow at 10 AM. "
@@ -157,9 +224,9 @@ def voice_conversation(agent, customer_name, diagnosis):
         
         final_response = agent.listen(timeout=8)
         
-        if any(word in final_response for word in ["no", "nothing", "that's all", "nope"]):
+        if classifier.decide(final_response)["intent"] == "decline":
             closing = "Perfect! Thank you so much for your time. We'll see you tomorrow. " \
-                     "Drive safely until then, and avoid heavy braking if possible. Have a great day!"
+                     f"{lines['advice']} Have a great day!"
         else:
             closing = "I'm glad I could help. If you have any questions before your appointment, " \
                      "feel free to call us anytime. Thank you and drive safely!"
@@ -168,21 +235,19 @@ def voice_conversation(agent, customer_name, diagnosis):
         print(Fore.GREEN + Style.BRIGHT + "\n✅ APPOINTMENT CONFIRMED!")
         print(Fore.WHITE + "📅 Date: Tomorrow")
         print(Fore.WHITE + "⏰ Time: 10:00 AM or 2:00 PM")
-        print(Fore.WHITE + "💰 Estimated cost: ₹5,000-10,000")
+        print(Fore.WHITE + f"💰 Estimated cost: {cost}")
         
-    elif any(word in response2 for word in ["busy", "later", "think", "wait", "not sure"]):
-        concern = "I completely understand you need time to think. However, I want to stress " \
-                 "that this is a safety issue, especially the brakes. For your family's safety, " \
+    elif reply["intent"] == "defer":
+        concern = f"{lines['concern']} For your family's safety, " \
                  "I strongly recommend getting this checked within the next 7 days. " \
                  "Can I call you back in two days to follow up?"
         agent.speak(concern)
         
         follow_up_response = agent.listen(timeout=8)
         
-        if "yes" in follow_up_response or "okay" in follow_up_response:
-            follow_up = "Perfect! I'll call you back on Wednesday. In the meantime, please avoid " \
-                       "highway driving and heavy braking. If you hear any unusual sounds, " \
-                       "please call our emergency line immediately. Stay safe!"
+        if classifier.decide(follow_up_response)["intent"] == "accept":
+            follow_up = f"Perfect! I'll call you back on Wednesday. {lines['advice']} " \
+                       "If you hear any unusual sounds, please call our emergency line immediately. Stay safe!"
         else:
             follow_up = "I understand. Please do consider the safety implications. You can reach us " \
                        "anytime at our service center. Take care and drive carefully!"
@@ -196,7 +261,7 @@ def voice_conversation(agent, customer_name, diagnosis):
         
         final = agent.listen(timeout=10)
         
-        if "schedule" in final or "appointment" in final or "yes" in final:
+        if classifier.decide(final)["intent"] == "accept":
             booking = "Great choice! Let me book you for tomorrow at 10 AM. You'll receive a " \
                      "confirmation message shortly. Thank you for prioritizing your safety!"
             agent.speak(booking)
@@ -207,9 +272,33 @@ def voice_conversation(agent, customer_name, diagnosis):
     
     print("\n" + Fore.MAGENTA + "━" * 70)
     print(Fore.GREEN + Style.BRIGHT + "📞 Call Ended")
+    dead_air = agent.dead_air.summary()
+    print(Fore.WHITE + f"🔇 Dead air: {dead_air['mean_ms']} ms avg, {dead_air['max_ms']} ms max "
+          f"over {dead_air['turns']} turns")
+    for stage, stats in agent.latency.summary().items():
+        print(Fore.WHITE + f"⏱️ {stage}: {stats['p50']} ms median, {stats['max']} ms max")
     print(Fore.MAGENTA + "━" * 70 + "\n")
 
 
+def prepare_diagnosis(vehicle_data, trace=None):
+    """Analyze a vehicle and diagnose it (runs alongside call setup)"""
+    from agents.data_analysis_agent.agent import DataAnalysisAgent
+    from agents.diagnosis_agent.agent import DiagnosisAgent
+    analysis = DataAnalysisAgent().analyze(vehicle_data)
+    if trace:
+        trace.mark("analysis done")
+    diagnosis = DiagnosisAgent().diagnose(analysis, {
+        "model": vehicle_data["model"],
+        "year": vehicle_data["year"],
+        "type": vehicle_data["type"],
+        "dtc_codes": vehicle_data.get("dtc_codes", []),
+        "sensor_data": vehicle_data.get("sensor_data", {})
+    })
+    if trace:
+        trace.mark("diagnosis done")
+    return diagnosis
+
+
 def run_voice_demo():
     """Run the voice-enabled demo"""
     
@@ -232,21 +321,9 @@ def run_voice_demo():
     print("  • Answer naturally (yes/no/maybe/etc.)")
     print("  • Make sure your microphone is working\n")
     
-    # Test microphone
-    print(Fore.CYAN + "🎤 Microphone Test:")
-    print(Fore.YELLOW + "Say 'test' to check if your microphone is working...")
-    
-    voice_agent = VoiceCallAgent()
-    test_result = voice_agent.listen(timeout=5)
-    
-    if not test_result:
-        print(Fore.RED + "⚠️ Microphone test failed. Please check your microphone settings.")
-        print(Fore.YELLOW + "Continue anyway? (Press Enter)")
-        input()
-    else:
-        print(Fore.GREEN + "✓ Microphone is working!")
+    trace = CallSetupTrace()
     
-    # Choose vehicle (text input for simplicity)
+    # Choose vehicle first so its analysis can run during microphone setup
     print(Fore.CYAN + "\nSelect vehicle:")
     print("  1. VEH001 - 2020 Maruti Swift (Mr. Rajesh Sharma)")
     print("  2. VEH002 - 2022 Tata Nexon EV (Ms. Priya Patel)")
@@ -263,35 +340,46 @@ def run_voice_demo():
     
     print(Fore.GREEN + f"\n✓ Vehicle: {vehicle_data['year']} {vehicle_data['model']}")
     print(Fore.GREEN + f"✓ Customer: {vehicle_data['owner']}")
+    trace.mark("vehicle selected")
     
-    input(Fore.CYAN + "\n📞 Press Enter to receive the call...\n")
+    # Analyze vehicle and generate diagnosis in the background
+    print(Fore.BLUE + "🔄 Analyzing vehicle data in the background...")
+    executor = ThreadPoolExecutor(max_workers=1)
+    diagnosis_future = executor.submit(prepare_diagnosis, vehicle_data, trace)
     
     try:
-        # Analyze vehicle and generate diagnosis
-        print(Fore.BLUE + "🔄 Analyzing vehicle data...")
-        analysis_agent = DataAnalysisAgent()
-        analysis = analysis_agent.analyze(vehicle_data)
+        # Test microphone
+        print(Fore.CYAN + "\n🎤 Microphone Test:")
+        print(Fore.YELLOW + "Say 'test' to check if your microphone is working...")
+        
+        voice_agent = VoiceCallAgent()
+        voice_agent.prefetch(greeting_line(customer_name))
+        trace.mark("microphone calibrated")
+        test_result = voice_agent.listen(timeout=5)
         
-        print(Fore.BLUE + "🔄 Generating diagnosis...")
-        diagnosis_agent = DiagnosisAgent()
-        diagnosis = diagnosis_agent.diagnose(analysis, {
-            "model": vehicle_data["model"],
-            "year": vehicle_data["year"],
-            "type": vehicle_data["type"]
-        })
+        if not test_result:
+            print(Fore.RED + "⚠️ Microphone test failed. Please check your microphone settings.")
+            print(Fore.YELLOW + "Continue anyway? (Press Enter)")
+            input()
+        else:
+            print(Fore.GREEN + "✓ Microphone is working!")
+        trace.mark("microphone tested")
         
-        print(Fore.GREEN + "✓ Ready for voice call!\n")
-        time.sleep(1)
+        input(Fore.CYAN + "\n📞 Press Enter to receive the call...\n")
+        trace.mark("call answered")
         
         # Start voice conversation
-        voice_conversation(voice_agent, customer_name, diagnosis)
+        voice_conversation(voice_agent, customer_name, diagnosis_future, trace)
         
+        trace.report()
         print(Fore.GREEN + Style.BRIGHT + "\n✅ VOICE DEMO COMPLETE!")
         
     except Exception as e:
         print(Fore.RED + f"\n❌ Error: {str(e)}")
         import traceback
         traceback.print_exc()
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
 
 
 if __name__ == "__main__":